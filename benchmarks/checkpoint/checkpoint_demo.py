@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+"""
+Create and run multiple LPUs with large port data arrays to time checkpointing
+and restarting of emulation state.
+"""
+
+import argparse
+import time
+
+from mpi4py import MPI
+import numpy as np
+
+from neurokernel.tools.logging import setup_logger
+from neurokernel.core import CTRL_TAG, GPOT_TAG, SPIKE_TAG, Manager, Module
+from neurokernel.plsel import Selector, SelectorMethods
+
+class MyModule(Module):
+    """
+    Module class with model state.
+
+    This module class updates its output ports and an internal state array of
+    the same length at every step; the state array is saved in checkpoints
+    along with the port data.
+    """
+
+    def __init__(self, sel, sel_in, sel_out,
+                 sel_gpot, sel_spike, data_gpot, data_spike,
+                 columns=['interface', 'io', 'type'],
+                 ctrl_tag=CTRL_TAG, gpot_tag=GPOT_TAG, spike_tag=SPIKE_TAG,
+                 id=None, device=None,
+                 routing_table=None, rank_to_id=None,
+                 debug=False, time_sync=False):
+        if data_gpot is None:
+            data_gpot = np.zeros(SelectorMethods.count_ports(sel_gpot), float)
+        if data_spike is None:
+            data_spike = np.zeros(SelectorMethods.count_ports(sel_spike), int)
+        super(MyModule, self).__init__(sel, sel_in, sel_out,
+                 sel_gpot, sel_spike, data_gpot, data_spike,
+                 columns,
+                 ctrl_tag, gpot_tag, spike_tag,
+                 id, device,
+                 routing_table, rank_to_id,
+                 debug, time_sync)
+
+        self.v = np.zeros(len(self.data['gpot']), float)
+
+    def run_step(self):
+        self.v += 1.0
+        self.data['gpot'][:] = self.v
+
+    def get_state(self):
+        return {'v': self.v}
+
+    def set_state(self, state):
+        self.v[:] = state['v']
+
+def emulate(n_lpu, n_port, steps, path, restart=False):
+    """
+    Benchmark checkpointing of module state.
+
+    Parameters
+    ----------
+    n_lpu : int
+        Number of LPUs.
+    n_port : int
+        Number of graded potential ports in each LPU.
+    steps : int
+        Step at which execution stops; the state is saved after this step.
+        When restarting, this must exceed the step at which the restored
+        state was saved.
+    path : str
+        Directory in which to save the state.
+    restart : bool
+        If True, restore the state saved in `path` before running.
+
+    Returns
+    -------
+    max_duration : float
+        Longest time in seconds taken by any LPU to save its state.
+    nbytes : int
+        Total number of bytes saved by all LPUs.
+    exec_time : float
+        Execution time in seconds.
+    """
+
+    start_all = time.time()
+    man = Manager()
+
+    for i in xrange(n_lpu):
+        lpu_i = 'lpu%s' % i
+        sel_gpot = Selector('/%s/out/gpot[0:%i]' % (lpu_i, n_port))
+        man.add(MyModule, lpu_i, sel_gpot, Selector(''), sel_gpot,
+                sel_gpot, Selector(''), None, None)
+
+    man.spawn(restart=path if restart else None)
+    man.checkpoint(path)
+    man.start(steps)
+    man.wait()
+
+    durations = [d for times in man.checkpoint_times.values() \
+                 for d, n in times.values()]
+    nbytes = sum([n for times in man.checkpoint_times.values() \
+                  for d, n in times.values()])
+    return max(durations), nbytes, time.time()-start_all
+
+if __name__ == '__main__':
+    import neurokernel.mpi_relaunch
+
+    num_lpus = 100
+    num_ports = 1000000
+    max_steps = 10
+    path = 'checkpoint'
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-l', '--log', default='none', type=str,
+                        help='Log output to screen [file, screen, both, or none; default:none]')
+    parser.add_argument('-u', '--num_lpus', default=num_lpus, type=int,
+                        help='Number of LPUs [default: %s]' % num_lpus)
+    parser.add_argument('-p', '--num_ports', default=num_ports, type=int,
+                        help='Number of ports per LPU [default: %s]' % num_ports)
+    parser.add_argument('-m', '--max_steps', default=max_steps, type=int,
+                        help='Maximum number of steps [default: %s]' % max_steps)
+    parser.add_argument('-d', '--dir', default=path, type=str,
+                        help='Checkpoint directory [default: %s]' % path)
+    parser.add_argument('-r', '--restart', default=False,
+                        dest='restart', action='store_true',
+                        help='Restart from checkpoint in directory.')
+    args = parser.parse_args()
+
+    file_name = None
+    screen = False
+    if args.log.lower() in ['file', 'both']:
+        file_name = 'neurokernel.log'
+    if args.log.lower() in ['screen', 'both']:
+        screen = True
+    logger = setup_logger(file_name=file_name, screen=screen,
+                          mpi_comm=MPI.COMM_WORLD,
+                          multiline=True)
+
+    print list((args.num_lpus, args.num_ports)+\
+               emulate(args.num_lpus, args.num_ports, args.max_steps,
+                       args.dir, args.restart))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+"""
+Create and run multiple fully connected LPUs with and without pinning the
+processes to CPUs to compare the variance of the execution step time.
+"""
+
+import argparse
+import itertools
+
+from mpi4py import MPI
+import numpy as np
+
+from neurokernel.tools.logging import setup_logger
+from neurokernel.core import CTRL_TAG, GPOT_TAG, SPIKE_TAG, Manager
+from neurokernel.pattern import Pattern
+
+from timing_demo import MyModule, gen_sels
+
+def emulate(n_lpu, n_spike, n_gpot, steps, affinity=None):
+    """
+    Benchmark execution step time of LPUs connected to all other LPUs.
+
+    Parameters
+    ----------
+    n_lpu : int
+        Number of LPUs. Must be at least 2.
+    n_spike : int
+        Total number of input and output spiking ports any
+        single LPU exposes to any other LPU.
+    n_gpot : int
+        Total number of input and output graded potential ports any
+        single LPU exposes to any other LPU.
+    steps : int
+        Number of steps to execute.
+    affinity : str
+        CPU placement policy passed to `Manager.spawn()`.
+
+    Returns
+    -------
+    mean_step_time, std_step_time : float
+        Mean and standard deviation of the execution step time in seconds.
+    """
+
+    man = Manager()
+    mod_sels, pat_sels = gen_sels(n_lpu, n_spike, n_gpot)
+
+    for i in xrange(n_lpu):
+        lpu_i = 'lpu%s' % i
+        sel, sel_in, sel_out, sel_gpot, sel_spike = mod_sels[lpu_i]
+        man.add(MyModule, lpu_i, sel, sel_in, sel_out, sel_gpot, sel_spike,
+                None, None, ['interface', 'io', 'type'],
+                CTRL_TAG, GPOT_TAG, SPIKE_TAG, time_sync=True)
+
+    for i, j in itertools.combinations(xrange(n_lpu), 2):
+        lpu_i = 'lpu%s' % i
+        lpu_j = 'lpu%s' % j
+        sel_from, sel_to, sel_in_i, sel_out_i, sel_gpot_i, sel_spike_i, \
+            sel_in_j, sel_out_j, sel_gpot_j, sel_spike_j = pat_sels[(lpu_i, lpu_j)]
+        pat = Pattern.from_concat(sel_from, sel_to,
+                                  from_sel=sel_from, to_sel=sel_to, data=1)
+        pat.interface[sel_in_i, 'interface', 'io'] = [0, 'in']
+        pat.interface[sel_out_i, 'interface', 'io'] = [0, 'out']
+        pat.interface[sel_gpot_i, 'interface', 'type'] = [0, 'gpot']
+        pat.interface[sel_spike_i, 'interface', 'type'] = [0, 'spike']
+        pat.interface[sel_in_j, 'interface', 'io'] = [1, 'in']
+        pat.interface[sel_out_j, 'interface', 'io'] = [1, 'out']
+        pat.interface[sel_gpot_j, 'interface', 'type'] = [1, 'gpot']
+        pat.interface[sel_spike_j, 'interface', 'type'] = [1, 'spike']
+        man.connect(lpu_i, lpu_j, pat, 0, 1)
+
+    man.spawn(affinity=affinity)
+    man.start(steps)
+    man.wait()
+
+    # The duration of each step is approximated by the sum of the longest
+    # computation and synchronization times of any module:
+    df = man.step_imbalance()
+    step_times = (df['max_compute']+df['max_wait']).dropna().values
+    return step_times.mean(), step_times.std()
+
+if __name__ == '__main__':
+    import neurokernel.mpi_relaunch
+
+    num_lpus = 8
+    num_gpot = 100
+    num_spike = 100
+    max_steps = 1000
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-l', '--log', default='none', type=str,
+                        help='Log output to screen [file, screen, both, or none; default:none]')
+    parser.add_argument('-u', '--num_lpus', default=num_lpus, type=int,
+                        help='Number of LPUs [default: %s]' % num_lpus)
+    parser.add_argument('-s', '--num_spike', default=num_spike, type=int,
+                        help='Number of spiking ports [default: %s]' % num_spike)
+    parser.add_argument('-g', '--num_gpot', default=num_gpot, type=int,
+                        help='Number of graded potential ports [default: %s]' % num_gpot)
+    parser.add_argument('-m', '--max_steps', default=max_steps, type=int,
+                        help='Maximum number of steps [default: %s]' % max_steps)
+    parser.add_argument('-a', '--affinity', default='core', type=str,
+                        help='Placement policy [core or numa; default: core]')
+    args = parser.parse_args()
+
+    file_name = None
+    screen = False
+    if args.log.lower() in ['file', 'both']:
+        file_name = 'neurokernel.log'
+    if args.log.lower() in ['screen', 'both']:
+        screen = True
+    logger = setup_logger(file_name=file_name, screen=screen,
+                          mpi_comm=MPI.COMM_WORLD,
+                          multiline=True)
+
+    # Use the classes defined in this script's module rather than in __main__
+    # so that the spawned processes can import them:
+    from affinity_demo import emulate
+
+    # The unpinned emulation must be run first because the manager remains
+    # pinned after the pinned emulation:
+    for affinity in [None, args.affinity]:
+        print list((args.num_lpus, affinity)+\
+                   emulate(args.num_lpus, args.num_spike, args.num_gpot,
+                           args.max_steps, affinity))
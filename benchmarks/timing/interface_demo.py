@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+"""
+Time compatibility checks between interfaces.
+
+Notes
+-----
+A module interface with the specified number of ports is checked against
+the matching interface of a pattern with `Interface.is_compatible()`, and
+the ports shared by the two interfaces are found with
+`Interface.get_common_ports()`.
+"""
+
+import argparse
+import time
+
+from neurokernel.pattern import Interface
+
+def make_interfaces(n):
+    """
+    Create a module interface and the matching interface of a pattern.
+
+    Parameters
+    ----------
+    n : int
+        Number of ports in each interface.
+
+    Returns
+    -------
+    m, p : Interface
+        Interfaces of the module and pattern. Half of the ports of the module
+        interface are graded potential input ports and half are spiking
+        output ports.
+    """
+
+    m = Interface('/foo[0:%i]' % n)
+    m['/foo[0:%i]' % (n/2), 'interface', 'io', 'type'] = [0, 'in', 'gpot']
+    m['/foo[%i:%i]' % (n/2, n), 'interface', 'io', 'type'] = [0, 'out', 'spike']
+    p = m.io_inv
+    p['/foo[0:%i]' % n, 'interface'] = 1
+    return m, p
+
+def is_compatible(m, p):
+    """
+    Time the compatibility check between two interfaces.
+
+    Parameters
+    ----------
+    m, p : Interface
+        Interfaces of the module and pattern.
+
+    Returns
+    -------
+    t : float
+        Time in seconds taken to check the interfaces.
+    """
+
+    start = time.time()
+    assert m.is_compatible(0, p, 1)
+    return time.time()-start
+
+def get_common_ports(m, p):
+    """
+    Time the retrieval of the ports shared by two interfaces.
+
+    Parameters
+    ----------
+    m, p : Interface
+        Interfaces of the module and pattern.
+
+    Returns
+    -------
+    t : float
+        Time in seconds taken to retrieve the shared ports.
+    """
+
+    start = time.time()
+    m.get_common_ports(0, p, 1, 'spike')
+    return time.time()-start
+
+if __name__ == '__main__':
+    num = 100000
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--num', default=num, type=int,
+                        help='Number of ports [default: %s]' % num)
+    args = parser.parse_args()
+
+    m, p = make_interfaces(args.num)
+    print ['is_compatible', args.num, is_compatible(m, p)]
+    print ['get_common_ports', args.num, get_common_ports(m, p)]
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""
+Time the construction of connectivity patterns.
+
+Notes
+-----
+A pattern with the specified number of one-to-one connections between two
+interfaces is constructed in bulk with `Pattern.from_edges()` and, if
+requested, connection by connection with `Pattern.__setitem__()`.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from neurokernel.pattern import Pattern
+
+def from_edges(n, ports='int'):
+    """
+    Time the construction of a pattern with `Pattern.from_edges()`.
+
+    Parameters
+    ----------
+    n : int
+        Number of connections.
+    ports : str
+        Specification of the connected ports ('int', 'tuple', or 'str').
+
+    Returns
+    -------
+    t : float
+        Time in seconds taken to construct the pattern.
+    """
+
+    src = np.arange(n)
+    dest = np.random.permutation(n)+n
+    if ports == 'tuple':
+        src = [('foo', i) for i in src]
+        dest = [('bar', i-n) for i in dest]
+    elif ports == 'str':
+        src = ['/foo[%i]' % i for i in src]
+        dest = ['/bar[%i]' % (i-n) for i in dest]
+
+    start = time.time()
+    p = Pattern.from_edges(src, dest, '/foo[0:%i]' % n, '/bar[0:%i]' % n,
+                           types='gpot')
+    return time.time()-start
+
+def setitem(n):
+    """
+    Time the construction of a pattern one connection at a time.
+
+    Parameters
+    ----------
+    n : int
+        Number of connections.
+
+    Returns
+    -------
+    t : float
+        Time in seconds taken to construct the pattern.
+    """
+
+    dest = np.random.permutation(n)
+
+    start = time.time()
+    p = Pattern('/foo[0:%i]' % n, '/bar[0:%i]' % n)
+    for i in xrange(n):
+        p['/foo[%i]' % i, '/bar[%i]' % dest[i]] = 1
+    p.interface['/foo[0:%i],/bar[0:%i]' % (n, n), 'type'] = 'gpot'
+    return time.time()-start
+
+if __name__ == '__main__':
+    num = 1000000
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--num', default=num, type=int,
+                        help='Number of connections [default: %s]' % num)
+    parser.add_argument('-p', '--ports', default='int', type=str,
+                        help='Port specification [int, tuple, or str; default: int]')
+    parser.add_argument('-s', '--setitem', default=False,
+                        dest='setitem', action='store_true',
+                        help='Also construct pattern one connection at a time.')
+    args = parser.parse_args()
+
+    print ['from_edges', args.num, args.ports, from_edges(args.num, args.ports)]
+    if args.setitem:
+        print ['setitem', args.num, setitem(args.num)]
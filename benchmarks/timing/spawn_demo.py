@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+"""
+Create multiple fully connected LPUs to time spawning and measure the memory
+used by each worker.
+
+Notes
+-----
+Run with `--no_import` to compare the spawn time obtained when the module
+class is serialized with the time obtained when it is imported. To compare the
+startup time of dynamic spawning with that of a static SPMD launch, run the
+script with `mpiexec -np N+1` for N LPUs; the reported spawn time then
+only includes the time taken to distribute the modules to the
+already-running processes. Run with `--multiprocessing` to time the startup
+of the MPI-free runtime in `neurokernel.mp`.
+"""
+
+import argparse
+import itertools
+import resource
+import time
+
+from mpi4py import MPI
+import numpy as np
+
+from neurokernel.tools.logging import setup_logger
+from neurokernel.core import CTRL_TAG, GPOT_TAG, SPIKE_TAG, Manager
+import neurokernel.mp
+from neurokernel.pattern import Pattern
+
+from timing_demo import MyModule as BaseModule, gen_sels
+
+class MyModule(BaseModule):
+    """
+    Empty module class that reports its memory usage before running.
+    """
+
+    def pre_run(self):
+        super(MyModule, self).pre_run()
+
+        # Maximum resident set size in kilobytes:
+        self.intercomm.isend(['max_rss', (self.rank,
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)],
+                             dest=0, tag=self._ctrl_tag)
+
+class MaxRSSMixin(object):
+    """
+    Manager mixin that collects the memory usage reported by each module.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(MaxRSSMixin, self).__init__(*args, **kwargs)
+        self.max_rss = {}
+
+    def process_worker_msg(self, msg):
+        if msg[0] == 'max_rss':
+            rank, max_rss = msg[1]
+            self.max_rss[rank] = max_rss
+        else:
+            super(MaxRSSMixin, self).process_worker_msg(msg)
+
+class MyManager(MaxRSSMixin, Manager):
+    pass
+
+class MyMPManager(MaxRSSMixin, neurokernel.mp.Manager):
+    pass
+
+def emulate(n_lpu, n_spike, n_gpot, steps, import_targets=True,
+            multiprocessing=False):
+    """
+    Benchmark spawning of LPUs connected to all other LPUs.
+
+    Parameters
+    ----------
+    n_lpu : int
+        Number of LPUs. Must be at least 2.
+    n_spike : int
+        Total number of input and output spiking ports any
+        single LPU exposes to any other LPU.
+    n_gpot : int
+        Total number of input and output graded potential ports any
+        single LPU exposes to any other LPU.
+    steps : int
+        Number of steps to execute.
+    import_targets : bool
+        If True, the spawned processes import the module class; otherwise, it
+        is serialized along with the globals it accesses.
+    multiprocessing : bool
+        If True, run the LPUs in processes forked by the manager in
+        `neurokernel.mp` instead of spawning MPI processes.
+
+    Returns
+    -------
+    spawn_time : float
+        Time in seconds taken to spawn and transmit the modules.
+    mean_rss, max_rss : float
+        Mean and maximum resident set size of the workers in kilobytes.
+    """
+
+    man = MyMPManager() if multiprocessing else MyManager()
+    man.import_targets = import_targets
+    mod_sels, pat_sels = gen_sels(n_lpu, n_spike, n_gpot)
+
+    for i in xrange(n_lpu):
+        lpu_i = 'lpu%s' % i
+        sel, sel_in, sel_out, sel_gpot, sel_spike = mod_sels[lpu_i]
+        man.add(MyModule, lpu_i, sel, sel_in, sel_out, sel_gpot, sel_spike,
+                None, None, ['interface', 'io', 'type'],
+                CTRL_TAG, GPOT_TAG, SPIKE_TAG)
+
+    for i, j in itertools.combinations(xrange(n_lpu), 2):
+        lpu_i = 'lpu%s' % i
+        lpu_j = 'lpu%s' % j
+        sel_from, sel_to, sel_in_i, sel_out_i, sel_gpot_i, sel_spike_i, \
+            sel_in_j, sel_out_j, sel_gpot_j, sel_spike_j = pat_sels[(lpu_i, lpu_j)]
+        pat = Pattern.from_concat(sel_from, sel_to,
+                                  from_sel=sel_from, to_sel=sel_to, data=1)
+        pat.interface[sel_in_i, 'interface', 'io'] = [0, 'in']
+        pat.interface[sel_out_i, 'interface', 'io'] = [0, 'out']
+        pat.interface[sel_gpot_i, 'interface', 'type'] = [0, 'gpot']
+        pat.interface[sel_spike_i, 'interface', 'type'] = [0, 'spike']
+        pat.interface[sel_in_j, 'interface', 'io'] = [1, 'in']
+        pat.interface[sel_out_j, 'interface', 'io'] = [1, 'out']
+        pat.interface[sel_gpot_j, 'interface', 'type'] = [1, 'gpot']
+        pat.interface[sel_spike_j, 'interface', 'type'] = [1, 'spike']
+        man.connect(lpu_i, lpu_j, pat, 0, 1)
+
+    start_spawn = time.time()
+    man.spawn()
+    spawn_time = time.time()-start_spawn
+    man.start(steps)
+    man.wait()
+
+    max_rss = np.array(man.max_rss.values(), dtype=np.double)
+    return spawn_time, max_rss.mean(), max_rss.max()
+
+if __name__ == '__main__':
+    num_lpus = 64
+    num_gpot = 100
+    num_spike = 100
+    max_steps = 10
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-l', '--log', default='none', type=str,
+                        help='Log output to screen [file, screen, both, or none; default:none]')
+    parser.add_argument('-u', '--num_lpus', default=num_lpus, type=int,
+                        help='Number of LPUs [default: %s]' % num_lpus)
+    parser.add_argument('-s', '--num_spike', default=num_spike, type=int,
+                        help='Number of spiking ports [default: %s]' % num_spike)
+    parser.add_argument('-g', '--num_gpot', default=num_gpot, type=int,
+                        help='Number of graded potential ports [default: %s]' % num_gpot)
+    parser.add_argument('-m', '--max_steps', default=max_steps, type=int,
+                        help='Maximum number of steps [default: %s]' % max_steps)
+    parser.add_argument('-n', '--no_import', default=False,
+                        dest='no_import', action='store_true',
+                        help='Serialize module class instead of importing it.')
+    parser.add_argument('-p', '--multiprocessing', default=False,
+                        dest='multiprocessing', action='store_true',
+                        help='Run LPUs with multiprocessing instead of MPI.')
+    args = parser.parse_args()
+
+    # The MPI-free runtime does not need to be started via mpiexec:
+    if not args.multiprocessing:
+        import neurokernel.mpi_relaunch
+
+    file_name = None
+    screen = False
+    if args.log.lower() in ['file', 'both']:
+        file_name = 'neurokernel.log'
+    if args.log.lower() in ['screen', 'both']:
+        screen = True
+    logger = setup_logger(file_name=file_name, screen=screen,
+                          mpi_comm=None if args.multiprocessing else MPI.COMM_WORLD,
+                          multiline=True)
+
+    # Use the classes defined in this script's module rather than in __main__
+    # so that the spawned processes can import them:
+    from spawn_demo import emulate
+
+    print list((args.num_lpus, args.num_spike)+\
+               emulate(args.num_lpus, args.num_spike, args.num_gpot, args.max_steps,
+                       not args.no_import, args.multiprocessing))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+"""
+Time the per-step overhead of the execution loop with an empty module.
+
+Notes
+-----
+The module is not connected to any other module and its execution step
+does nothing, so the reported time per step only comprises the overhead of
+the execution loop. Run with `--multiprocessing` to use the MPI-free runtime
+in `neurokernel.mp` instead of spawning an MPI process.
+"""
+
+import argparse
+import time
+
+from mpi4py import MPI
+import numpy as np
+
+from neurokernel.tools.logging import setup_logger
+from neurokernel.core import Manager, Module
+import neurokernel.mp
+from neurokernel.plsel import Selector
+
+class MyModule(Module):
+    """
+    Empty module class.
+    """
+
+    def run_step(self):
+        pass
+
+def emulate(steps, ctrl_every, multiprocessing=False):
+    """
+    Time the execution of an empty module.
+
+    Parameters
+    ----------
+    steps : int
+        Number of steps to execute.
+    ctrl_every : int
+        Number of steps between checks for control messages; if None, the
+        number is adapted to the duration of the steps.
+    multiprocessing : bool
+        If True, run the module in a process forked by the manager in
+        `neurokernel.mp` instead of spawning an MPI process.
+
+    Returns
+    -------
+    step_time : float
+        Average time in seconds taken by each step.
+    """
+
+    man = neurokernel.mp.Manager() if multiprocessing else Manager()
+    sel = Selector('/lpu0/out/gpot[0:2]')
+    man.add(MyModule, 'lpu0', sel, Selector(''), sel, sel, Selector(''),
+            np.zeros(2, np.double), np.zeros(0, np.int32))
+    man.spawn(ctrl_every=ctrl_every)
+
+    start = time.time()
+    man.start(steps)
+    man.wait()
+    return (time.time()-start)/steps
+
+if __name__ == '__main__':
+    max_steps = 100000
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-l', '--log', default='none', type=str,
+                        help='Log output to screen [file, screen, both, or none; default:none]')
+    parser.add_argument('-m', '--max_steps', default=max_steps, type=int,
+                        help='Maximum number of steps [default: %s]' % max_steps)
+    parser.add_argument('-c', '--ctrl_every', default=None, type=int,
+                        help='Steps between checks for control messages [default: adaptive]')
+    parser.add_argument('-p', '--multiprocessing', default=False,
+                        dest='multiprocessing', action='store_true',
+                        help='Run the module with multiprocessing instead of MPI.')
+    args = parser.parse_args()
+
+    # The MPI-free runtime does not need to be started via mpiexec:
+    if not args.multiprocessing:
+        import neurokernel.mpi_relaunch
+
+    file_name = None
+    screen = False
+    if args.log.lower() in ['file', 'both']:
+        file_name = 'neurokernel.log'
+    if args.log.lower() in ['screen', 'both']:
+        screen = True
+    logger = setup_logger(file_name=file_name, screen=screen,
+                          mpi_comm=None if args.multiprocessing else MPI.COMM_WORLD,
+                          multiline=True)
+
+    # Use the classes defined in this script's module rather than in __main__
+    # so that the spawned processes can import them:
+    from step_demo import emulate
+
+    print [args.max_steps, args.ctrl_every,
+           emulate(args.max_steps, args.ctrl_every, args.multiprocessing)]
@@ -145,7 +145,7 @@ def gen_sels(n_lpu, n_spike, n_gpot):
 
     return mod_sels, pat_sels
 
-def emulate(n_lpu, n_spike, n_gpot, steps):
+def emulate(n_lpu, n_spike, n_gpot, steps, shared_mem=False, exchange='p2p'):
     """
     Benchmark inter-LPU communication throughput.
 
@@ -166,6 +166,10 @@ def emulate(n_lpu, n_spike, n_gpot, steps):
         have 2*n_gpot*(n_lpu-1) total graded potential ports.
     steps : int
         Number of steps to execute.
+    shared_mem : bool
+        If True, LPUs on the same host exchange data via shared memory.
+    exchange : str
+        Method used by LPUs to exchange data; either 'p2p' or 'neighbor'.
 
     Returns
     -------
@@ -208,9 +212,9 @@ def emulate(n_lpu, n_spike, n_gpot, steps):
         pat.interface[sel_out_j, 'interface', 'io'] = [1, 'out']
         pat.interface[sel_gpot_j, 'interface', 'type'] = [1, 'gpot']
         pat.interface[sel_spike_j, 'interface', 'type'] = [1, 'spike']
-        man.connect(lpu_i, lpu_j, pat, 0, 1, compat_check=False)
+        man.connect(lpu_i, lpu_j, pat, 0, 1)
 
-    man.spawn()
+    man.spawn(shared_mem=shared_mem, exchange=exchange)
     start_main = time.time()
     man.start(steps)
     man.wait()
@@ -240,6 +244,11 @@ if __name__ == '__main__':
                         help='Number of graded potential ports [default: %s]' % num_gpot)
     parser.add_argument('-m', '--max_steps', default=max_steps, type=int,
                         help='Maximum number of steps [default: %s]' % max_steps)
+    parser.add_argument('-x', '--shared_mem', default=False,
+                        dest='shared_mem', action='store_true',
+                        help='Exchange data between LPUs on the same host via shared memory.')
+    parser.add_argument('-e', '--exchange', default='p2p', type=str,
+                        help='Data exchange method [p2p or neighbor; default: p2p]')
     args = parser.parse_args()
 
     file_name = None
@@ -253,4 +262,5 @@ if __name__ == '__main__':
                           multiline=True)
 
     print list((args.num_lpus, args.num_spike)+\
-               emulate(args.num_lpus, args.num_spike, args.num_gpot, args.max_steps))
+               emulate(args.num_lpus, args.num_spike, args.num_gpot, args.max_steps,
+                       args.shared_mem, args.exchange))
@@ -19,7 +19,6 @@ import os
 import re
 import sys
 import time
-import warnings
 
 try:
     import cudamps
@@ -27,20 +26,17 @@ except ImportError:
     mps_avail = False
 else:
     mps_avail = True
-import dill
-import lmdb
 from mpi4py import MPI
-import networkx as nx
 import numpy as np
 import pandas as pd
 import pycuda.driver as drv
 import pycuda.gpuarray as gpuarray
-import pymetis
 import twiggy
 
 from neurokernel.all_global_vars import all_global_vars
 from neurokernel.core_gpu import CTRL_TAG, GPOT_TAG, SPIKE_TAG, Manager, Module
 from neurokernel.pattern import Pattern
+import neurokernel.placement as placement
 from neurokernel.plsel import Selector, SelectorMethods
 from neurokernel.tools.logging import setup_logger
 
@@ -59,7 +55,7 @@ class MyModule(Module):
                  ctrl_tag=CTRL_TAG, gpot_tag=GPOT_TAG, spike_tag=SPIKE_TAG,
                  id=None, device=None,
                  routing_table=None, rank_to_id=None,
-                 debug=False, time_sync=False, cache_file='cache.db'):
+                 debug=False, time_sync=False):
         if data_gpot is None:
             data_gpot = np.zeros(SelectorMethods.count_ports(sel_gpot), float)
         if data_spike is None:
@@ -72,67 +68,9 @@ class MyModule(Module):
                  routing_table, rank_to_id,
                  debug, time_sync)
 
-        self.cache_file = cache_file
         self.pm['gpot'][self.interface.out_ports().gpot_ports(tuples=True)] = 1.0
         self.pm['spike'][self.interface.out_ports().spike_ports(tuples=True)] = 1
 
-    def pre_run(self):
-        self.log_info('running code before body of worker %s' % self.rank)
-
-        # Initialize _out_port_dict and _in_port_dict attributes:
-        env = lmdb.open(self.cache_file, map_size=10**10)
-        with env.begin() as txn:
-            data = txn.get(self.id)
-        if data is not None:
-            data = dill.loads(data)
-            self.log_info('loading cached port data')
-            self._out_ids = data['_out_ids']
-            self._out_ranks = [self.rank_to_id[:i] for i in self._out_ids]
-            self._out_port_dict = data['_out_port_dict']
-            self._out_port_dict_ids = data['_out_port_dict_ids']
-            for out_id in self._out_ids:
-                if not isinstance(self._out_port_dict_ids['gpot'][out_id],
-                                  gpuarray.GPUArray):
-                    self._out_port_dict_ids['gpot'][out_id] = \
-                        gpuarray.to_gpu(self._out_port_dict_ids['gpot'][out_id])
-                if not isinstance(self._out_port_dict_ids['spike'][out_id],
-                                  gpuarray.GPUArray):
-                    self._out_port_dict_ids['spike'][out_id] = \
-                        gpuarray.to_gpu(self._out_port_dict_ids['spike'][out_id])
-            self._in_ids = data['_in_ids']
-            self._in_ranks = [self.rank_to_id[:i] for i in self._in_ids]
-            self._in_port_dict = data['_in_port_dict']
-            self._in_port_dict_ids = data['_in_port_dict_ids']
-            for in_id in self._in_ids:
-                if not isinstance(self._in_port_dict_ids['gpot'][in_id],
-                                  gpuarray.GPUArray):
-                    self._in_port_dict_ids['gpot'][in_id] = \
-                        gpuarray.to_gpu(self._in_port_dict_ids['gpot'][in_id])
-                if not isinstance(self._in_port_dict_ids['spike'][in_id],
-                                  gpuarray.GPUArray):
-                    self._in_port_dict_ids['spike'][in_id] = \
-                        gpuarray.to_gpu(self._in_port_dict_ids['spike'][in_id])
-        else:
-            self.log_info('no cached port data found - generating')
-            self._init_port_dicts()            
-            with env.begin(write=True) as txn:
-                data = dill.dumps({'_in_ids': self._in_ids,
-                                   '_in_port_dict': self._in_port_dict,
-                                   '_in_port_dict_ids': self._in_port_dict_ids,
-                                   '_out_ids': self._out_ids,
-                                   '_out_port_dict': self._out_port_dict,
-                                   '_out_port_dict_ids': self._out_port_dict_ids})
-                txn.put(self.id, data)
-
-        # Initialize GPU transmission buffers:
-        self._init_comm_bufs()
-
-        # Start timing the main loop:
-        if self.time_sync:
-            self.intercomm.isend(['start_time', (self.rank, time.time())],
-                                 dest=0, tag=self._ctrl_tag)
-            self.log_info('sent start time to manager')
-
 class MyManager(Manager):
     """
     Manager that can use Multi-Process Service.
@@ -142,17 +80,19 @@ class MyManager(Manager):
     use_mps : bool
         If True, use Multi-Process Service so that multiple MPI processes
         can use the same GPUs concurrently.
+    plan_cache : str
+        Directory of on-disk cache of compiled exchange plans.
     """
 
-    def __init__(self, use_mps=False):
-        super(MyManager, self).__init__()
+    def __init__(self, use_mps=False, plan_cache=None):
+        super(MyManager, self).__init__(plan_cache=plan_cache)
 
         if use_mps:
             self._mps_man = cudamps.MultiProcessServiceManager()
         else:
             self._mps_man = None
 
-    def spawn(self, part_map):
+    def spawn(self, part_map, affinity=None):
         """
         Spawn MPI processes for and execute each of the managed targets.
 
@@ -160,9 +100,13 @@ class MyManager(Manager):
         ----------
         part_map : dict
             Maps GPU ID to list of target MPI ranks.
+        affinity : str or dict
+            CPU placement of the manager and the targets; see
+            `ProcessManager.spawn()`.
         """
 
         if self._is_parent:
+            self._pin_manager(affinity)
 
             # The number of GPUs over which the targets are partitioned may not
             # exceed the actual number of supported devices:
@@ -224,14 +168,17 @@ class MyManager(Manager):
             for i in self._targets.keys():
                 self._intercomm.send(twiggy.emitters, i)
 
-            # Next, serialize the routing table ONCE and then transmit it to all
-            # of the child nodes:
-            self._intercomm.bcast(self.routing_table, root=MPI.ROOT)
+            # Next, transmit to each of the child nodes only the part of the
+            # routing table that it requires:
+            req = MPI.Request()
+            r_list = []
+            for i in self._targets.keys():
+                r_list.append(self._intercomm.isend(self.get_routing_table(i), i))
+            req.Waitall(r_list)
 
             # Transmit class to instantiate, globals required by the class, and
             # the constructor arguments; the backend will wait to receive
             # them and then start running the targets on the appropriate nodes.
-            req = MPI.Request()
             r_list = []
             for i in self._targets.keys():
                 target_globals = all_global_vars(self._targets[i])
@@ -240,7 +187,8 @@ class MyManager(Manager):
                 # sometimes if atexit._exithandlers contains an unserializable function:
                 if 'atexit' in target_globals:
                     del target_globals['atexit']
-                data = (self._targets[i], target_globals, self._kwargs[i])
+                data = (self._targets[i], target_globals, self._kwargs[i], {},
+                        self._target_cpus(affinity, i))
                 r_list.append(self._intercomm.isend(data, i))
 
                 # Need to clobber data to prevent all_global_vars from
@@ -383,39 +331,17 @@ def partition(mat, n_parts):
         and the values are the lists of nodes in each partition.
     """
     
-    # Combine weights of directed edges to obtain undirected graph:
-    mat = mat+mat.T
-
-    # Convert matrix into METIS-compatible form:
-    g = nx.from_numpy_matrix(np.array(mat, dtype=[('weight', int)])) 
-    n = g.number_of_nodes()
-    e = g.number_of_edges()
-    xadj = np.empty(n+1, int)
-    adjncy = np.empty(2*e, int)
-    eweights = np.empty(2*e, int)
-    end_node = 0
-    xadj[0] = 0
-    for i in g.node:
-        for j, a in g.edge[i].items():
-            adjncy[end_node] = j
-            eweights[end_node] = a['weight']
-            end_node += 1
-        xadj[i+1] = end_node
-
-    # Compute edge-cut partition:
-    with warnings.catch_warnings():
-        warnings.simplefilter('ignore')
-        cutcount, part_vert = pymetis.part_graph(n_parts, xadj=xadj,
-                                                 adjncy=adjncy, eweights=eweights)
+    # Partition the LPUs over equally sized groups so as to minimize the
+    # number of ports connected between groups:
+    part_vert = placement.partition(mat, placement.block_sizes(len(mat), n_parts))
 
     # Find nodes in each partition:
     part_map = {}
-    for i, p in enumerate(set(part_vert)):
-        ind = np.where(np.array(part_vert) == p)[0]
-        part_map[p] = ind
+    for p in set(part_vert):
+        part_map[p] = np.where(part_vert == p)[0]
     return part_map
 
-def emulate(conn_mat, scaling, n_gpus, steps, use_mps, cache_file='cache.db'):
+def emulate(conn_mat, scaling, n_gpus, steps, use_mps, plan_cache='plan_cache'):
     """
     Benchmark inter-LPU communication throughput.
 
@@ -434,6 +360,8 @@ def emulate(conn_mat, scaling, n_gpus, steps, use_mps, cache_file='cache.db'):
         Number of steps to execute.
     use_mps : bool
         Use Multi-Process Service if True.
+    plan_cache : str
+        Directory of on-disk cache of compiled exchange plans.
 
     Returns
     -------
@@ -447,7 +375,7 @@ def emulate(conn_mat, scaling, n_gpus, steps, use_mps, cache_file='cache.db'):
     start_all = time.time()
 
     # Set up manager:
-    man = MyManager(use_mps)
+    man = MyManager(use_mps, plan_cache)
 
     # Generate selectors for configuring modules and patterns:
     mod_sels, pat_sels = gen_sels(conn_mat, scaling)
@@ -466,36 +394,22 @@ def emulate(conn_mat, scaling, n_gpus, steps, use_mps, cache_file='cache.db'):
                 CTRL_TAG, GPOT_TAG, SPIKE_TAG, device=rank_to_gpu_map[i],
                 time_sync=True)
 
-    # Set up connections between module pairs:
-    env = lmdb.open(cache_file, map_size=10**10)
-    with env.begin() as txn:
-        data = txn.get('routing_table')
-    if data is not None:
-        man.log_info('loading cached routing table')
-        routing_table = dill.loads(data)
-
-        # Don't replace man.routing_table outright because its reference is
-        # already in the dict of named args to transmit to the child MPI process:
-        for c in routing_table.connections:
-            man.routing_table[c] = routing_table[c]
-    else:
-        man.log_info('no cached routing table found - generating')
-        for lpu_i, lpu_j in pat_sels.keys():
-            sel_from, sel_to, sel_in_i, sel_out_i, sel_gpot_i, sel_spike_i, \
-                sel_in_j, sel_out_j, sel_gpot_j, sel_spike_j = pat_sels[(lpu_i, lpu_j)]
-            pat = Pattern.from_concat(sel_from, sel_to,
-                                      from_sel=sel_from, to_sel=sel_to, data=1, validate=False)
-            pat.interface[sel_in_i, 'interface', 'io'] = [0, 'in']
-            pat.interface[sel_out_i, 'interface', 'io'] = [0, 'out']
-            pat.interface[sel_gpot_i, 'interface', 'type'] = [0, 'gpot']
-            pat.interface[sel_spike_i, 'interface', 'type'] = [0, 'spike']
-            pat.interface[sel_in_j, 'interface', 'io'] = [1, 'in']
-            pat.interface[sel_out_j, 'interface', 'io'] = [1, 'out']
-            pat.interface[sel_gpot_j, 'interface', 'type'] = [1, 'gpot']
-            pat.interface[sel_spike_j, 'interface', 'type'] = [1, 'spike']
-            man.connect(lpu_i, lpu_j, pat, 0, 1, compat_check=False)
-        with env.begin(write=True) as txn:
-            txn.put('routing_table', dill.dumps(man.routing_table))
+    # Set up connections between module pairs; the compiled exchange plans of
+    # unchanged connections are loaded from the cache:
+    for lpu_i, lpu_j in pat_sels.keys():
+        sel_from, sel_to, sel_in_i, sel_out_i, sel_gpot_i, sel_spike_i, \
+            sel_in_j, sel_out_j, sel_gpot_j, sel_spike_j = pat_sels[(lpu_i, lpu_j)]
+        pat = Pattern.from_concat(sel_from, sel_to,
+                                  from_sel=sel_from, to_sel=sel_to, data=1, validate=False)
+        pat.interface[sel_in_i, 'interface', 'io'] = [0, 'in']
+        pat.interface[sel_out_i, 'interface', 'io'] = [0, 'out']
+        pat.interface[sel_gpot_i, 'interface', 'type'] = [0, 'gpot']
+        pat.interface[sel_spike_i, 'interface', 'type'] = [0, 'spike']
+        pat.interface[sel_in_j, 'interface', 'io'] = [1, 'in']
+        pat.interface[sel_out_j, 'interface', 'io'] = [1, 'out']
+        pat.interface[sel_gpot_j, 'interface', 'type'] = [1, 'gpot']
+        pat.interface[sel_spike_j, 'interface', 'type'] = [1, 'spike']
+        man.connect(lpu_i, lpu_j, pat, 0, 1)
 
     man.spawn(part_map)
     start_main = time.time()
@@ -507,7 +421,6 @@ def emulate(conn_mat, scaling, n_gpus, steps, use_mps, cache_file='cache.db'):
 
 if __name__ == '__main__':
     import neurokernel.mpi_relaunch
-    import get_index_order
 
     conn_mat_file = 's2.xlsx'
     scaling = 1
@@ -555,7 +468,7 @@ if __name__ == '__main__':
 
     # Get order in which LPUs (denoted by index into `conn_mat`) should be added
     # to maximize added number of ports for each additional LPU:
-    ind_order = get_index_order.get_index_order(conn_mat)
+    ind_order = placement.order(conn_mat)
     
     # Make sure specified number of LPUs to partition over GPUs is at least as
     # large as the number of GPUs and no larger than the list of allowed LPUs
@@ -5,25 +5,34 @@ Core Neurokernel classes.
 """
 
 import atexit
+import errno
+import numbers
+import os
 import time
 
 import bidict
 from mpi4py import MPI
 import numpy as np
+import pandas as pd
 import twiggy
 
 from ctx_managers import IgnoreKeyboardInterrupt, OnKeyboardInterrupt, \
      ExceptionOnSignal, TryExceptionOnSignal
 from mixins import LoggerMixin
 import mpi
+from mpi_proc import import_target, target_ref
 from tools.gpu import bufint
 from tools.logging import setup_logger
-from tools.misc import catch_exception, dtype_to_mpi, renumber_in_order
+from tools.misc import catch_exception, dtype_to_mpi
 from tools.mpi import MPIOutput
 from pattern import Interface, Pattern
+import plan
 from plsel import Selector, SelectorMethods
-from pm import BasePortMapper, PortMapper
+from injector import Injector
+from pm import PortMapper
+from recorder import Recorder
 from routing_table import RoutingTable
+from shm import SharedBuffers
 from uid import uid
 
 CTRL_TAG = 1
@@ -201,6 +210,141 @@ class Module(mpi.Worker):
         # MPI Request object for resolving asynchronous transfers:
         self.req = MPI.Request()
 
+        # Recorder of port data (created when ports are first recorded):
+        self._recorder = None
+
+        # Sources of streamed input port data:
+        self._injectors = []
+
+        # Directory containing checkpoint from which to restart (set by the
+        # manager):
+        self.restart = None
+
+        # Port data and model state restored by reset():
+        self._initial_state = None
+
+        # ModuleGroup instance running the module in the same process as
+        # other modules (set by the group):
+        self.host = None
+
+        # If True, data transmitted to modules in other processes on the same
+        # host is exchanged via shared memory (set by the manager):
+        self.shared_mem = False
+        self._shm = None
+
+        # Method used to exchange data with modules in other processes; either
+        # 'p2p' (point-to-point messages) or 'neighbor' (a neighborhood
+        # collective over a distributed graph communicator) (set by the
+        # manager):
+        self.exchange = 'p2p'
+        self._graph_comm = None
+
+    def inject(self, selector, file_name, dataset=None, prefetch=256, **kwargs):
+        """
+        Stream input data from a file into the specified ports.
+
+        The data is read from a memory-mapped `.npy` file or HDF5 dataset with
+        shape `(steps, ports)` by a background thread that prefetches
+        `prefetch` steps ahead; at the beginning of each execution step, the
+        next row of data is copied into the ports.
+
+        Parameters
+        ----------
+        selector : str, unicode, or sequence
+            Selector describing the ports into which data is injected. All of
+            the ports must be either graded potential or spiking input ports.
+        file_name : str
+            Name of `.npy` or HDF5 file containing the input data.
+        dataset : str
+            Name of the HDF5 dataset containing the input data.
+        prefetch : int
+            Number of steps to prefetch.
+        kwargs : dict
+            Additional options to pass to `neurokernel.injector.Injector`.
+
+        Notes
+        -----
+        The columns of the input data are injected into the ports in the order
+        of the module's port data array. Once all of the input data has been
+        injected, the port values are no longer modified.
+        """
+
+        if not SelectorMethods.is_in(selector, self.in_ports):
+            raise ValueError('data can only be injected into input ports')
+        if SelectorMethods.is_in(selector, self.spike_ports):
+            t = 'spike'
+        elif SelectorMethods.is_in(selector, self.gpot_ports):
+            t = 'gpot'
+        else:
+            raise ValueError('selector must comprise either graded potential '
+                             'or spiking ports in the module\'s interface')
+        inds = np.sort(self.pm[t].ports_to_inds(selector))
+        self._injectors.append(Injector(file_name, self.data[t], inds,
+                                        dataset, prefetch, **kwargs))
+        self.log_info('injecting data from %s into %s ports %s' % \
+                      (file_name, t, selector))
+
+    def record(self, selector, every=1, sparse=None, name=None,
+               file_name=None, **kwargs):
+        """
+        Record the values of the specified ports to an HDF5 file.
+
+        The port values are copied into a staging buffer after each recorded
+        execution step and written to the file by a background thread.
+
+        Parameters
+        ----------
+        selector : str, unicode, or sequence
+            Selector describing the ports to record. All of the ports must be
+            either graded potential or spiking ports.
+        every : int
+            Record the port values every `every` execution steps.
+        sparse : bool
+            If True, only record the indices of ports with nonzero values,
+            e.g., spike events. If None, spiking ports are recorded sparsely
+            and graded potential ports are recorded densely.
+        name : str
+            Name of the HDF5 group in which the data is stored. If None, the
+            selector string is used (which results in nested groups).
+        file_name : str
+            Name of the HDF5 file to create when ports are first recorded. If
+            None, the file is named after the module ID.
+        kwargs : dict
+            Options to pass to `neurokernel.recorder.Recorder` when ports are
+            first recorded.
+
+        Notes
+        -----
+        Ports are recorded in the order of the module's port data array.
+        """
+
+        if SelectorMethods.is_in(selector, self.spike_ports):
+            t = 'spike'
+        elif SelectorMethods.is_in(selector, self.gpot_ports):
+            t = 'gpot'
+        else:
+            raise ValueError('selector must comprise either graded potential '
+                             'or spiking ports in the module\'s interface')
+        if sparse is None:
+            sparse = t == 'spike'
+        if name is None:
+            name = str(selector)
+
+        inds = np.sort(self.pm[t].ports_to_inds(selector))
+
+        # Strip the blank entries used to pad identifiers with fewer levels
+        # before converting them to strings:
+        ports = [SelectorMethods.to_identifier(tuple(x for x in \
+                     (p if type(p) == tuple else (p,)) if x != '')) \
+                 for p in self.pm[t].inds_to_ports(inds)]
+
+        if self._recorder is None:
+            if file_name is None:
+                file_name = '%s.h5' % self.id.strip()
+            self._recorder = Recorder(file_name, **kwargs)
+        self._recorder.add(name, self.data[t], inds, ports, every, sparse)
+        self.log_info('recording %s ports %s as %s' % (t, selector, name))
+
     def _init_gpu(self):
         """
         Initialize GPU device.
@@ -227,9 +371,24 @@ class Module(mpi.Worker):
                 atexit.register(self.gpu_ctx.pop)
                 self.log_info('GPU %s initialized' % self.device)
 
+    def _get_proc_rank(self, id):
+        """
+        Return the MPI rank of the process running the specified module.
+        """
+
+        if self.host is not None:
+            return self.host.proc_ranks[id]
+        return self.rank_to_id.inv[id]
+
     def _init_port_dicts(self):
         """
         Initial dictionaries of source/destination ports in current module.
+
+        Notes
+        -----
+        If the manager compiled the exchange plans of the module's connections,
+        they are used directly; otherwise, they are compiled from the patterns
+        in the routing table.
         """
 
         # Extract identifiers of source ports in the current module's interface
@@ -238,24 +397,23 @@ class Module(mpi.Worker):
         self._out_port_dict_ids['gpot'] = {}
         self._out_port_dict_ids['spike'] = {}
 
-        self._out_ids = self.routing_table.dest_ids(self.id)
-        self._out_ranks = [self.rank_to_id.inv[i] for i in self._out_ids]
+        # The identifiers are sorted so that the messages transmitted between
+        # any two processes are posted in the same order by both:
+        self._out_ids = sorted(self.routing_table.dest_ids(self.id))
+        self._out_ranks = [self._get_proc_rank(i) for i in self._out_ids]
         for out_id in self._out_ids:
             self.log_info('extracting output ports for %s' % out_id)
 
-            # Get interfaces of pattern connecting the current module to
-            # destination module `out_id`; `int_0` is connected to the
-            # current module, `int_1` is connected to the other module:
-            pat = self.routing_table[self.id, out_id]['pattern']
-            int_0 = self.routing_table[self.id, out_id]['int_0']
-            int_1 = self.routing_table[self.id, out_id]['int_1']
-
-            # Get ports in interface (`int_0`) connected to the current
-            # module that are connected to the other module via the pattern:
-            self._out_port_dict_ids['gpot'][out_id] = \
-                self.pm['gpot'].ports_to_inds(pat.src_idx(int_0, int_1, 'gpot', 'gpot'))
-            self._out_port_dict_ids['spike'][out_id] = \
-                self.pm['spike'].ports_to_inds(pat.src_idx(int_0, int_1, 'spike', 'spike'))
+            # Get ports in the interface connected to the current module that
+            # are connected to the other module via the pattern:
+            conn = self.routing_table[self.id, out_id]
+            if 'src_plan' in conn:
+                src_plan = conn['src_plan']
+            else:
+                src_plan = plan.compile_src(conn['pattern'], conn['int_0'],
+                                            conn['int_1'], self.pm)
+            self._out_port_dict_ids['gpot'][out_id] = src_plan['gpot']
+            self._out_port_dict_ids['spike'][out_id] = src_plan['spike']
 
         # Extract identifiers of destination ports in the current module's
         # interface for all modules sending input to the current module:
@@ -275,40 +433,24 @@ class Module(mpi.Worker):
         self._in_buf_len['gpot'] = {}
         self._in_buf_len['spike'] = {}
 
-        self._in_ids = self.routing_table.src_ids(self.id)
-        self._in_ranks = [self.rank_to_id.inv[i] for i in self._in_ids]
+        self._in_ids = sorted(self.routing_table.src_ids(self.id))
+        self._in_ranks = [self._get_proc_rank(i) for i in self._in_ids]
         for in_id in self._in_ids:
             self.log_info('extracting input ports for %s' % in_id)
 
-            # Get interfaces of pattern connecting the current module to
-            # source module `in_id`; `int_1` is connected to the current
-            # module, `int_0` is connected to the other module:
-            pat = self.routing_table[in_id, self.id]['pattern']
-            int_0 = self.routing_table[in_id, self.id]['int_0']
-            int_1 = self.routing_table[in_id, self.id]['int_1']
-
-            # Get ports in interface (`int_1`) connected to the current
-            # module that are connected to the other module via the pattern:
-            self._in_port_dict_ids['gpot'][in_id] = \
-                self.pm['gpot'].ports_to_inds(pat.dest_idx(int_0, int_1, 'gpot', 'gpot'))
-            self._in_port_dict_ids['spike'][in_id] = \
-                self.pm['spike'].ports_to_inds(pat.dest_idx(int_0, int_1, 'spike', 'spike'))
-
-			# Get the integer indices associated with the connected source ports
-            # in the pattern interface connected to the source module `in_d`;
-            # these are needed to copy received buffer contents into the current
-            # module's port map data array:
-            self._in_port_dict_buf_ids['gpot'][in_id] = \
-                np.array(renumber_in_order(BasePortMapper(pat.gpot_ports(int_0).to_tuples()).
-                        ports_to_inds(pat.src_idx(int_0, int_1, 'gpot', 'gpot', duplicates=True))))            
-            self._in_port_dict_buf_ids['spike'][in_id] = \
-                np.array(renumber_in_order(BasePortMapper(pat.spike_ports(int_0).to_tuples()).
-                        ports_to_inds(pat.src_idx(int_0, int_1, 'spike', 'spike', duplicates=True))))
-            
-            # The size of the input buffer to the current module must be the
-            # same length as the output buffer of module `in_id`:
-            self._in_buf_len['gpot'][in_id] = len(pat.src_idx(int_0, int_1, 'gpot', 'gpot'))
-            self._in_buf_len['spike'][in_id] = len(pat.src_idx(int_0, int_1, 'spike', 'spike'))
+            # Get ports in the interface connected to the current module that
+            # are connected to the other module via the pattern, and the
+            # indices needed to copy received buffer contents into them:
+            conn = self.routing_table[in_id, self.id]
+            if 'dest_plan' in conn:
+                dest_plan = conn['dest_plan']
+            else:
+                dest_plan = plan.compile_dest(conn['pattern'], conn['int_0'],
+                                              conn['int_1'], self.pm)
+            for t in ['gpot', 'spike']:
+                self._in_port_dict_ids[t][in_id] = dest_plan[t]['inds']
+                self._in_port_dict_buf_ids[t][in_id] = dest_plan[t]['buf_inds']
+                self._in_buf_len[t][in_id] = dest_plan[t]['buf_len']
 
     def _init_comm_bufs(self):
         """
@@ -387,80 +529,205 @@ class Module(mpi.Worker):
             else:
                 self._out_buf['spike'][out_id] = None
 
-    def _sync(self):
+        # Pairs of shared memory buffers that replace the transmission
+        # buffers of connections to modules on the same host, keyed by port
+        # type and module ID:
+        self._shm_send = {'gpot': {}, 'spike': {}}
+        self._shm_recv = {'gpot': {}, 'spike': {}}
+
+    def _shm_specs(self):
         """
-        Send output data and receive input data.
+        Return the buffers that may be transmitted via shared memory.
+
+        Returns
+        -------
+        specs : list of tuple
+            Source module ID, destination module ID, port type, destination
+            rank, number of elements, and dtype of each buffer transmitted to
+            a module in another process.
         """
 
-        if self.time_sync:
-            start = time.time()
-        requests = []
+        specs = []
+        for dest_id, dest_rank in zip(self._out_ids, self._out_ranks):
+            if self.host is not None and dest_id in self.host.module_ids:
+                continue
+            for t in ['gpot', 'spike']:
+                if self._out_buf[t][dest_id] is not None:
+                    specs.append((self.id, dest_id, t, dest_rank,
+                                  len(self._out_buf[t][dest_id]),
+                                  self._out_buf[t][dest_id].dtype))
+        return specs
+
+    def _use_shm(self, shm):
+        """
+        Use the shared memory buffers of the module's connections.
+
+        Parameters
+        ----------
+        shm : neurokernel.shm.SharedBuffers
+            Buffers shared by the processes on the host.
+        """
+
+        for (src_id, dest_id, t), bufs in shm.send_bufs.iteritems():
+            if src_id == self.id:
+                self._shm_send[t][dest_id] = bufs
+        for (src_id, dest_id, t), bufs in shm.recv_bufs.iteritems():
+            if dest_id == self.id:
+                self._shm_recv[t][src_id] = bufs
+        if shm.enabled:
+            self.log_info('exchanging data with %s via shared memory' % \
+                          sorted(set(self._shm_send['gpot'].keys()+
+                                     self._shm_send['spike'].keys()+
+                                     self._shm_recv['gpot'].keys()+
+                                     self._shm_recv['spike'].keys())))
+
+    def _init_graph_comm(self):
+        """
+        Fuse the transmission buffers and create a distributed graph communicator.
+
+        The buffers transmitted to (or received from) each neighboring process
+        are placed contiguously in a single send (or receive) arena in the
+        order of the neighbors so that all data can be exchanged with a
+        single `Neighbor_alltoallv()` call. Edges of the process graph are
+        weighted by the number of bytes transmitted over them at every step,
+        and MPI is allowed to reorder the processes.
+
+        Notes
+        -----
+        Must be executed after `_init_comm_bufs()` by all modules.
+        """
+
+        def fuse(bufs, ids):
+            # Byte offset of each buffer in the arena, aligned for its dtype:
+            layout = []
+            counts = []
+            displs = []
+            nbytes = 0
+            for id in ids:
+                displs.append(nbytes)
+                for t in ['gpot', 'spike']:
+                    if bufs[t][id] is not None:
+                        nbytes = -(-nbytes//8)*8
+                        layout.append((t, id, nbytes))
+                        nbytes += bufs[t][id].nbytes
+                counts.append(nbytes-displs[-1])
+            arena = np.zeros(nbytes, np.uint8)
+            for t, id, offset in layout:
+                buf = bufs[t][id]
+                bufs[t][id] = \
+                    arena[offset:offset+buf.nbytes].view(buf.dtype)
+            return arena, counts, displs
+
+        # Neighbors are ordered by rank:
+        dests = [id for rank, id in sorted(zip(self._out_ranks, self._out_ids))]
+        srcs = [id for rank, id in sorted(zip(self._in_ranks, self._in_ids))]
+        self._send_arena, send_counts, send_displs = fuse(self._out_buf, dests)
+        self._recv_arena, recv_counts, recv_displs = fuse(self._in_buf, srcs)
+        self._send_spec = [self._send_arena, (send_counts, send_displs),
+                           MPI.BYTE]
+        self._recv_spec = [self._recv_arena, (recv_counts, recv_displs),
+                           MPI.BYTE]
+        self._graph_comm = self.intracomm.Create_dist_graph_adjacent(
+            [self._get_proc_rank(id) for id in srcs],
+            [self._get_proc_rank(id) for id in dests],
+            recv_counts, send_counts, reorder=True)
+        self.log_info('created distributed graph communicator with %s sources '
+                      'and %s destinations' % (len(srcs), len(dests)))
+
+    def _sync_sends(self):
+        """
+        Copy output port data into the buffers transmitted to other modules.
+
+        Data transmitted to modules running in the same process is copied
+        directly into their receive buffers; data transmitted to modules on
+        the same host via shared memory is copied directly into the shared
+        buffer selected by the parity of the current step.
+
+        Returns
+        -------
+        sends : list of tuple
+            Source module ID, destination module ID, MPI tag, destination
+            rank, and buffer specification of each buffer that must be
+            transmitted via MPI.
+        """
+
+        sends = []
 
         # For each destination module, extract elements from the current
-        # module's port data array, copy them to a contiguous array, and
-        # transmit the latter:
+        # module's port data array and copy them to a contiguous array:
         for dest_id, dest_rank in zip(self._out_ids, self._out_ranks):
-
-            # Copy data into destination buffer:
-            if self._out_buf['gpot'][dest_id] is not None:
-                self._out_buf['gpot'][dest_id][:] = \
-                    self.data['gpot'][self._out_port_dict_ids['gpot'][dest_id]]
-                if not self.time_sync:
-                    self.log_info('gpot data sent to %s: %s' % \
-                                  (dest_id, str(self._out_buf['gpot'][dest_id])))
-                r = MPI.COMM_WORLD.Isend([self._out_buf_int['gpot'][dest_id],
-                                          self._out_buf_mtype['gpot'][dest_id]],
-                                         dest_rank, GPOT_TAG)
-                requests.append(r)
-            if self._out_buf['spike'][dest_id] is not None:
-                self._out_buf['spike'][dest_id][:] = \
-                    self.data['spike'][self._out_port_dict_ids['spike'][dest_id]]
+            local = self.host is not None and dest_id in self.host.module_ids
+            for t, tag in [('gpot', GPOT_TAG), ('spike', SPIKE_TAG)]:
+                if self._out_buf[t][dest_id] is None:
+                    continue
+                shared = dest_id in self._shm_send[t]
+                if shared:
+                    buf = self._shm_send[t][dest_id][self.steps % 2]
+                else:
+                    buf = self._out_buf[t][dest_id]
+                buf[:] = self.data[t][self._out_port_dict_ids[t][dest_id]]
                 if not self.time_sync:
-                    self.log_info('spike data sent to %s: %s' % \
-                                  (dest_id, str(self._out_buf['spike'][dest_id])))
-                r = MPI.COMM_WORLD.Isend([self._out_buf_int['spike'][dest_id],
-                                          self._out_buf_mtype['spike'][dest_id]],
-                                         dest_rank, SPIKE_TAG)
-                requests.append(r)
+                    self.log_info('%s data sent to %s: %s' % \
+                                  (t, dest_id, str(buf)))
+                if local:
+                    self.host.modules[dest_id]._in_buf[t][self.id][:] = buf
+                elif not shared:
+                    sends.append((self.id, dest_id, tag, dest_rank,
+                                  [self._out_buf_int[t][dest_id],
+                                   self._out_buf_mtype[t][dest_id]]))
             if not self.time_sync:
                 self.log_info('sending to %s' % dest_id)
-        if not self.time_sync:
-            self.log_info('sent all data from %s' % self.id)
+        return sends
+
+    def _sync_recvs(self):
+        """
+        Return the buffers that must receive data from other modules via MPI.
+
+        Returns
+        -------
+        recvs : list of tuple
+            Source module ID, destination module ID, MPI tag, source rank, and
+            buffer specification of each buffer that must be received.
+        """
 
-        # For each source module, receive elements and copy them into the
-        # current module's port data array:
+        recvs = []
         for src_id, src_rank in zip(self._in_ids, self._in_ranks):
-            if self._in_buf['gpot'][src_id] is not None:
-                r = MPI.COMM_WORLD.Irecv([self._in_buf_int['gpot'][src_id],
-                                          self._in_buf_mtype['gpot'][src_id]],
-                                         source=src_rank, tag=GPOT_TAG)
-                requests.append(r)
-            if self._in_buf['spike'][src_id] is not None:
-                r = MPI.COMM_WORLD.Irecv([self._in_buf_int['spike'][src_id],
-                                          self._in_buf_mtype['spike'][src_id]],
-                                         source=src_rank, tag=SPIKE_TAG)
-                requests.append(r)
+            if self.host is not None and src_id in self.host.module_ids:
+                continue
+            for t, tag in [('gpot', GPOT_TAG), ('spike', SPIKE_TAG)]:
+                if self._in_buf[t][src_id] is not None and \
+                   src_id not in self._shm_recv[t]:
+                    recvs.append((src_id, self.id, tag, src_rank,
+                                  [self._in_buf_int[t][src_id],
+                                   self._in_buf_mtype[t][src_id]]))
             if not self.time_sync:
                 self.log_info('receiving from %s' % src_id)
-        if requests:
-            self.req.Waitall(requests)
-        if not self.time_sync:
-            self.log_info('all data were received by %s' % self.id)
+        return recvs
+
+    def _sync_finish(self, start=None):
+        """
+        Copy received data into the input ports.
+
+        Parameters
+        ----------
+        start : float
+            Time at which synchronization started; only used if `time_sync`
+            is True.
+        """
 
         # Copy received elements into the current module's data array:
         for src_id in self._in_ids:
-            if self._in_buf['gpot'][src_id] is not None:
-                if not self.time_sync:
-                    self.log_info('gpot data received from %s: %s' % \
-                                  (src_id, str(self._in_buf['gpot'][src_id])))
-                self.data['gpot'][self._in_port_dict_ids['gpot'][src_id]] = \
-                    self._in_buf['gpot'][src_id][self._in_port_dict_buf_ids['gpot'][src_id]]
-            if self._in_buf['spike'][src_id] is not None:
-                if not self.time_sync:
-                    self.log_info('spike data received from %s: %s' % \
-                                  (src_id, str(self._in_buf['spike'][src_id])))
-                self.data['spike'][self._in_port_dict_ids['spike'][src_id]] = \
-                    self._in_buf['spike'][src_id][self._in_port_dict_buf_ids['spike'][src_id]]
+            for t in ['gpot', 'spike']:
+                if self._in_buf[t][src_id] is not None:
+                    if src_id in self._shm_recv[t]:
+                        buf = self._shm_recv[t][src_id][self.steps % 2]
+                    else:
+                        buf = self._in_buf[t][src_id]
+                    if not self.time_sync:
+                        self.log_info('%s data received from %s: %s' % \
+                                      (t, src_id, str(buf)))
+                    self.data[t][self._in_port_dict_ids[t][src_id]] = \
+                        buf[self._in_port_dict_buf_ids[t][src_id]]
 
         # Save timing data:
         if self.time_sync:
@@ -468,17 +735,174 @@ class Module(mpi.Worker):
             n_gpot = 0
             n_spike = 0
             for src_id in self._in_ids:
-                n_gpot += len(self._in_buf['gpot'][src_id])
-                n_spike += len(self._in_buf['spike'][src_id])
+                if self._in_buf['gpot'][src_id] is not None:
+                    n_gpot += len(self._in_buf['gpot'][src_id])
+                if self._in_buf['spike'][src_id] is not None:
+                    n_spike += len(self._in_buf['spike'][src_id])
             self.log_info('sent timing data to master')
-            self.intercomm.isend(['sync_time',
-                                  (self.rank, self.steps, start, stop,
-                                   n_gpot*self.pm['gpot'].dtype.itemsize+\
-                                   n_spike*self.pm['spike'].dtype.itemsize)],
-                                 dest=0, tag=self._ctrl_tag)
+            self.send_ctrl(['sync_time',
+                             (self.rank, self.steps, start, stop,
+                              n_gpot*self.data['gpot'].dtype.itemsize+\
+                              n_spike*self.data['spike'].dtype.itemsize,
+                              self._step_start)])
         else:
             self.log_info('saved all data received by %s' % self.id)
 
+    def _sync(self):
+        """
+        Send output data and receive input data.
+        """
+
+        start = time.time() if self.time_sync else None
+
+        # Exchange the fused output and input buffers of all connections with
+        # a single neighborhood collective:
+        if self._graph_comm is not None:
+            self._sync_sends()
+            self._graph_comm.Neighbor_alltoallv(self._send_spec,
+                                                self._recv_spec)
+            if not self.time_sync:
+                self.log_info('exchanged all data of %s' % self.id)
+            self._sync_finish(start)
+            return
+
+        # Transmit the contents of the output buffers and receive the input
+        # buffers:
+        requests = []
+        for src_id, dest_id, tag, dest_rank, buf in self._sync_sends():
+            requests.append(self.intracomm.Isend(buf, dest_rank, tag))
+        if not self.time_sync:
+            self.log_info('sent all data from %s' % self.id)
+        for src_id, dest_id, tag, src_rank, buf in self._sync_recvs():
+            requests.append(self.intracomm.Irecv(buf, source=src_rank, tag=tag))
+
+        # Wait for the modules on the same host to write their shared
+        # buffers:
+        if self._shm is not None:
+            self._shm.sync()
+        if requests:
+            self.req.Waitall(requests)
+        if not self.time_sync:
+            self.log_info('all data were received by %s' % self.id)
+
+        self._sync_finish(start)
+
+    def get_state(self):
+        """
+        Return model state to save in checkpoints.
+
+        This method should be overridden by child classes whose model state is
+        not stored in the port data arrays.
+
+        Returns
+        -------
+        state : dict of numpy.ndarray
+            Model state arrays keyed by name.
+        """
+
+        return {}
+
+    def set_state(self, state):
+        """
+        Restore model state loaded from a checkpoint.
+
+        This method should be overridden by child classes that override
+        `get_state()`.
+
+        Parameters
+        ----------
+        state : dict of numpy.ndarray
+            Model state arrays keyed by name.
+        """
+
+        pass
+
+    def _checkpoint_file_name(self, path):
+        """
+        Return name of the file in `path` containing the module's state.
+        """
+
+        return os.path.join(path, '%s.npz' % self.id.strip())
+
+    def save_checkpoint(self, path):
+        """
+        Save the module's execution step, port data, input positions, and
+        model state.
+
+        The state is first written to a temporary file that is then renamed
+        so that an interrupted write does not clobber a previous checkpoint.
+
+        Parameters
+        ----------
+        path : str
+            Directory in which to save the state.
+        """
+
+        start = time.time()
+        try:
+            os.makedirs(path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        state = {'steps': np.array(self.steps),
+                 'data_gpot': self.data['gpot'],
+                 'data_spike': self.data['spike'],
+                 'injectors': np.array([injector.tell() for injector in \
+                                        self._injectors], dtype=np.int64)}
+        for k, v in self.get_state().iteritems():
+            state['state_'+k] = v
+        file_name = self._checkpoint_file_name(path)
+        tmp_name = file_name+'.tmp'
+        with open(tmp_name, 'wb') as f:
+            np.savez(f, **state)
+        os.rename(tmp_name, file_name)
+
+        nbytes = os.path.getsize(file_name)
+        self.send_ctrl(['checkpoint_time',
+                        (self.rank, self.steps, time.time()-start, nbytes)])
+        self.log_info('saved checkpoint to %s at step %s' % (file_name, self.steps))
+
+    def load_checkpoint(self, path):
+        """
+        Restore the module's execution step, port data, input positions, and
+        model state.
+
+        Injectors resume streaming their input data from the step reached
+        when the checkpoint was saved; they must therefore be created in the
+        same order as in the emulation that saved the checkpoint.
+
+        Parameters
+        ----------
+        path : str
+            Directory containing the saved state.
+        """
+
+        file_name = self._checkpoint_file_name(path)
+        f = np.load(file_name)
+        try:
+            for t in ['gpot', 'spike']:
+                if f['data_'+t].shape != self.data[t].shape:
+                    raise ValueError('incompatible %s port data in %s' % \
+                                     (t, file_name))
+
+                # The port data arrays must be updated in place because
+                # the port mappers refer to them:
+                self.data[t][:] = f['data_'+t]
+            if 'injectors' in f.files:
+                if len(f['injectors']) != len(self._injectors):
+                    raise ValueError('incompatible number of injectors in %s' % \
+                                     file_name)
+                for injector, step in zip(self._injectors, f['injectors']):
+                    injector.seek(int(step))
+            self.set_state({k[len('state_'):]: f[k] for k in f.files \
+                            if k.startswith('state_')})
+            self.steps = int(f['steps'])
+        finally:
+            f.close()
+        self.log_info('restored checkpoint from %s at step %s' % \
+                      (file_name, self.steps))
+
     def pre_run(self):
         """
         Code to run before main loop.
@@ -495,12 +919,80 @@ class Module(mpi.Worker):
         # Initialize transmission buffers:
         self._init_comm_bufs()
 
+        # Replace the transmission buffers of connections to modules on the
+        # same host with shared memory buffers (unless the buffers were
+        # provided by a runtime that does not use MPI):
+        if self._shm is None and self.shared_mem and self.host is None:
+            self._shm = SharedBuffers(self.intracomm, self._shm_specs())
+        if self._shm is not None:
+            self._use_shm(self._shm)
+
+        if self.exchange == 'neighbor':
+            self._init_graph_comm()
+
+        # Restore state saved by a previous emulation:
+        if self.restart is not None:
+            self.load_checkpoint(self.restart)
+
+        # Save the initial port data, model state, and input positions so
+        # that a persistent module can be reset:
+        if self.persistent:
+            self._initial_state = \
+                ({k: v.copy() for k, v in self.data.iteritems()},
+                 {k: np.copy(v) for k, v in self.get_state().iteritems()},
+                 [injector.tell() for injector in self._injectors])
+
         # Start timing the main loop:
         if self.time_sync:
-            self.intercomm.isend(['start_time', (self.rank, time.time())],
-                                 dest=0, tag=self._ctrl_tag)                
+            self.send_ctrl(['start_time', (self.rank, time.time())])
             self.log_info('sent start time to manager')
 
+    def reset(self):
+        """
+        Restore the state present before the first run.
+
+        The port data, model state, and positions of the injectors are
+        restored, the data transmission buffers are cleared, and any
+        recorded port data is discarded.
+        """
+
+        super(Module, self).reset()
+        if self._initial_state is None:
+            return
+        data, state, positions = self._initial_state
+        for k in data:
+            self.data[k][:] = data[k]
+        self.set_state({k: np.copy(v) for k, v in state.iteritems()})
+
+        # Injectors created after the first run started are rewound to the
+        # beginning of their input data:
+        for i, injector in enumerate(self._injectors):
+            injector.seek(positions[i] if i < len(positions) else 0)
+        if self._recorder is not None:
+            self._recorder.reset()
+
+        # The buffers must be cleared in place because they may be views of
+        # shared memory or referenced by MPI buffer specifications:
+        for bufs in [self._in_buf, self._out_buf]:
+            for t in bufs:
+                for buf in bufs[t].itervalues():
+                    if buf is not None:
+                        buf.fill(0)
+
+    def end_run(self):
+        """
+        Code to run after each emulation run of a persistent module.
+        """
+
+        # Stop timing the main loop:
+        if self.time_sync:
+            self.send_ctrl(['stop_time', (self.rank, time.time())])
+            self.log_info('sent stop time to manager')
+
+        # A module hosted by a group does not report completion itself:
+        if self.host is None:
+            super(Module, self).end_run()
+
     def post_run(self):
         """
         Code to run after main loop.
@@ -513,14 +1005,30 @@ class Module(mpi.Worker):
 
         # Stop timing the main loop before shutting down the emulation:
         if self.time_sync:
-            self.intercomm.isend(['stop_time', (self.rank, time.time())],
-                                 dest=0, tag=self._ctrl_tag)
+            self.send_ctrl(['stop_time', (self.rank, time.time())])
 
             self.log_info('sent stop time to manager')
 
-        # Send acknowledgment message:
-        self.intercomm.isend(['done', self.rank], 0, self._ctrl_tag)
-        self.log_info('done message sent to manager')
+        # Stop streaming input data:
+        for injector in self._injectors:
+            injector.close()
+
+        # Write any port data remaining in the recorder's staging buffers:
+        if self._recorder is not None:
+            self._recorder.close()
+            self.log_info('closed port data recorder')
+
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+        if self._graph_comm is not None:
+            self._graph_comm.Free()
+            self._graph_comm = None
+
+        # Send acknowledgment message unless the module is hosted by a group:
+        if self.host is None:
+            self.send_ctrl(['done', self.rank])
+            self.log_info('done message sent to manager')
 
     def run_step(self):
         """
@@ -554,6 +1062,8 @@ class Module(mpi.Worker):
         control message.
         """
 
+        self._start_step()
+
         # If the debug flag is set, don't catch exceptions so that
         # errors will lead to visible failures:
         if self.debug:
@@ -571,7 +1081,249 @@ class Module(mpi.Worker):
             # Synchronize:
             catch_exception(self._sync, self.log_info)
 
-class Manager(mpi.WorkerManager):
+        self._finish_step()
+
+    def _start_step(self):
+        """
+        Prepare the input ports for an execution step.
+        """
+
+        # Record when the execution step began so that the manager can
+        # distinguish between computation and synchronization time:
+        if self.time_sync:
+            self._step_start = time.time()
+
+        # Copy the current step's streamed input data into the input ports:
+        for injector in self._injectors:
+            injector.update()
+
+    def _finish_step(self):
+        """
+        Record port data after an execution step.
+        """
+
+        # Stage recorded port data; this only blocks if all staging buffers
+        # are waiting to be written:
+        if self._recorder is not None:
+            self._recorder.update(self.steps)
+
+class ModuleGroup(mpi.Worker):
+    """
+    Group of modules executed by a single process.
+
+    At every execution step, the group runs the work method of each of its
+    modules in sequence and then synchronizes all of them at once. Data
+    transmitted between modules in the group is copied directly between their
+    buffers using the same exchange plans as data transmitted between
+    processes; only data transmitted to or from modules in other processes is
+    exchanged via MPI.
+
+    Parameters
+    ----------
+    modules : list of tuple
+        Module class (or a reference to it returned by
+        `neurokernel.mpi_proc.target_ref()`) and constructor arguments of
+        each module in the group.
+    proc_ranks : dict
+        MPI rank of the process running each module keyed by module ID.
+    ctrl_tag : int
+        MPI tag to identify control messages.
+    routing_table : neurokernel.routing_table.RoutingTable
+        Routing table describing the data connections of the modules in the
+        group.
+
+    Attributes
+    ----------
+    modules : dict
+        Module instances keyed by module ID.
+    module_ids : list of str
+        Module IDs in order of execution.
+    """
+
+    def __init__(self, modules, proc_ranks, ctrl_tag=CTRL_TAG,
+                 routing_table=None):
+        super(ModuleGroup, self).__init__(ctrl_tag)
+        self.proc_ranks = proc_ranks
+
+        # Directory containing checkpoint from which to restart (set by the
+        # manager):
+        self.restart = None
+
+        # If True, data transmitted to modules in other processes on the same
+        # host is exchanged via shared memory (set by the manager):
+        self.shared_mem = False
+        self._shm = None
+
+        self.modules = {}
+        self.module_ids = []
+        for target, kwargs in modules:
+            if isinstance(target, basestring):
+                target = import_target(target)
+            kwargs = kwargs.copy()
+            kwargs['routing_table'] = routing_table
+            m = target(**kwargs)
+            m.host = self
+
+            # Modules report data to the manager with the rank assigned to
+            # them by the manager rather than that of the process:
+            m._rank = m.rank_to_id.inv[m.id]
+            self.modules[m.id] = m
+            self.module_ids.append(m.id)
+        self.debug = any([m.debug for m in self.modules.itervalues()])
+
+        # Times at which the current processing step of each module ended:
+        self._step_ends = {id: None for id in self.module_ids}
+
+        # MPI Request object for resolving asynchronous transfers:
+        self.req = MPI.Request()
+
+        LoggerMixin.__init__(self, 'grp %s' % self.rank)
+
+    def _sync(self):
+        """
+        Send output data and receive input data for all modules in the group.
+        """
+
+        sends = []
+        recvs = []
+        for id in self.module_ids:
+            sends.extend(self.modules[id]._sync_sends())
+            recvs.extend(self.modules[id]._sync_recvs())
+
+        # Messages are posted in order of source and destination module ID so
+        # that messages with the same tag transmitted between the same two
+        # processes are matched correctly:
+        requests = []
+        for src_id, dest_id, tag, dest_rank, buf in \
+                sorted(sends, key=lambda x: x[:3]):
+            requests.append(self.intracomm.Isend(buf, dest_rank, tag))
+        for src_id, dest_id, tag, src_rank, buf in \
+                sorted(recvs, key=lambda x: x[:3]):
+            requests.append(self.intracomm.Irecv(buf, source=src_rank, tag=tag))
+        if self._shm is not None:
+            self._shm.sync()
+        if requests:
+            self.req.Waitall(requests)
+
+        # The synchronization of each module is deemed to start when its
+        # processing step ends so that the time spent running the steps of
+        # the group's other modules is counted as waiting time:
+        for id in self.module_ids:
+            self.modules[id]._sync_finish(self._step_ends[id])
+
+    def do_work(self):
+        """
+        Execute a step of all modules in the group.
+        """
+
+        for id in self.module_ids:
+            m = self.modules[id]
+            m.steps = self.steps
+            m._start_step()
+            if m.debug:
+                m.run_step()
+            else:
+                catch_exception(m.run_step, m.log_info)
+            self._step_ends[id] = time.time() if m.time_sync else None
+        if self.debug:
+            self._sync()
+        else:
+            catch_exception(self._sync, self.log_info)
+        for id in self.module_ids:
+            self.modules[id]._finish_step()
+
+    def save_checkpoint(self, path):
+        """
+        Save the state of all modules in the group.
+        """
+
+        for id in self.module_ids:
+            self.modules[id].steps = self.steps
+            self.modules[id].save_checkpoint(path)
+
+    def reset(self):
+        """
+        Reset the state of all modules in the group.
+        """
+
+        super(ModuleGroup, self).reset()
+        for id in self.module_ids:
+            self.modules[id].reset()
+
+    def configure(self, module_id=None, **params):
+        """
+        Change the parameters of the group or of one of its modules.
+
+        Parameters
+        ----------
+        module_id : str
+            ID of module to configure. If None, the group is configured.
+        params : dict
+            Parameter values keyed by name.
+        """
+
+        if module_id is None:
+            super(ModuleGroup, self).configure(**params)
+        else:
+            self.modules[module_id].configure(**params)
+
+    def pre_run(self):
+        """
+        Run the code of all modules in the group before the main loop.
+        """
+
+        super(ModuleGroup, self).pre_run()
+        for id in self.module_ids:
+            m = self.modules[id]
+            m.restart = self.restart
+            m.persistent = self.persistent
+            m.pre_run()
+
+        # All modules in the group resume from the same restored step:
+        if self.module_ids:
+            self.steps = self.modules[self.module_ids[0]].steps
+
+        # The shared memory buffers are allocated for the whole process:
+        if self.shared_mem:
+            specs = []
+            for id in self.module_ids:
+                specs.extend(self.modules[id]._shm_specs())
+            self._shm = SharedBuffers(self.intracomm, specs)
+            for id in self.module_ids:
+                self.modules[id]._use_shm(self._shm)
+
+    def end_run(self):
+        """
+        Run the code of all modules in the group after each emulation run.
+        """
+
+        for id in self.module_ids:
+            self.modules[id].steps = self.steps
+            self.modules[id].end_run()
+        super(ModuleGroup, self).end_run()
+
+    def post_run(self):
+        """
+        Run the code of all modules in the group after the main loop.
+        """
+
+        for id in self.module_ids:
+            self.modules[id].post_run()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+        super(ModuleGroup, self).post_run()
+
+    def run(self):
+        """
+        Body of process.
+        """
+
+        # Don't allow keyboard interruption of process:
+        with IgnoreKeyboardInterrupt():
+            super(ModuleGroup, self).run()
+
+class Manager(plan.ExchangePlanMixin, mpi.WorkerManager):
     """
     Module manager.
 
@@ -579,6 +1331,16 @@ class Manager(mpi.WorkerManager):
     emulation. All modules and connections must be added to a module manager
     instance before they can be run.
 
+    Parameters
+    ----------
+    required_args : list of str
+        Names of arguments that module class constructors must accept.
+    ctrl_tag : int
+        MPI tag to identify control messages.
+    plan_cache : str
+        Directory of on-disk cache of compiled exchange plans. If None, the
+        plans are compiled whenever modules are connected.
+
     Attributes
     ----------
     ctrl_tag : int
@@ -593,7 +1355,7 @@ class Manager(mpi.WorkerManager):
 
     def __init__(self, required_args=['sel', 'sel_in', 'sel_out',
                                       'sel_gpot', 'sel_spike'],
-                 ctrl_tag=CTRL_TAG):
+                 ctrl_tag=CTRL_TAG, plan_cache=None):
         super(Manager, self).__init__(ctrl_tag)
 
         # Required constructor args:
@@ -611,6 +1373,28 @@ class Manager(mpi.WorkerManager):
         # Number of emulation steps to run:
         self.steps = np.inf
 
+        # Timing and throughput data:
+        self._reset_timing()
+
+        # Per-rank checkpoint durations and sizes keyed by execution step:
+        self.checkpoint_times = {}
+
+        # IDs of the modules run by each process and rank of the process
+        # running each module if modules are grouped (set when spawning):
+        self._groups = None
+        self._proc_ranks = None
+
+        # Cache of compiled exchange plans and port mappers used to compile
+        # them:
+        self._init_plans(plan_cache)
+
+        self.log_info('manager instantiated')
+
+    def _reset_timing(self):
+        """
+        Clear timing and throughput data collected during an emulation run.
+        """
+
         # Variables for timing run loop:
         self.start_time = 0.0
         self.stop_time = 0.0
@@ -624,10 +1408,21 @@ class Manager(mpi.WorkerManager):
         # Average step synchronization time:
         self._average_step_sync_time = 0.0
 
+        # Per-rank accumulated computation/synchronization times, counts of
+        # the steps during which each rank was blocked by each of its source
+        # ranks, and per-step load imbalance data (used to construct the
+        # imbalance report):
+        self._rank_times = {}
+        self._blocked_by = {}
+        self._step_imbalance = []
+
+        # Source ranks of each rank (computed from the connectivity in effect
+        # when the first timing data of the run is received):
+        self._src_ranks = None
+
         # Computed throughput (only updated after an emulation run):
         self._average_throughput = 0.0
         self._total_throughput = 0.0
-        self.log_info('manager instantiated')
 
     @property
     def average_step_sync_time(self):
@@ -714,9 +1509,9 @@ class Manager(mpi.WorkerManager):
 
         # Need to associate an ID with each module class
         # to instantiate; because the routing table's can potentially occupy
-        # lots of space, we don't add it to the argument dict here - it is
-        # broadcast to all processes separately and then added to the argument
-        # dict in mpi_backend.py:
+        # lots of space, we don't add it to the argument dict here - the part
+        # required by each process is transmitted to it separately and then
+        # added to the argument dict in mpi_backend.py:
         kwargs['id'] = id
         kwargs['rank_to_id'] = self.rank_to_id
         rank = super(Manager, self).add(target, *args, **kwargs)
@@ -750,21 +1545,299 @@ class Manager(mpi.WorkerManager):
 
         # XXX Need to check for fan-in XXX
 
-        # Store the pattern information in the routing table:
+        # Store the pattern information and the compiled exchange plans in the
+        # routing table:
         self.log_info('updating routing table with pattern')
         if pat.is_connected(0, 1):
-            self.routing_table[id_0, id_1] = {'pattern': pat,
-                                              'int_0': int_0, 'int_1': int_1}
+            self.routing_table[id_0, id_1] = \
+                self._compile_connection(id_0, id_1, pat, int_0, int_1)
         if pat.is_connected(1, 0):
-            self.routing_table[id_1, id_0] = {'pattern': pat,
-                                              'int_0': int_1, 'int_1': int_0}
+            self.routing_table[id_1, id_0] = \
+                self._compile_connection(id_1, id_0, pat, int_1, int_0)
 
         self.log_info('connected modules {0} and {1}'.format(id_0, id_1))
 
+    @property
+    def src_ranks(self):
+        """
+        Ranks of the modules that transmit data to each module.
+
+        Returns
+        -------
+        result : dict of list
+            Maps the rank of each module to the ranks of the modules
+            from which it receives data.
+        """
+
+        return {rank: [self.rank_to_id.inv[i] for i in \
+                       self.routing_table.src_ids(id)] \
+                for rank, id in self.rank_to_id.iteritems()}
+
+    def _update_imbalance(self, steps, step_data):
+        """
+        Update load imbalance statistics with the timing data of a single step.
+
+        Parameters
+        ----------
+        steps : int
+            Execution step.
+        step_data : dict
+            Maps the rank of each module to a tuple containing the
+            start and stop times of its synchronization, the number of bytes it
+            received, and the time at which its execution step began (None if
+            not provided by the module).
+        """
+
+        if self._src_ranks is None:
+            self._src_ranks = self.src_ranks
+
+        compute = {}
+        wait = {}
+        for rank, d in step_data.iteritems():
+            wait[rank] = d[1]-d[0]
+            if d[3] is None:
+                compute[rank] = np.nan
+            else:
+                compute[rank] = d[0]-d[3]
+
+            times = self._rank_times.setdefault(rank, [0.0, 0.0, 0])
+            times[0] += compute[rank]
+            times[1] += wait[rank]
+            times[2] += 1
+
+            # A module that must wait for data during synchronization is
+            # blocked by the source module that began synchronizing last:
+            src_ranks = self._src_ranks.get(rank, [])
+            if src_ranks:
+                blocker = max(src_ranks, key=lambda r: step_data[r][0])
+                if step_data[blocker][0] > d[0]:
+                    blocked = self._blocked_by.setdefault(rank, {})
+                    blocked[blocker] = blocked.get(blocker, 0)+1
+
+        # The imbalance factor of a step is the ratio of the longest to the
+        # average computation time of all modules:
+        compute_times = np.array(compute.values())
+        compute_times = compute_times[~np.isnan(compute_times)]
+        if len(compute_times) and compute_times.mean() > 0:
+            max_compute = compute_times.max()
+            mean_compute = compute_times.mean()
+            factor = max_compute/mean_compute
+        else:
+            max_compute = mean_compute = factor = np.nan
+        self._step_imbalance.append((steps, factor, max_compute, mean_compute,
+                                     max(wait.values())))
+
+    def imbalance_report(self):
+        """
+        Per-module load imbalance report.
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            DataFrame indexed by module rank with columns 'id', 'compute'
+            (average computation time per step), 'wait' (average
+            synchronization time per step), 'wait_frac' (fraction of each step
+            spent synchronizing), 'blocked_by' (ID of the source module that
+            most frequently finished computing after the module), and
+            'blocked_steps' (number of steps during which that source module
+            delayed the module).
+
+        Notes
+        -----
+        Only available if the modules were instantiated with `time_sync` set
+        to True; the first execution step is excluded.
+        """
+
+        columns = ['id', 'compute', 'wait', 'wait_frac',
+                   'blocked_by', 'blocked_steps']
+        data = []
+        for rank in sorted(self._rank_times.keys()):
+            compute, wait, n = self._rank_times[rank]
+            blocked = self._blocked_by.get(rank, {})
+            if blocked:
+                blocker = max(blocked, key=blocked.get)
+                blocked_by = self.rank_to_id[blocker]
+                blocked_steps = blocked[blocker]
+            else:
+                blocked_by = None
+                blocked_steps = 0
+            data.append((self.rank_to_id[rank], compute/n, wait/n,
+                         wait/(compute+wait) if compute+wait > 0 else np.nan,
+                         blocked_by, blocked_steps))
+        return pd.DataFrame(data, index=pd.Index(sorted(self._rank_times.keys()),
+                                                 name='rank'),
+                            columns=columns)
+
+    def step_imbalance(self):
+        """
+        Per-step load imbalance.
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            DataFrame indexed by execution step with columns 'factor' (ratio of
+            the longest to the average module computation time), 'max_compute',
+            'mean_compute', and 'max_wait'.
+        """
+
+        columns = ['factor', 'max_compute', 'mean_compute', 'max_wait']
+        if not self._step_imbalance:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='step'))
+        steps, data = zip(*[(d[0], d[1:]) for d in self._step_imbalance])
+        return pd.DataFrame(list(data), index=pd.Index(steps, name='step'),
+                            columns=columns)
+
+    def spawn(self, restart=None, persistent=False, n_hosts=None,
+              affinity=None, groups=None, shared_mem=False, exchange='p2p',
+              ctrl_every=1, ctrl_idle_interval=0.01):
+        """
+        Spawn MPI processes for and execute each of the managed modules.
+
+        Parameters
+        ----------
+        restart : str
+            If not None, directory containing a checkpoint saved by a previous
+            emulation with the same modules from which each module restores
+            its state before it starts running. The execution steps of a
+            restarted emulation are counted from the start of the emulation
+            that saved the checkpoint, i.e., `start(n)` resumes execution at
+            the saved step and stops after step `n`.
+        persistent : bool
+            If True, the modules keep running after executing the number of
+            steps passed to `start()` so that they can be reset with
+            `reset()`, reconfigured with `configure()`, and started again
+            without being respawned; `quit()` must be called to stop them.
+            If the modules are started again without being reset, they
+            execute the specified number of additional steps.
+        n_hosts : int
+            If not None, reassign the module ranks with `place()` to minimize
+            traffic between the specified number of hosts before spawning.
+        affinity : str or dict
+            CPU placement of the manager and the modules; see
+            `neurokernel.mpi_proc.ProcessManager.spawn()`.
+        groups : int or list of list of str
+            If not None, run several modules in each process with
+            `ModuleGroup`. If an int, each process runs that many modules
+            with consecutive ranks (after any reassignment by `place()`);
+            otherwise, each list contains the IDs of the modules run by one
+            process. Module classes must be importable or serializable
+            without their globals.
+        shared_mem : bool
+            If True, modules exchange data with modules in other processes on
+            the same host via MPI-3 shared memory windows rather than
+            point-to-point messages; see `neurokernel.shm`.
+        exchange : str
+            Method used by the modules to exchange data with modules in other
+            processes. If 'p2p', each buffer is transmitted with a separate
+            point-to-point message; if 'neighbor', all buffers are exchanged
+            at once with a neighborhood collective over a distributed graph
+            communicator created from the routing table. The latter may not
+            be combined with `groups` or `shared_mem`.
+        ctrl_every : int
+            Number of execution steps between checks for control messages by
+            running modules. If None, the number is adapted to the duration
+            of the steps; see `neurokernel.mpi.Worker.run()`.
+        ctrl_idle_interval : float
+            Maximum time in seconds between checks for control messages by
+            idle modules. If None, idle modules block in a probe for the next
+            message, which minimizes the latency with which they respond to
+            it but occupies a CPU with MPI implementations that poll while
+            blocked (e.g., Open MPI).
+        """
+
+        if exchange not in ['p2p', 'neighbor']:
+            raise ValueError('unrecognized exchange method: %s' % exchange)
+        if exchange == 'neighbor' and (groups is not None or shared_mem):
+            raise ValueError('neighborhood exchange cannot be combined with '
+                             'module groups or shared memory')
+        if n_hosts is not None:
+            self.place(n_hosts)
+        if groups is not None:
+            self._group_modules(groups)
+        if restart is not None:
+            self.log_info('restarting from checkpoint %s' % restart)
+        super(Manager, self).spawn(persistent, affinity=affinity,
+                                   restart=restart, shared_mem=shared_mem,
+                                   exchange=exchange, ctrl_every=ctrl_every,
+                                   ctrl_idle_interval=ctrl_idle_interval)
+
+    def _group_modules(self, groups):
+        """
+        Replace the managed modules with groups of modules run by single processes.
+
+        Parameters
+        ----------
+        groups : int or list of list of str
+            Number of modules with consecutive ranks in each group or lists
+            of the IDs of the modules in each group.
+        """
+
+        n = len(self)
+        if isinstance(groups, numbers.Integral):
+            groups = [[self.rank_to_id[rank] for rank in xrange(i, min(i+groups, n))] \
+                      for i in xrange(0, n, groups)]
+        ids = [id for group in groups for id in group]
+        if sorted(ids) != sorted(self.rank_to_id.values()):
+            raise ValueError('each module must be in exactly one group')
+
+        self._proc_ranks = {id: p for p, group in enumerate(groups) \
+                            for id in group}
+        targets = {}
+        kwargs = {}
+        for p, group in enumerate(groups):
+            modules = []
+            for id in group:
+                rank = self.rank_to_id.inv[id]
+                target = self._targets[rank]
+                ref = target_ref(target) if self.import_targets else None
+                modules.append((target if ref is None else ref,
+                                self._kwargs[rank]))
+            targets[p] = ModuleGroup
+            kwargs[p] = {'modules': modules, 'proc_ranks': self._proc_ranks,
+                         'ctrl_tag': self._ctrl_tag}
+            self.log_info('grouping modules %s in process %s' % (group, p))
+        self._groups = groups
+        self._targets = targets
+        self._kwargs = kwargs
+
+    def configure(self, id, **params):
+        """
+        Tell a module to change its parameters.
+
+        Parameters
+        ----------
+        id : str
+            Module identifier.
+        params : dict
+            Parameter values keyed by name.
+        """
+
+        if self._groups is not None:
+            super(Manager, self).configure(self._proc_ranks[id], module_id=id,
+                                           **params)
+        else:
+            super(Manager, self).configure(self.rank_to_id.inv[id], **params)
+
+    def start(self, steps=float('inf')):
+        """
+        Tell the modules to start executing.
+
+        Timing data collected during previous runs is discarded.
+        """
+
+        self._reset_timing()
+        super(Manager, self).start(steps)
+
     def process_worker_msg(self, msg):
 
+        # Process checkpoint timing data sent by workers:
+        if msg[0] == 'checkpoint_time':
+            rank, steps, duration, nbytes = msg[1]
+            self.log_info('checkpoint time data: %s' % str(msg[1]))
+            self.checkpoint_times.setdefault(steps, {})[rank] = (duration, nbytes)
+
         # Process timing data sent by workers:
-        if msg[0] == 'start_time':
+        elif msg[0] == 'start_time':
             rank, start_time = msg[1]
             self.log_info('start time data: %s' % str(msg[1]))
             if start_time < self.start_time or self.start_time == 0.0:
@@ -777,13 +1850,17 @@ class Manager(mpi.WorkerManager):
                 self.stop_time = stop_time
                 self.log_info('setting latest stop time: %s' % stop_time)
         elif msg[0] == 'sync_time':
-            rank, steps, start, stop, nbytes = msg[1]
+            rank, steps, start, stop, nbytes = msg[1][0:5]
+
+            # Modules that do not report the start time of their execution
+            # step only provide synchronization timing data:
+            step_start = msg[1][5] if len(msg[1]) > 5 else None
             self.log_info('sync time data: %s' % str(msg[1]))
 
             # Collect timing data for each execution step:
             if steps not in self.received_data:
                 self.received_data[steps] = {}                    
-            self.received_data[steps][rank] = (start, stop, nbytes)
+            self.received_data[steps][rank] = (start, stop, nbytes, step_start)
 
             # After adding the latest timing data for a specific step, check
             # whether data from all modules has arrived for that step:
@@ -810,6 +1887,8 @@ class Manager(mpi.WorkerManager):
                                                    step_sync_time)/(self.counter+1)
 
                     self.counter += 1
+
+                    self._update_imbalance(steps, self.received_data[steps])
                 else:
 
                     # To exclude the time taken by the first step, set the start
@@ -834,7 +1913,15 @@ class Manager(mpi.WorkerManager):
                       '%s, %s, %s, %s' % \
                       (self.average_step_sync_time, self.average_throughput, 
                        self.total_throughput, self.stop_time-self.start_time))
-        
+
+        # Report load imbalance if timing data was received:
+        if self._rank_times:
+            df = self.step_imbalance()
+            self.log_info('avg/max step imbalance factor: %s, %s' % \
+                          (df['factor'].mean(), df['factor'].max()))
+            for line in self.imbalance_report().to_string().split('\n'):
+                self.log_info(line)
+
 if __name__ == '__main__':
     import neurokernel.mpi_relaunch
 
@@ -19,11 +19,11 @@ from mixins import LoggerMixin
 import mpi
 from tools.gpu import bufint, set_by_inds, set_by_inds_from_inds
 from tools.logging import setup_logger
-from tools.misc import catch_exception, dtype_to_mpi, renumber_in_order
+from tools.misc import catch_exception, dtype_to_mpi
 from tools.mpi import MPIOutput
 from pattern import Interface, Pattern
+import plan
 from plsel import Selector, SelectorMethods
-from pm import BasePortMapper
 from pm_gpu import GPUPortMapper
 from routing_table import RoutingTable
 from uid import uid
@@ -241,6 +241,12 @@ class Module(mpi.Worker):
     def _init_port_dicts(self):
         """
         Initial dictionaries of source/destination ports in current module.
+
+        Notes
+        -----
+        If the manager compiled the exchange plans of the module's connections,
+        they are used directly; otherwise, they are compiled from the patterns
+        in the routing table.
         """
 
         # Extract identifiers of source ports in the current module's interface
@@ -254,19 +260,18 @@ class Module(mpi.Worker):
         for out_id in self._out_ids:
             self.log_info('extracting output ports for %s' % out_id)
 
-            # Get interfaces of pattern connecting the current module to
-            # destination module `out_id`; `int_0` is connected to the
-            # current module, `int_1` is connected to the other module:
-            pat = self.routing_table[self.id, out_id]['pattern']
-            int_0 = self.routing_table[self.id, out_id]['int_0']
-            int_1 = self.routing_table[self.id, out_id]['int_1']
-
-            # Get ports in interface (`int_0`) connected to the current
-            # module that are connected to the other module via the pattern:
+            # Get ports in the interface connected to the current module that
+            # are connected to the other module via the pattern:
+            conn = self.routing_table[self.id, out_id]
+            if 'src_plan' in conn:
+                src_plan = conn['src_plan']
+            else:
+                src_plan = plan.compile_src(conn['pattern'], conn['int_0'],
+                                            conn['int_1'], self.pm)
             self._out_port_dict_ids['gpot'][out_id] = \
-                gpuarray.to_gpu(self.pm['gpot'].ports_to_inds(pat.src_idx(int_0, int_1, 'gpot', 'gpot')))
+                gpuarray.to_gpu(np.asarray(src_plan['gpot']))
             self._out_port_dict_ids['spike'][out_id] = \
-                gpuarray.to_gpu(self.pm['spike'].ports_to_inds(pat.src_idx(int_0, int_1, 'spike', 'spike')))
+                gpuarray.to_gpu(np.asarray(src_plan['spike']))
 
         # Extract identifiers of destination ports in the current module's
         # interface for all modules sending input to the current module:
@@ -291,35 +296,21 @@ class Module(mpi.Worker):
         for in_id in self._in_ids:
             self.log_info('extracting input ports for %s' % in_id)
 
-            # Get interfaces of pattern connecting the current module to
-            # source module `in_id`; `int_1` is connected to the current
-            # module, `int_0` is connected to the other module:
-            pat = self.routing_table[in_id, self.id]['pattern']
-            int_0 = self.routing_table[in_id, self.id]['int_0']
-            int_1 = self.routing_table[in_id, self.id]['int_1']
-
-            # Get ports in interface (`int_1`) connected to the current
-            # module that are connected to the other module via the pattern:
-            self._in_port_dict_ids['gpot'][in_id] = \
-                gpuarray.to_gpu(self.pm['gpot'].ports_to_inds(pat.dest_idx(int_0, int_1, 'gpot', 'gpot')))
-            self._in_port_dict_ids['spike'][in_id] = \
-                gpuarray.to_gpu(self.pm['spike'].ports_to_inds(pat.dest_idx(int_0, int_1, 'spike', 'spike')))
-
-			# Get the integer indices associated with the connected source ports
-            # in the pattern interface connected to the source module `in_d`;
-            # these are needed to copy received buffer contents into the current
-            # module's port map data array:
-            self._in_port_dict_buf_ids['gpot'][in_id] = \
-                np.array(renumber_in_order(BasePortMapper(pat.gpot_ports(int_0).to_tuples()).
-                        ports_to_inds(pat.src_idx(int_0, int_1, 'gpot', 'gpot', duplicates=True))))
-            self._in_port_dict_buf_ids['spike'][in_id] = \
-                np.array(renumber_in_order(BasePortMapper(pat.spike_ports(int_0).to_tuples()).
-                        ports_to_inds(pat.src_idx(int_0, int_1, 'spike', 'spike', duplicates=True))))
-
-            # The size of the input buffer to the current module must be the
-            # same length as the output buffer of module `in_id`:
-            self._in_buf_len['gpot'][in_id] = len(pat.src_idx(int_0, int_1, 'gpot', 'gpot'))
-            self._in_buf_len['spike'][in_id] = len(pat.src_idx(int_0, int_1, 'spike', 'spike'))
+            # Get ports in the interface connected to the current module that
+            # are connected to the other module via the pattern, and the
+            # indices needed to copy received buffer contents into them:
+            conn = self.routing_table[in_id, self.id]
+            if 'dest_plan' in conn:
+                dest_plan = conn['dest_plan']
+            else:
+                dest_plan = plan.compile_dest(conn['pattern'], conn['int_0'],
+                                              conn['int_1'], self.pm)
+            for t in ['gpot', 'spike']:
+                self._in_port_dict_ids[t][in_id] = \
+                    gpuarray.to_gpu(np.asarray(dest_plan[t]['inds']))
+                self._in_port_dict_buf_ids[t][in_id] = \
+                    np.array(dest_plan[t]['buf_inds'])
+                self._in_buf_len[t][in_id] = dest_plan[t]['buf_len']
 
     def _init_comm_bufs(self):
         """
@@ -420,7 +411,7 @@ class Module(mpi.Worker):
                 if not self.time_sync:
                     self.log_info('gpot data sent to %s: %s' % \
                                   (dest_id, str(self._out_buf['gpot'][dest_id])))
-                r = MPI.COMM_WORLD.Isend([self._out_buf_int['gpot'][dest_id],
+                r = self.intracomm.Isend([self._out_buf_int['gpot'][dest_id],
                                           self._out_buf_mtype['gpot'][dest_id]],
                                          dest_rank, GPOT_TAG)
                 requests.append(r)
@@ -431,7 +422,7 @@ class Module(mpi.Worker):
                 if not self.time_sync:
                     self.log_info('spike data sent to %s: %s' % \
                                   (dest_id, str(self._out_buf['spike'][dest_id])))
-                r = MPI.COMM_WORLD.Isend([self._out_buf_int['spike'][dest_id],
+                r = self.intracomm.Isend([self._out_buf_int['spike'][dest_id],
                                           self._out_buf_mtype['spike'][dest_id]],
                                          dest_rank, SPIKE_TAG)
                 requests.append(r)
@@ -444,12 +435,12 @@ class Module(mpi.Worker):
         # current module's port data array:
         for src_id, src_rank in zip(self._in_ids, self._in_ranks):
             if self._in_buf['gpot'][src_id] is not None:
-                r = MPI.COMM_WORLD.Irecv([self._in_buf_int['gpot'][src_id],
+                r = self.intracomm.Irecv([self._in_buf_int['gpot'][src_id],
                                           self._in_buf_mtype['gpot'][src_id]],
                                          source=src_rank, tag=GPOT_TAG)
                 requests.append(r)
             if self._in_buf['spike'][src_id] is not None:
-                r = MPI.COMM_WORLD.Irecv([self._in_buf_int['spike'][src_id],
+                r = self.intracomm.Irecv([self._in_buf_int['spike'][src_id],
                                           self._in_buf_mtype['spike'][src_id]],
                                          source=src_rank, tag=SPIKE_TAG)
                 requests.append(r)
@@ -488,11 +479,10 @@ class Module(mpi.Worker):
                 n_gpot += len(self._in_buf['gpot'][src_id])
                 n_spike += len(self._in_buf['spike'][src_id])
             self.log_info('sent timing data to master')
-            self.intercomm.isend(['sync_time',
-                                  (self.rank, self.steps, start, stop,
-                                   n_gpot*self.pm['gpot'].dtype.itemsize+\
-                                   n_spike*self.pm['spike'].dtype.itemsize)],
-                                 dest=0, tag=self._ctrl_tag)
+            self.send_ctrl(['sync_time',
+                             (self.rank, self.steps, start, stop,
+                              n_gpot*self.pm['gpot'].dtype.itemsize+\
+                              n_spike*self.pm['spike'].dtype.itemsize)])
         else:
             self.log_info('saved all data received by %s' % self.id)
 
@@ -514,8 +504,7 @@ class Module(mpi.Worker):
 
         # Start timing the main loop:
         if self.time_sync:
-            self.intercomm.isend(['start_time', (self.rank, time.time())],
-                                 dest=0, tag=self._ctrl_tag)                
+            self.send_ctrl(['start_time', (self.rank, time.time())])
             self.log_info('sent start time to manager')
 
     def post_run(self):
@@ -530,13 +519,12 @@ class Module(mpi.Worker):
 
         # Stop timing the main loop before shutting down the emulation:
         if self.time_sync:
-            self.intercomm.isend(['stop_time', (self.rank, time.time())],
-                                 dest=0, tag=self._ctrl_tag)
+            self.send_ctrl(['stop_time', (self.rank, time.time())])
 
             self.log_info('sent stop time to manager')
 
         # Send acknowledgment message:
-        self.intercomm.isend(['done', self.rank], 0, self._ctrl_tag)
+        self.send_ctrl(['done', self.rank])
         self.log_info('done message sent to manager')
 
     def run_step(self):
@@ -588,7 +576,7 @@ class Module(mpi.Worker):
             # Synchronize:
             catch_exception(self._sync, self.log_info)
 
-class Manager(mpi.WorkerManager):
+class Manager(plan.ExchangePlanMixin, mpi.WorkerManager):
     """
     Module manager.
 
@@ -596,6 +584,16 @@ class Manager(mpi.WorkerManager):
     emulation. All modules and connections must be added to a module manager
     instance before they can be run.
 
+    Parameters
+    ----------
+    required_args : list of str
+        Names of arguments that module class constructors must accept.
+    ctrl_tag : int
+        MPI tag to identify control messages.
+    plan_cache : str
+        Directory of on-disk cache of compiled exchange plans. If None, the
+        plans are compiled whenever modules are connected.
+
     Attributes
     ----------
     ctrl_tag : int
@@ -610,12 +608,19 @@ class Manager(mpi.WorkerManager):
 
     def __init__(self, required_args=['sel', 'sel_in', 'sel_out',
                                       'sel_gpot', 'sel_spike'],
-                 ctrl_tag=CTRL_TAG):
+                 ctrl_tag=CTRL_TAG, plan_cache=None):
         super(Manager, self).__init__(ctrl_tag)
 
         # Required constructor args:
         self.required_args = required_args
 
+        # Cache of compiled exchange plans and port mappers used to compile
+        # them:
+        self._init_plans(plan_cache)
+
+        # Each module is run by its own process:
+        self._groups = None
+
         # One-to-one mapping between MPI rank and module ID:
         self.rank_to_id = bidict.bidict()
 
@@ -767,17 +772,35 @@ class Manager(mpi.WorkerManager):
 
         # XXX Need to check for fan-in XXX
 
-        # Store the pattern information in the routing table:
+        # Store the pattern information and the compiled exchange plans in the
+        # routing table:
         self.log_info('updating routing table with pattern')
         if pat.is_connected(0, 1):
-            self.routing_table[id_0, id_1] = {'pattern': pat,
-                                              'int_0': int_0, 'int_1': int_1}
+            self.routing_table[id_0, id_1] = \
+                self._compile_connection(id_0, id_1, pat, int_0, int_1)
         if pat.is_connected(1, 0):
-            self.routing_table[id_1, id_0] = {'pattern': pat,
-                                              'int_0': int_1, 'int_1': int_0}
+            self.routing_table[id_1, id_0] = \
+                self._compile_connection(id_1, id_0, pat, int_1, int_0)
 
         self.log_info('connected modules {0} and {1}'.format(id_0, id_1))
 
+    def spawn(self, n_hosts=None, **attrs):
+        """
+        Spawn MPI processes for and execute each of the managed modules.
+
+        Parameters
+        ----------
+        n_hosts : int
+            If not None, reassign the module ranks with `place()` to minimize
+            traffic between the specified number of hosts before spawning.
+        attrs : dict
+            Additional arguments passed to `WorkerManager.spawn()`.
+        """
+
+        if n_hosts is not None:
+            self.place(n_hosts)
+        super(Manager, self).spawn(**attrs)
+
     def process_worker_msg(self, msg):
 
         # Process timing data sent by workers:
@@ -260,11 +260,11 @@ class Module(BaseModule):
         dest_ids = self.routing_table.dest_ids(self.id)
         for dest_id in dest_ids:            
             dest_rank = self.rank_to_id[:dest_id]
-            r = MPI.COMM_WORLD.Isend([self._data_int['gpot'],
+            r = self.intracomm.Isend([self._data_int['gpot'],
                                       self._data_mtype['gpot']],
                                      dest_rank, GPOT_TAG)
             requests.append(r)
-            r = MPI.COMM_WORLD.Isend([self._data_int['spike'],
+            r = self.intracomm.Isend([self._data_int['spike'],
                                       self._data_mtype['spike']],
                                      dest_rank, SPIKE_TAG)
             requests.append(r)
@@ -279,11 +279,11 @@ class Module(BaseModule):
         src_ids = self.routing_table.src_ids(self.id)
         for src_id in src_ids:
             src_rank = self.rank_to_id[:src_id]
-            r = MPI.COMM_WORLD.Irecv([self._in_buf_int['gpot'][src_id],
+            r = self.intracomm.Irecv([self._in_buf_int['gpot'][src_id],
                                       self._in_buf_mtype['gpot'][src_id]],
                                      source=src_rank, tag=GPOT_TAG)
             requests.append(r)
-            r = MPI.COMM_WORLD.Irecv([self._in_buf_int['spike'][src_id],
+            r = self.intracomm.Irecv([self._in_buf_int['spike'][src_id],
                                       self._in_buf_mtype['spike'][src_id]],
                                      source=src_rank, tag=SPIKE_TAG)
             requests.append(r)
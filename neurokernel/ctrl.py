@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+
+"""
+Transmission of control messages between the manager and its workers.
+
+Control messages are lists whose first element is a string that identifies
+the message type. The messages used by the manager and workers to control
+execution and report timing data are transmitted over MPI communicators as
+fixed-size binary records rather than as pickled lists so that they can be
+sent and received without serialization; all other messages (e.g.,
+messages that contain parameter values, or messages defined by subclasses)
+are pickled. Both kinds of message are transmitted with the same tag; the
+first byte of each record is a value that cannot begin a pickle, so that
+received messages can be identified without any additional header and
+messages pickled by code that transmits them directly over the
+communicator are also accepted.
+"""
+
+import struct
+
+from mpi4py import MPI
+import numpy as np
+
+# Layout of the records used to transmit control messages:
+CTRL_DTYPE = np.dtype([('magic', np.uint8), ('op', np.uint8),
+                       ('rank', np.int32), ('step', np.int64),
+                       ('t0', np.float64), ('t1', np.float64),
+                       ('t2', np.float64), ('nbytes', np.int64)],
+                      align=True)
+
+# Individual records are packed with the struct module, which is
+# considerably faster than setting the fields of a numpy record:
+_record = struct.Struct('=BBxxiqdddq')
+assert _record.size == CTRL_DTYPE.itemsize
+
+# Value of the first byte of each record (not a valid pickle opcode):
+CTRL_MAGIC = 0xff
+
+# Message types transmitted as records, indexed by record opcode:
+CTRL_OPS = ['start', 'stop', 'steps', 'reset', 'quit', 'done',
+            'start_time', 'stop_time', 'sync_time', 'checkpoint_time']
+_op_codes = {name: i for i, name in enumerate(CTRL_OPS)}
+
+def _loads(s):
+    """
+    Deserialize a message pickled by mpi4py.
+    """
+
+    # The MPI._p_pickle attribute in the stable release of mpi4py 1.3.1
+    # was renamed to pickle in subsequent dev revisions:
+    try:
+        return MPI.pickle.loads(s)
+    except AttributeError:
+        return MPI._p_pickle.loads(s)
+
+def encode(msg):
+    """
+    Store a control message in a record.
+
+    Parameters
+    ----------
+    msg : list
+        Control message.
+
+    Returns
+    -------
+    rec : str
+        Record with layout `CTRL_DTYPE`, or None if the message cannot be
+        represented as a record and must be pickled.
+    """
+
+    try:
+        name = msg[0]
+        op = _op_codes.get(name)
+        if op is None:
+            return None
+        rank = step = nbytes = 0
+        t0 = t1 = t2 = 0.0
+        if name in ('start', 'stop', 'reset', 'quit'):
+            if len(msg) != 1:
+                return None
+        elif name == 'steps':
+            step = -1 if msg[1] == 'inf' else int(msg[1])
+        elif name == 'done':
+            rank = msg[1]
+        elif name in ('start_time', 'stop_time'):
+            rank, t0 = msg[1]
+        elif name == 'sync_time':
+            rank, step, t0, t1, nbytes = msg[1][0:5]
+
+            # The start time of the execution step is optional:
+            t2 = msg[1][5] if len(msg[1]) > 5 else None
+            if t2 is None:
+                t2 = float('nan')
+        elif name == 'checkpoint_time':
+            rank, step, t0, nbytes = msg[1]
+        return _record.pack(CTRL_MAGIC, op, rank, step, t0, t1, t2, nbytes)
+    except (TypeError, ValueError, IndexError, struct.error):
+        return None
+
+def decode(rec):
+    """
+    Recover the control message stored in a record.
+
+    Parameters
+    ----------
+    rec : buffer
+        Record with layout `CTRL_DTYPE`.
+
+    Returns
+    -------
+    msg : list
+        Control message.
+    """
+
+    magic, op, rank, step, t0, t1, t2, nbytes = _record.unpack_from(rec)
+    name = CTRL_OPS[op]
+    if name == 'sync_time':
+        return [name, (rank, step, t0, t1, nbytes, None if t2 != t2 else t2)]
+    elif name in ('start_time', 'stop_time'):
+        return [name, (rank, t0)]
+    elif name == 'done':
+        return [name, rank]
+    elif name == 'steps':
+        return [name, 'inf' if step < 0 else str(step)]
+    elif name == 'checkpoint_time':
+        return [name, (rank, step, t0, nbytes)]
+    else:
+        return [name]
+
+class ControlChannel(object):
+    """
+    Channel for transmitting control messages over a communicator.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+        Communicator over which messages are transmitted. Objects that
+        provide the `isend()` and `irecv()` methods of a communicator
+        (e.g., the channels of `neurokernel.mp`) are also accepted; messages
+        transmitted over them are not converted to records.
+    tag : int
+        Tag of control messages.
+    source : int
+        Rank from which messages are received.
+    """
+
+    def __init__(self, comm, tag, source=MPI.ANY_SOURCE):
+        self.comm = comm
+        self.tag = tag
+        self.source = source
+        self.binary = isinstance(comm, MPI.Comm)
+
+        # Requests of pending transmissions (which refer to the transmitted
+        # buffers), and buffer into which received records are written:
+        self._sends = []
+        self._buf = bytearray(_record.size)
+        self._status = MPI.Status()
+
+        # Pending request for the next message transmitted over a channel
+        # that is not an MPI communicator:
+        self._req = None
+
+    def isend(self, msg, dest):
+        """
+        Transmit a control message without waiting for it to be received.
+
+        Parameters
+        ----------
+        msg : list
+            Control message.
+        dest : int
+            Destination rank.
+        """
+
+        if not self.binary:
+            self.comm.isend(msg, dest, self.tag)
+            return
+
+        rec = encode(msg)
+        if rec is not None:
+            self._sends.append(self.comm.Isend(rec, dest, self.tag))
+        else:
+            self._sends.append(self.comm.isend(msg, dest, self.tag))
+
+        # Discard the requests of completed transmissions:
+        if len(self._sends) >= 64:
+            self._sends = [r for r in self._sends if not r.Test()]
+
+    def recv(self):
+        """
+        Return the next control message if one has arrived.
+
+        Returns
+        -------
+        msg : list
+            Control message, or None if no message has arrived.
+        """
+
+        if not self.binary:
+            if self._req is None:
+                try:
+                    self._req = self.comm.irecv(source=self.source,
+                                                tag=self.tag)
+                except TypeError:
+                    # irecv() in mpi4py 1.3.1 stable uses 'dest' instead of
+                    # 'source':
+                    self._req = self.comm.irecv(dest=self.source,
+                                                tag=self.tag)
+            flag, msg = self._req.test()
+            if not flag:
+                return None
+            self._req = None
+            return msg
+
+        m = self.comm.Improbe(self.source, self.tag, self._status)
+        if m is None:
+            return None
+        return self._mrecv(m)
+
+    def wait(self):
+        """
+        Block until the next control message arrives.
+
+        Note that some MPI implementations (e.g., Open MPI) poll while
+        blocked in a probe and therefore occupy a CPU while waiting for a
+        message transmitted over an MPI communicator.
+
+        Returns
+        -------
+        msg : list
+            Control message.
+        """
+
+        if not self.binary:
+            msg = self.recv()
+            if msg is not None:
+                return msg
+            req, self._req = self._req, None
+            return req.wait()
+        return self._mrecv(self.comm.Mprobe(self.source, self.tag,
+                                            self._status))
+
+    def _mrecv(self, m):
+        """
+        Receive a message matched by a probe.
+        """
+
+        n = self._status.Get_count(MPI.BYTE)
+        if n == _record.size:
+            m.Recv(self._buf)
+            if self._buf[0] == CTRL_MAGIC:
+                return decode(self._buf)
+            return _loads(str(self._buf))
+        buf = bytearray(n)
+        m.Recv(buf)
+        return _loads(str(buf))
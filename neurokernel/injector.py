@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+"""
+Prefetching injection of streamed input data into ports.
+"""
+
+import threading
+
+import h5py
+import numpy as np
+
+from mixins import LoggerMixin
+
+class Injector(LoggerMixin):
+    """
+    Stream input data from a file into a port data array.
+
+    A background thread reads the input data from a memory-mapped `.npy` file
+    or HDF5 dataset with shape `(steps, ports)` and prefetches it into a ring
+    buffer; each call to `update()` copies the next step's values into the
+    selected entries of a port data array.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of `.npy` or HDF5 file containing the input data.
+    data : numpy.ndarray
+        Port data array into which the input data is copied.
+    inds : numpy.ndarray of int
+        Indices of the ports in `data` that receive the input data; the
+        columns of the input data are copied into the ports in this order.
+    dataset : str
+        Name of the HDF5 dataset containing the input data. Must be specified
+        if `file_name` is not a `.npy` file.
+    prefetch : int
+        Number of steps to prefetch into the ring buffer.
+    block_steps : int
+        Number of steps to read from the file at a time. Defaults to half of
+        `prefetch`.
+
+    Attributes
+    ----------
+    steps : int
+        Number of steps of input data in the file.
+    """
+
+    def __init__(self, file_name, data, inds, dataset=None, prefetch=256,
+                 block_steps=None):
+        LoggerMixin.__init__(self, 'inj %s' % file_name)
+        self.file_name = file_name
+        self.data = data
+        self.inds = np.asarray(inds, dtype=np.int_)
+
+        if dataset is None:
+            if not file_name.endswith('.npy'):
+                raise ValueError('dataset name must be specified for HDF5 files')
+            self._f = None
+            self._src = np.load(file_name, mmap_mode='r')
+        else:
+            self._f = h5py.File(file_name, 'r')
+            self._src = self._f[dataset]
+        if len(self._src.shape) != 2 or self._src.shape[1] != len(self.inds):
+            if self._f is not None:
+                self._f.close()
+            raise ValueError('input data shape must be (steps, %s)' % \
+                             len(self.inds))
+        self.steps = self._src.shape[0]
+
+        if prefetch < 1:
+            raise ValueError('invalid number of steps to prefetch')
+        self.prefetch = prefetch
+        if block_steps is None:
+            block_steps = max(prefetch//2, 1)
+        self.block_steps = min(block_steps, prefetch)
+
+        # Ring buffer and semaphores that respectively count its empty and
+        # filled slots:
+        self._ring = np.empty((prefetch, len(self.inds)), data.dtype)
+        self._free = threading.Semaphore(prefetch)
+        self._full = threading.Semaphore(0)
+        self._read_pos = 0
+        self._count = 0
+        self._stop = False
+        self._thread = None
+        self._error = None
+
+    def start(self):
+        """
+        Start prefetching input data.
+        """
+
+        self._thread = threading.Thread(target=self._read_loop,
+                                        args=(self._count,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _read_loop(self, first):
+        """
+        Read blocks of input data starting at the specified step into the
+        ring buffer.
+        """
+
+        write_pos = 0
+        try:
+            for start in xrange(first, self.steps, self.block_steps):
+                block = np.asarray(self._src[start:start+self.block_steps],
+                                   dtype=self._ring.dtype)
+                for row in block:
+                    self._free.acquire()
+                    if self._stop:
+                        return
+                    self._ring[write_pos] = row
+                    write_pos = (write_pos+1) % self.prefetch
+                    self._full.release()
+
+        # Wake up update() so that it can raise the exception:
+        except Exception as e:
+            self._error = e
+            self.log_info('error reading %s: %s' % (self.file_name, str(e)))
+            self._full.release()
+
+    def update(self):
+        """
+        Copy the next step's input data into the port data array.
+
+        Returns
+        -------
+        result : bool
+            False if all of the input data has already been injected.
+        """
+
+        if self._count >= self.steps:
+            return False
+        if self._thread is None:
+            self.start()
+
+        # This only blocks if the reader thread has fallen behind:
+        if self._error is None:
+            self._full.acquire()
+        if self._error is not None:
+            raise self._error
+        self.data[self.inds] = self._ring[self._read_pos]
+        self._read_pos = (self._read_pos+1) % self.prefetch
+        self._free.release()
+        self._count += 1
+        if self._count == self.steps:
+            self.log_info('all input data injected')
+        return True
+
+    def _stop_thread(self):
+        """
+        Stop the reader thread if it is running.
+        """
+
+        if self._thread is not None:
+            self._stop = True
+            self._free.release()
+            self._thread.join()
+            self._thread = None
+
+    def tell(self):
+        """
+        Return the step of the input data injected by the next update.
+
+        Returns
+        -------
+        step : int
+            Row of the input data copied into the ports by the next call to
+            `update()`.
+        """
+
+        return self._count
+
+    def seek(self, step):
+        """
+        Set the step of the input data injected by the next update.
+
+        Any prefetched data is discarded; prefetching resumes from the
+        specified step when `update()` is next called.
+
+        Parameters
+        ----------
+        step : int
+            Row of the input data to copy into the ports by the next call to
+            `update()`.
+        """
+
+        if step < 0 or step > self.steps:
+            raise ValueError('invalid input data step')
+        self._stop_thread()
+        self._free = threading.Semaphore(self.prefetch)
+        self._full = threading.Semaphore(0)
+        self._read_pos = 0
+        self._count = step
+        self._stop = False
+        self._error = None
+
+    def close(self):
+        """
+        Stop prefetching and close the input file.
+        """
+
+        self._stop_thread()
+        if self._f is not None:
+            self._f.close()
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+
+"""
+Single-host runtime based on multiprocessing.
+
+The manager in this module runs each module in a process forked with the
+multiprocessing package rather than in a process spawned by MPI, so that an
+emulation whose modules all run on the same host neither needs to be started
+with mpiexec nor uses MPI to exchange data. The buffers transmitted between
+modules are placed in an anonymous shared memory map created before the
+processes are forked and are exchanged by plain memory copies using the same
+exchange plans as the MPI runtime; the execution steps of the modules are
+synchronized with a barrier shared by all processes. Control messages are
+transmitted from the manager to each module via a pipe and from the modules to
+the manager via a queue.
+
+Notes
+-----
+Modules that use GPUs must not initialize them before they are forked. Log
+emitters that write via MPI (i.e., those created by `setup_logger()` with an
+MPI communicator) must not be used.
+"""
+
+import mmap
+import multiprocessing
+import Queue
+
+import numpy as np
+
+import core
+from shm import layout
+import tools.affinity
+
+class Barrier(object):
+    """
+    Barrier shared by forked processes.
+
+    Must be instantiated before the processes that use it are forked.
+
+    Parameters
+    ----------
+    n : int
+        Number of processes that must wait on the barrier before any of them
+        is released.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self._cond = multiprocessing.Condition()
+        self._count = multiprocessing.RawValue('i', 0)
+        self._generation = multiprocessing.RawValue('i', 0)
+
+    def wait(self):
+        """
+        Wait until all processes have reached the barrier.
+        """
+
+        with self._cond:
+            generation = self._generation.value
+            self._count.value += 1
+            if self._count.value == self.n:
+                self._count.value = 0
+                self._generation.value += 1
+                self._cond.notify_all()
+            else:
+                while generation == self._generation.value:
+                    self._cond.wait()
+
+class HostBuffers(object):
+    """
+    Buffers transmitted between modules in forked processes.
+
+    Provides the same interface as `neurokernel.shm.SharedBuffers`.
+
+    Parameters
+    ----------
+    mem : mmap.mmap
+        Shared memory map containing all buffers.
+    entries : list of tuple
+        Key (source ID, destination ID, port type), number of elements,
+        size in bytes, and byte offsets of the two copies of each buffer.
+    id : str
+        ID of the module that uses the buffers.
+    dtypes : dict
+        Numpy dtypes of the module's port data keyed by port type.
+    barrier : Barrier
+        Barrier shared by all processes.
+    """
+
+    def __init__(self, mem, entries, id, dtypes, barrier):
+        self.barrier = barrier
+        self.enabled = True
+        self.send_bufs = {}
+        self.recv_bufs = {}
+        seg = np.frombuffer(mem, np.uint8)
+        for key, n, nbytes, pair in entries:
+            src_id, dest_id, t = key
+            if id not in (src_id, dest_id):
+                continue
+            dtype = np.dtype(dtypes[t])
+            if n*dtype.itemsize > nbytes:
+                raise ValueError('%s data of %s does not fit in buffer' % \
+                                 (t, id))
+            bufs = tuple([seg[o:o+n*dtype.itemsize].view(dtype) \
+                          for o in pair])
+            if src_id == id:
+                self.send_bufs[key] = bufs
+            else:
+                self.recv_bufs[key] = bufs
+
+    def sync(self):
+        """
+        Wait until all modules have written their buffers.
+        """
+
+        self.barrier.wait()
+
+    def close(self):
+        self.send_bufs = {}
+        self.recv_bufs = {}
+
+class _Request(object):
+    """
+    Request returned by nonblocking operations on control message channels.
+    """
+
+    def __init__(self, conn=None):
+        self.conn = conn
+
+    def test(self):
+        if self.conn is None:
+            return True, None
+        elif self.conn.poll():
+            return True, self.conn.recv()
+        else:
+            return False, None
+
+    def wait(self):
+        if self.conn is None:
+            return None
+        return self.conn.recv()
+
+class _ManagerChannel(object):
+    """
+    Channel for transmitting control messages from the manager to the workers.
+
+    Provides the subset of the interface of an MPI intercommunicator used by
+    the manager to transmit messages.
+
+    Parameters
+    ----------
+    conns : list of multiprocessing.Connection
+        Pipe connections to each worker ordered by rank.
+    """
+
+    def __init__(self, conns):
+        self.conns = conns
+
+    def send(self, obj, dest, tag=0):
+        self.conns[dest].send(obj)
+
+    def isend(self, obj, dest, tag=0):
+        self.send(obj, dest, tag)
+        return _Request()
+
+class _WorkerChannel(object):
+    """
+    Channel for exchanging control messages between a worker and the manager.
+
+    Provides the subset of the interface of an MPI intercommunicator used by
+    workers.
+
+    Parameters
+    ----------
+    conn : multiprocessing.Connection
+        Pipe connection over which the manager transmits messages.
+    queue : multiprocessing.Queue
+        Queue over which all workers transmit messages to the manager.
+    """
+
+    def __init__(self, conn, queue):
+        self.conn = conn
+        self.queue = queue
+
+    def send(self, obj, dest=0, tag=0):
+        self.queue.put(obj)
+
+    def isend(self, obj, dest=0, tag=0):
+        self.send(obj, dest, tag)
+        return _Request()
+
+    def recv(self, source=0, tag=0):
+        return self.conn.recv()
+
+    def irecv(self, source=0, tag=0, **kwargs):
+        return _Request(self.conn)
+
+def _buf_len(conn, t):
+    """
+    Return the length of the buffer transmitted over a connection.
+    """
+
+    if 'src_plan' in conn:
+        return len(conn['src_plan'][t])
+    return len(conn['pattern'].src_idx(conn['int_0'], conn['int_1'], t, t))
+
+def _run_target(target, kwargs, attrs, rank, size, conn, queue, cpus,
+                mem, entries, barrier):
+    """
+    Instantiate and run a target in a forked process.
+    """
+
+    if cpus is not None:
+        if isinstance(cpus, basestring):
+            cpus = tools.affinity.policy_cpus(cpus, rank+1)
+        tools.affinity.set_affinity(cpus)
+    instance = target(**kwargs)
+    instance._rank = rank
+    instance._size = size
+    instance._intercomm = _WorkerChannel(conn, queue)
+    if isinstance(instance, core.Module):
+        instance._shm = HostBuffers(mem, entries, instance.id,
+                                    {t: instance.pm[t].dtype \
+                                     for t in ['gpot', 'spike'] \
+                                     if instance.pm[t].data is not None},
+                                    barrier)
+    for k, v in attrs.iteritems():
+        setattr(instance, k, v)
+    instance.run()
+
+class Manager(core.Manager):
+    """
+    Module manager that runs modules in forked processes on the local host.
+
+    Accepts the same arguments as `neurokernel.core.Manager` and may be used
+    in its place by programs that are not started with mpiexec.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Manager, self).__init__(*args, **kwargs)
+        self._procs = []
+        self._queue = None
+        self._persistent = False
+        self._quit = False
+
+    def _buffer_entries(self):
+        """
+        Return the layout of the buffers transmitted between modules.
+
+        Returns
+        -------
+        entries : list of tuple
+            Key (source ID, destination ID, port type), number of elements,
+            size in bytes, and byte offsets of the two copies of each buffer.
+        nbytes : int
+            Total size of the buffers in bytes.
+
+        Notes
+        -----
+        The size of the port data elements of modules whose port data arrays
+        are created by the modules themselves is assumed to be 8 bytes.
+        """
+
+        specs = []
+        for src_id, dest_id in sorted(self.routing_table.connections):
+            conn = self.routing_table[src_id, dest_id]
+            src_kwargs = self._kwargs[self.rank_to_id.inv[src_id]]
+            for t in ['gpot', 'spike']:
+                n = _buf_len(conn, t)
+                data = src_kwargs.get('data_'+t)
+                dtype = data.dtype if hasattr(data, 'dtype') else np.double
+                if n:
+                    specs.append(((src_id, dest_id, t), n, dtype))
+        offsets, nbytes = layout(specs)
+        return [(key, n, n*np.dtype(dtype).itemsize, offsets[key]) \
+                for key, n, dtype in specs], nbytes
+
+    def spawn(self, restart=None, persistent=False, affinity=None,
+              ctrl_every=1):
+        """
+        Fork processes for and execute each of the managed modules.
+
+        Parameters
+        ----------
+        restart : str
+            If not None, directory containing a checkpoint from which each
+            module restores its state before it starts running; `start(n)`
+            then resumes execution at the saved step and stops after step `n`.
+        persistent : bool
+            If True, the modules keep running after executing the number of
+            steps passed to `start()` until `quit()` is called.
+        affinity : str or dict
+            CPU placement of the manager and the modules; see
+            `neurokernel.mpi_proc.ProcessManager.spawn()`.
+        ctrl_every : int
+            Number of execution steps between checks for control messages by
+            running modules. If None, the number is adapted to the duration
+            of the steps; see `neurokernel.mpi.Worker.run()`.
+        """
+
+        if restart is not None:
+            self.log_info('restarting from checkpoint %s' % restart)
+        self._pin_manager(affinity)
+
+        entries, nbytes = self._buffer_entries()
+        mem = mmap.mmap(-1, max(nbytes, 1))
+        barrier = Barrier(len(self))
+        self._queue = multiprocessing.Queue()
+        attrs = {'persistent': persistent, 'restart': restart,
+                 'ctrl_every': ctrl_every}
+        conns = []
+        for rank in xrange(len(self)):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            kwargs = self._kwargs[rank].copy()
+            kwargs['routing_table'] = self.get_routing_table(rank)
+            p = multiprocessing.Process(target=_run_target,
+                                        args=(self._targets[rank], kwargs,
+                                              attrs, rank, len(self),
+                                              child_conn, self._queue,
+                                              self._target_cpus(affinity, rank),
+                                              mem, entries, barrier))
+            p.start()
+            conns.append(parent_conn)
+            self._procs.append(p)
+        self._intercomm = _ManagerChannel(conns)
+        self._persistent = persistent
+        self.log_info('forked %s processes' % len(self))
+
+    def _recv_worker_msg(self):
+        # Block until a message arrives unless a worker died without
+        # reporting completion:
+        while True:
+            try:
+                return self._queue.get(timeout=1.0)
+            except Queue.Empty:
+                for rank, p in enumerate(self._procs):
+                    if p.exitcode not in (None, 0):
+                        raise RuntimeError('process %s exited with code %s' % \
+                                           (rank, p.exitcode))
+
+    def quit(self):
+        super(Manager, self).quit()
+        self._quit = True
+
+    def wait(self):
+        super(Manager, self).wait()
+
+        # Reap the processes once they have finished running:
+        if not self._persistent or self._quit:
+            for p in self._procs:
+                p.join()
+            self._procs = []
@@ -9,11 +9,16 @@ import os
 import re
 import subprocess
 import sys
+import time
 
 from mpi4py import MPI
+import numpy as np
 
+from ctrl import ControlChannel
 from mpi_proc import getargnames, Process, ProcessManager
 from mixins import LoggerMixin
+import placement
+from tools.affinity import get_affinity
 from tools.logging import setup_logger, set_excepthook
 from tools.misc import memoized_property
 
@@ -35,8 +40,38 @@ class Worker(Process):
         # Tag used to distinguish control messages:
         self._ctrl_tag = ctrl_tag
 
-        # Execution step counter:
+        # Execution step counter and step at which the current run of a
+        # persistent worker started; the number of steps specified for a run
+        # is counted from the latter:
         self.steps = 0
+        self._run_start = 0
+
+        # Scheduled checkpoints; maps execution steps (or None for the end of
+        # execution) to paths, and the period and path of periodic checkpoints:
+        self._checkpoints = {}
+        self._checkpoint_every = None
+
+        # If True, the worker keeps running after the maximum number of steps
+        # has been reached so that it can be reset, reconfigured, and
+        # restarted (set by the manager):
+        self.persistent = False
+
+        # Channel over which control messages are exchanged with the manager:
+        self._ctrl_chan = None
+
+        # Number of execution steps between checks for control messages
+        # while the worker is running (or None to adapt the number to the
+        # duration of the steps so that checks occur about every
+        # `ctrl_interval` seconds), and maximum time in seconds between
+        # checks while it is idle (or None to block until a message
+        # arrives):
+        self.ctrl_every = 1
+        self.ctrl_interval = 0.01
+        self.ctrl_idle_interval = 0.01
+
+        # Number of steps executed between checks for control messages when
+        # the number is adapted to the duration of the steps:
+        self._chunk = 1
 
     # Define properties to perform validation when the maximum number of
     # execution steps set:
@@ -66,6 +101,53 @@ class Worker(Process):
 
         self.log_info('executing do_work')
 
+    def save_checkpoint(self, path):
+        """
+        Save the worker's state.
+
+        This method is invoked by the `run()` method after the execution step
+        at which a checkpoint was scheduled. It should be overridden by child
+        classes.
+
+        Parameters
+        ----------
+        path : str
+            Directory in which to save the state.
+        """
+
+        self.log_info('saving checkpoint to %s at step %s' % (path, self.steps))
+
+    def reset(self):
+        """
+        Reset the worker's state.
+
+        This method is invoked by the `run()` method when a 'reset' control
+        message is received. Child classes that override it should call this
+        method to reset the step counter.
+        """
+
+        self.log_info('resetting worker %s' % self.rank)
+        self.steps = 0
+        self._run_start = 0
+
+    def configure(self, **params):
+        """
+        Change the worker's parameters.
+
+        This method is invoked by the `run()` method when a 'configure' control
+        message is received; by default, it sets the specified attributes.
+
+        Parameters
+        ----------
+        params : dict
+            Parameter values keyed by name.
+        """
+
+        self.log_info('configuring worker %s: %s' % (self.rank,
+                                                    ', '.join(sorted(params))))
+        for k, v in params.iteritems():
+            setattr(self, k, v)
+
     def pre_run(self):
         """
         Code to run before main loop.
@@ -75,6 +157,22 @@ class Worker(Process):
         """
 
         self.log_info('running code before body of worker %s' % self.rank)
+        self.log_info('CPU affinity of worker %s: %s' % \
+                      (self.rank, get_affinity()))
+
+    def end_run(self):
+        """
+        Code to run after each emulation run of a persistent worker.
+
+        This method is invoked by the `run()` method when a persistent worker
+        has executed the maximum number of steps.
+        """
+
+        self.log_info('finished run of worker %s' % self.rank)
+
+        # Send acknowledgment message:
+        self.send_ctrl(['done', self.rank])
+        self.log_info('done message sent to manager')
 
     def post_run(self):
         """
@@ -87,37 +185,164 @@ class Worker(Process):
         self.log_info('running code after body of worker %s' % self.rank)
 
         # Send acknowledgment message:
-        self.intercomm.isend(['done', self.rank], 0, self._ctrl_tag)
+        self.send_ctrl(['done', self.rank])
         self.log_info('done message sent to manager')
 
+    @property
+    def _ctrl(self):
+        """
+        Channel over which control messages are exchanged with the manager.
+        """
+
+        if self._ctrl_chan is None or self._ctrl_chan.comm is not self.intercomm:
+            self._ctrl_chan = ControlChannel(self.intercomm, self._ctrl_tag, 0)
+        return self._ctrl_chan
+
+    def send_ctrl(self, msg):
+        """
+        Transmit a control message to the manager.
+
+        Parameters
+        ----------
+        msg : list
+            Control message; the first element must be a string that
+            identifies the message type.
+        """
+
+        self._ctrl.isend(msg, 0)
+
+    def _recv_ctrl(self):
+        """
+        Return the next control message transmitted by the manager.
+
+        Returns
+        -------
+        msg : list
+            Control message, or None if no message has arrived.
+        """
+
+        return self._ctrl.recv()
+
+    def _wait_ctrl(self):
+        """
+        Wait for the next control message transmitted by the manager.
+
+        Rather than spinning, the worker sleeps between checks for the
+        message; the sleep time is doubled after every check up to
+        `ctrl_idle_interval` seconds. If `ctrl_idle_interval` is None and
+        control messages are transmitted over an MPI communicator, the worker
+        instead blocks in a probe for the message, which it then receives
+        with no added latency (see `ControlChannel.wait()`); over other
+        channels, the sleep time is then limited to 10 ms.
+
+        Returns
+        -------
+        msg : list
+            Control message.
+        """
+
+        if self.ctrl_idle_interval is None and self._ctrl.binary:
+            return self._ctrl.wait()
+        interval = self.ctrl_idle_interval
+        if interval is None:
+            interval = 0.01
+        delay = min(1e-4, interval)
+        while True:
+            msg = self._recv_ctrl()
+            if msg is not None:
+                return msg
+            time.sleep(delay)
+            delay = min(2*delay, interval)
+
+    def run_steps(self, n):
+        """
+        Execute several execution steps.
+
+        The work method is invoked in a tight loop; no control messages are
+        handled, no checkpoints are saved, and nothing is logged until all of
+        the steps have been executed.
+
+        Parameters
+        ----------
+        n : int
+            Number of steps to execute.
+        """
+
+        do_work = self.do_work
+        for i in xrange(n):
+            do_work()
+            self.steps += 1
+
+    def _chunk_steps(self):
+        """
+        Return the number of steps to execute before the next check for
+        control messages.
+
+        Chunks end at the maximum number of steps and at the steps after which
+        checkpoints are scheduled.
+        """
+
+        steps = self.steps
+        if self.ctrl_every is None:
+            n = self._chunk
+        else:
+            n = self.ctrl_every-steps % self.ctrl_every
+        n = min(n, self._max_steps-steps)
+        if self._checkpoints:
+            for step in self._checkpoints:
+                if step is not None and step > steps:
+                    n = min(n, step-steps)
+        if self._checkpoint_every is not None:
+            every = self._checkpoint_every[0]
+            n = min(n, every-steps % every)
+        return int(max(n, 1))
+
+    def _adapt_chunk(self, n, duration):
+        """
+        Update the number of steps executed between checks for control
+        messages given the duration of the last `n` steps.
+
+        The number is at most doubled after each chunk so that a slow step
+        does not follow a long run of checks being skipped.
+        """
+
+        if duration > 0:
+            target = int(self.ctrl_interval*n/duration)
+        else:
+            target = 2*self._chunk
+        self._chunk = max(1, min(target, 2*self._chunk))
+
     def run(self):
         """
         Main body of worker process.
+
+        While the worker is idle, it waits for control messages without
+        spinning; while it is running, it executes chunks of `ctrl_every`
+        steps with `run_steps()` and checks for control messages between
+        chunks. If `ctrl_every` is None, the size of the chunks is adapted to
+        the measured duration of the steps so that checks occur about every
+        `ctrl_interval` seconds. Messages that must be handled before a
+        specific step (e.g., checkpoint requests) must therefore be sent at
+        least one chunk before that step.
         """
 
+        # The step counter is reset before pre_run() so that the latter may
+        # restore it from a checkpoint:
+        self.steps = 0
         self.pre_run()
 
         self.log_info('running body of worker %s' % self.rank)
 
-        # Start listening for control messages from parent process:
-        r_ctrl = []
-        try:
-            d = self.intercomm.irecv(source=0, tag=self._ctrl_tag)
-        except TypeError:
-            # irecv() in mpi4py 1.3.1 stable uses 'dest' instead of 'source':
-            d = self.intercomm.irecv(dest=0, tag=self._ctrl_tag)
-        r_ctrl.append(d)
-
         running = False
-        req = MPI.Request()
-        self.steps = 0
         while True:
 
             # Handle control messages (this assumes that only one control
             # message will arrive at a time):
-            flag, msg_list = req.testall(r_ctrl)
-            if flag:
-                msg = msg_list[0]
+            if not running:
+                msg = self._wait_ctrl()
+            else:
+                msg = self._recv_ctrl()
+            if msg is not None:
 
                 # Start executing work method:
                 if msg[0] == 'start':
@@ -132,14 +357,37 @@ class Worker(Process):
                     else:
                         self.log_info('max steps set - not stopping')
 
-                # Set maximum number of execution steps:
+                # Set maximum number of execution steps; after a previous run
+                # of a persistent worker, the steps are counted from the end
+                # of that run:
                 elif msg[0] == 'steps':
                     if msg[1] == 'inf':
                         self.max_steps = float('inf')
                     else:
-                        self.max_steps = int(msg[1])
+                        self.max_steps = self._run_start+int(msg[1])
                     self.log_info('setting maximum steps to %s' % self.max_steps)
 
+                # Schedule checkpoint:
+                elif msg[0] == 'checkpoint':
+                    path, step, every = msg[1:4]
+                    if every is not None:
+                        self._checkpoint_every = (every, path)
+                        self.log_info('scheduling checkpoint every %s steps' % every)
+                    else:
+                        self._checkpoints[step] = path
+                        self.log_info('scheduling checkpoint at step %s' % step)
+
+                # Reset state:
+                elif msg[0] == 'reset':
+                    if running:
+                        self.log_info('running - not resetting')
+                    else:
+                        self.reset()
+
+                # Change parameters:
+                elif msg[0] == 'configure':
+                    self.configure(**msg[1])
+
                 # Quit:
                 elif msg[0] == 'quit':
                     if self.max_steps == float('inf'):
@@ -148,28 +396,44 @@ class Worker(Process):
                     else:
                         self.log_info('max steps set - not quitting')
 
-                # Get next message:
-                r_ctrl = []
-                try:
-                    d = self.intercomm.irecv(source=0, tag=self._ctrl_tag)
-                except TypeError:
-                    # irecv() in mpi4py 1.3.1 stable uses 'dest' instead of 'source':
-                    d = self.intercomm.irecv(dest=0, tag=self._ctrl_tag)
-                r_ctrl.append(d)
-
             # Execute work method; the work method may send data back to the master
             # as a serialized control message containing two elements, e.g.,
-            # self.intercomm.isend(['foo', str(self.rank)],
-            #                      dest=0, tag=self._ctrl_tag)            
+            # self.send_ctrl(['foo', str(self.rank)])
             if running:
-                self.do_work()
-                self.steps += 1
+                n = 1 if self.ctrl_every == 1 else self._chunk_steps()
+                if self.ctrl_every is None:
+                    start = time.time()
+                    self.run_steps(n)
+                    self._adapt_chunk(n, time.time()-start)
+                else:
+                    self.run_steps(n)
                 self.log_info('execution step: %s' % self.steps)
 
-            # Leave loop if maximum number of steps has been reached:
-            if self.steps >= self.max_steps:
+                # Save scheduled checkpoints:
+                if self.steps in self._checkpoints:
+                    self.save_checkpoint(self._checkpoints.pop(self.steps))
+                elif self._checkpoint_every is not None and \
+                     self.steps % self._checkpoint_every[0] == 0:
+                    self.save_checkpoint(self._checkpoint_every[1])
+
+            # Leave loop if maximum number of steps has been reached unless
+            # the worker is persistent; the limit is only checked while
+            # running so that control messages received before a run starts
+            # (e.g., the number of steps to execute) do not end it:
+            if running and self.steps >= self.max_steps:
                 self.log_info('maximum steps reached')
-                break
+
+                # Save checkpoint scheduled for the end of execution:
+                if None in self._checkpoints:
+                    self.save_checkpoint(self._checkpoints.pop(None))
+                if not self.persistent:
+                    break
+
+                # Wait for further control messages:
+                running = False
+                self.max_steps = float('inf')
+                self._run_start = self.steps
+                self.end_run()
 
         self.post_run()
 
@@ -195,6 +459,11 @@ class WorkerManager(ProcessManager):
     -----
     This class requires MPI-2 dynamic processing management.
 
+    Workers spawned with `persistent=True` do not exit after executing the
+    number of steps passed to `start()`; after `wait()` returns, they may be
+    reset, reconfigured, and started again until `quit()` is called, after
+    which `wait()` must be called once more.
+
     See Also
     --------
     Worker
@@ -209,6 +478,13 @@ class WorkerManager(ProcessManager):
         # Tag used to distinguish MPI control messages:
         self._ctrl_tag = ctrl_tag
 
+        # Channel over which control messages are exchanged with the workers:
+        self._ctrl_chan = None
+
+        # Maximum time in seconds between checks for control messages from
+        # the workers while waiting for them:
+        self.ctrl_idle_interval = 0.01
+
     def add(self, target, *args, **kwargs):
         """
         Add a worker to an MPI application.
@@ -227,6 +503,75 @@ class WorkerManager(ProcessManager):
         self.log_info('adding class %s' % target.__name__)
         return ProcessManager.add(self, target, *args, **kwargs)
 
+    def spawn(self, persistent=False, affinity=None, **attrs):
+        """
+        Spawn MPI processes for and execute each of the managed workers.
+
+        Parameters
+        ----------
+        persistent : bool
+            If True, the workers keep running after executing the number of
+            steps passed to `start()` until `quit()` is called.
+        affinity : str or dict
+            CPU placement of the manager and the workers; see
+            `ProcessManager.spawn()`.
+        attrs : dict
+            Additional attributes to set on each of the instantiated workers
+            before they are run.
+        """
+
+        super(WorkerManager, self).spawn(affinity, persistent=persistent,
+                                         **attrs)
+
+    def place(self, n_hosts):
+        """
+        Reassign module ranks to minimize traffic between hosts.
+
+        The modules are partitioned across the hosts so as to minimize the
+        number of bytes transmitted between hosts at every step and are then
+        reassigned ranks such that strongly connected modules on the same host
+        have adjacent ranks. Ranks are assumed to be assigned to hosts in
+        contiguous blocks of equal size. Must be called before `spawn()`.
+        Subclasses must provide the `routing_table` and `rank_to_id`
+        attributes describing the connections between the workers.
+
+        Parameters
+        ----------
+        n_hosts : int
+            Number of hosts over which the modules are distributed.
+
+        Returns
+        -------
+        nbytes, nbytes_default : int
+            Expected number of bytes transmitted between hosts at every step
+            with the new and original rank assignments, respectively.
+        """
+
+        ids = [self.rank_to_id[rank] for rank in xrange(len(self))]
+        itemsize = {}
+        for rank, id in enumerate(ids):
+            itemsize[id] = {}
+            for t in ['gpot', 'spike']:
+                data = self._kwargs[rank].get('data_'+t)
+                if hasattr(data, 'dtype'):
+                    itemsize[id][t] = data.dtype.itemsize
+        mat = placement.comm_matrix(self.routing_table, ids, itemsize)
+        perm, part = placement.place(mat, n_hosts)
+        default_part = np.repeat(np.arange(n_hosts),
+                                 placement.block_sizes(len(ids), n_hosts))
+        nbytes = placement.cross_part_bytes(mat, part)
+        nbytes_default = placement.cross_part_bytes(mat, default_part)
+        self.log_info('expected bytes transmitted between hosts per step: '
+                      '%s (%s without placement)' % (nbytes, nbytes_default))
+
+        # Update the rank of each module in place because the mapping is
+        # shared with the module constructor arguments:
+        self.reorder(perm)
+        self.rank_to_id.clear()
+        for rank, i in enumerate(perm):
+            self.rank_to_id[rank] = ids[i]
+        return nbytes, nbytes_default
+
     def process_worker_msg(self, msg):
         """
         Process the specified deserialized message from a worker.
@@ -234,63 +579,157 @@ class WorkerManager(ProcessManager):
         
         self.log_info('got ctrl msg: %s' % str(msg))
 
+    @property
+    def _ctrl(self):
+        """
+        Channel over which control messages are exchanged with the workers.
+        """
+
+        if self._ctrl_chan is None or self._ctrl_chan.comm is not self.intercomm:
+            self._ctrl_chan = ControlChannel(self.intercomm, self._ctrl_tag)
+        return self._ctrl_chan
+
+    def send_ctrl(self, msg, dest):
+        """
+        Transmit a control message to a worker.
+
+        Parameters
+        ----------
+        msg : list
+            Control message; the first element must be a string that
+            identifies the message type.
+        dest : int
+            Rank of worker.
+        """
+
+        self._ctrl.isend(msg, dest)
+
+    def _recv_worker_msg(self):
+        """
+        Return the next control message transmitted by any worker.
+
+        Returns
+        -------
+        msg : list
+            Control message, or None if no message has arrived.
+        """
+
+        return self._ctrl.recv()
+
+    def _wait_worker_msg(self):
+        """
+        Wait for the next control message transmitted by any worker.
+
+        Rather than spinning, the manager sleeps between checks for the
+        message; the sleep time is doubled after every check up to
+        `ctrl_idle_interval` seconds.
+
+        Returns
+        -------
+        msg : list
+            Control message.
+        """
+
+        delay = min(1e-4, self.ctrl_idle_interval)
+        while True:
+            msg = self._recv_worker_msg()
+            if msg is not None:
+                return msg
+            time.sleep(delay)
+            delay = min(2*delay, self.ctrl_idle_interval)
+
     def wait(self):
         """
         Wait for execution to complete.
+
+        The manager does not occupy a CPU while it waits; see
+        `_wait_worker_msg()`. Since the sleep time is reset whenever a message
+        arrives, messages transmitted in quick succession (e.g., timing data)
+        are received with little latency.
         """
 
-        # Start listening for control messages:
-        r_ctrl = []
-        try:
-            d = self.intercomm.irecv(source=MPI.ANY_SOURCE,
-                                     tag=self._ctrl_tag)
-        except TypeError:
-            # irecv() in mpi4py 1.3.1 stable uses 'dest' instead of 'source':
-            d = self.intercomm.irecv(dest=MPI.ANY_SOURCE,
-                                     tag=self._ctrl_tag)
-        r_ctrl.append(d)
         workers = range(len(self))
-        req = MPI.Request()
-        while True:
-            # Check for control messages from workers:
-            flag, msg_list = req.testall(r_ctrl)
-            if flag:
-                msg = msg_list[0]
-                if msg[0] == 'done':
-                    self.log_info('removing %s from worker list' % msg[1])
-                    workers.remove(msg[1])
-
-                # Additional control messages from the workers are processed
-                # here:
-                else:
-                    self.process_worker_msg(msg)
-
-                # Get new control messages:
-                r_ctrl = []
-                try:
-                    d = self.intercomm.irecv(source=MPI.ANY_SOURCE,
-                                             tag=self._ctrl_tag)
-                except TypeError:
-                    # irecv() in mpi4py 1.3.1 stable uses 'dest' instead of 'source':
-                    d = self.intercomm.irecv(dest=MPI.ANY_SOURCE,
-                                             tag=self._ctrl_tag)
-                r_ctrl.append(d)
-
-            if not workers:
-                self.log_info('finished running manager')
-                break
+        while workers:
+            # Wait for control messages from workers:
+            msg = self._wait_worker_msg()
+            if msg[0] == 'done':
+                self.log_info('removing %s from worker list' % msg[1])
+                workers.remove(msg[1])
+
+            # Additional control messages from the workers are processed
+            # here:
+            else:
+                self.process_worker_msg(msg)
+        self.log_info('finished running manager')
 
     def start(self, steps=float('inf')):
         """
         Tell the workers to start processing data.
+
+        Parameters
+        ----------
+        steps : int
+            Number of steps to execute. Persistent workers that have already
+            completed a run and have not been reset execute that many more
+            steps; workers restarted from a checkpoint count the steps from
+            the start of the emulation that saved it.
         """
 
         self.log_info('sending steps message (%s)' % steps)
         for dest in xrange(len(self)):
-            self.intercomm.isend(['steps', str(steps)], dest, self._ctrl_tag)
+            self.send_ctrl(['steps', str(steps)], dest)
         self.log_info('sending start message')
         for dest in xrange(len(self)):
-            self.intercomm.isend(['start'], dest, self._ctrl_tag)
+            self.send_ctrl(['start'], dest)
+
+    def checkpoint(self, path, step=None, every=None):
+        """
+        Tell the workers to save their state.
+
+        Each worker saves its own state in the specified directory without
+        transmitting it to the manager.
+
+        Parameters
+        ----------
+        path : str
+            Directory in which to save the state.
+        step : int
+            Execution step after which the state is saved; the step must not
+            have been reached by any worker when the message is received. If
+            None, the state is saved when the workers finish executing the
+            number of steps passed to `start()`.
+        every : int
+            If not None, save the state every `every` steps, overwriting the
+            previously saved state.
+        """
+
+        self.log_info('sending checkpoint message (%s)' % path)
+        for dest in xrange(len(self)):
+            self.send_ctrl(['checkpoint', path, step, every], dest)
+
+    def reset(self):
+        """
+        Tell persistent workers that are not running to reset their state.
+        """
+
+        self.log_info('sending reset message')
+        for dest in xrange(len(self)):
+            self.send_ctrl(['reset'], dest)
+
+    def configure(self, rank, **params):
+        """
+        Tell a worker to change its parameters.
+
+        Parameters
+        ----------
+        rank : int
+            Rank of worker.
+        params : dict
+            Parameter values keyed by name.
+        """
+
+        self.log_info('sending configure message to %s' % rank)
+        self.send_ctrl(['configure', params], rank)
 
     def stop(self):
         """
@@ -299,7 +738,7 @@ class WorkerManager(ProcessManager):
 
         self.log_info('sending stop message')
         for dest in xrange(len(self)):
-            self.intercomm.isend(['stop'], dest, self._ctrl_tag)
+            self.send_ctrl(['stop'], dest)
 
     def quit(self):
         """
@@ -308,7 +747,7 @@ class WorkerManager(ProcessManager):
 
         self.log_info('sending quit message')
         for dest in xrange(len(self)):
-            self.intercomm.isend(['quit'], dest, self._ctrl_tag)
+            self.send_ctrl(['quit'], dest)
 
 if __name__ == '__main__':
     import neurokernel.mpi_relaunch
@@ -5,6 +5,7 @@ Backend program invoked by MPI spawn.
 """
 
 import importlib
+import sys
 
 # Use dill for mpi4py object serialization to accomodate a wider range of argument
 # possibilities than possible with pickle:
@@ -79,20 +80,38 @@ for k, v in emitters.iteritems():
     else:
         twiggy.emitters[k] = v
 
-# Get the routing table:
-routing_table =  parent.bcast(None, root=0)
+# Get the part of the routing table required by the target:
+routing_table = parent.recv()
 
-# Get the target class/function and its constructor arguments:
-target, target_globals, kwargs = parent.recv()
+# Get the target class/function (or a reference to it), its constructor
+# arguments, the attributes to set on the instance, and the CPUs (or placement
+# policy) to which to pin the process:
+target, target_globals, kwargs, attrs, cpus = parent.recv()
 
-# Insert the transmitted globals into the current scope:
-globals()[target.__name__] = target
-for k, n in target_globals.iteritems():
-    globals()[k] = n
+# Pin the process before instantiating the target so that the memory it
+# allocates is local to the CPUs on which it runs:
+if cpus is not None:
+    neurokernel.mpi_proc.pin(cpus, MPI.COMM_WORLD)
+
+if isinstance(target, basestring):
+
+    # Import the referenced class using the spawning process' import path:
+    for p in reversed(target_globals):
+        if p not in sys.path:
+            sys.path.insert(0, p)
+    target = neurokernel.mpi_proc.import_target(target)
+else:
+
+    # Insert the transmitted globals into the current scope:
+    globals()[target.__name__] = target
+    for k, n in target_globals.iteritems():
+        globals()[k] = n
 
 # Add the routing table to the target arguments:
 kwargs['routing_table'] = routing_table
 
 # Instantiate and run the target class:
 instance = target(**kwargs)
+for k, v in attrs.iteritems():
+    setattr(instance, k, v)
 instance.run()
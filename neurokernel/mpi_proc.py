@@ -4,6 +4,7 @@
 Classes for managing MPI-based processes.
 """
 
+import importlib
 import inspect
 import os
 import sys
@@ -30,6 +31,7 @@ except AttributeError:
     MPI._p_pickle.loads = dill.loads
 
 from mixins import LoggerMixin
+import tools.affinity
 from tools.logging import set_excepthook
 from tools.misc import memoized_property
 from all_global_vars import all_global_vars
@@ -90,6 +92,96 @@ def args_to_dict(f, *args, **kwargs):
         d[arg] = val
     return d
 
+# Communicators used when the program is launched in SPMD mode:
+_spmd_comms = None
+
+def is_spmd():
+    """
+    Check whether the program was launched in SPMD mode.
+
+    In SPMD mode, the program is started with `mpiexec -n P+1`; rank 0 runs
+    the manager and ranks 1 through P run the targets added to it, so no
+    processes are spawned.
+    """
+
+    return MPI.COMM_WORLD.Get_size() > 1 and \
+        MPI.Comm.Get_parent() == MPI.COMM_NULL
+
+def spmd_comms():
+    """
+    Return communicators used in SPMD mode.
+
+    Must be first invoked by all processes in `MPI.COMM_WORLD`.
+
+    Returns
+    -------
+    intracomm : mpi4py.MPI.Intracomm
+        Intracommunicator containing the manager (on the manager) or all of the
+        targets (on the targets).
+    intercomm : mpi4py.MPI.Intercomm
+        Intercommunicator between the manager and the targets; as with a
+        spawned intercommunicator, the manager has rank 0 in its group and
+        the targets are ranked from 0 in theirs.
+    """
+
+    global _spmd_comms
+    if _spmd_comms is None:
+        is_manager = MPI.COMM_WORLD.Get_rank() == 0
+        intracomm = MPI.COMM_WORLD.Split(0 if is_manager else 1)
+        intercomm = intracomm.Create_intercomm(0, MPI.COMM_WORLD,
+                                               1 if is_manager else 0)
+        _spmd_comms = (intracomm, intercomm)
+    return _spmd_comms
+
+def local_rank(comm):
+    """
+    Return rank of the calling process among the processes on the same host.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Intracomm
+        Communicator containing the processes; must be invoked by all of them.
+
+    Returns
+    -------
+    rank : int
+        Rank among the processes in `comm` on the same host, or the rank in
+        `comm` if the MPI implementation cannot group processes by host.
+    """
+
+    try:
+        local_comm = comm.Split_type(MPI.COMM_TYPE_SHARED)
+    except (AttributeError, NotImplementedError):
+        return comm.Get_rank()
+    rank = local_comm.Get_rank()
+    local_comm.Free()
+    return rank
+
+def pin(cpus, comm):
+    """
+    Pin a target process to specific CPUs.
+
+    Parameters
+    ----------
+    cpus : str or sequence of int
+        CPU indices or the name of a placement policy accepted by
+        `neurokernel.tools.affinity.policy_cpus()`. Under a policy, the first
+        process on each host is assumed to be reserved for the manager.
+    comm : mpi4py.MPI.Intracomm
+        Communicator containing all target processes; must be invoked by all
+        of them if `cpus` is a policy.
+
+    Returns
+    -------
+    cpus : list of int
+        CPU indices to which the process was pinned.
+    """
+
+    if isinstance(cpus, basestring):
+        cpus = tools.affinity.policy_cpus(cpus, local_rank(comm)+1)
+    tools.affinity.set_affinity(cpus)
+    return list(cpus)
+
 class Process(LoggerMixin):
     """
     Process class.
@@ -108,6 +200,8 @@ class Process(LoggerMixin):
         Intracommunicator to access peer processes.
         """
 
+        if _spmd_comms is not None:
+            return _spmd_comms[0]
         return MPI.COMM_WORLD
 
     @memoized_property
@@ -116,6 +210,8 @@ class Process(LoggerMixin):
         Intercommunicator to access parent process.
         """
 
+        if _spmd_comms is not None:
+            return _spmd_comms[1]
         return MPI.Comm.Get_parent()
 
     @memoized_property
@@ -124,7 +220,7 @@ class Process(LoggerMixin):
         MPI process rank.
         """
 
-        return MPI.COMM_WORLD.Get_rank()
+        return self.intracomm.Get_rank()
 
     @memoized_property
     def size(self):
@@ -132,7 +228,7 @@ class Process(LoggerMixin):
         Number of peer processes.
         """
 
-        return MPI.COMM_WORLD.Get_size()
+        return self.intracomm.Get_size()
 
     def run(self):
         """
@@ -165,11 +261,51 @@ class Process(LoggerMixin):
     def recv_peer(self, source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG):
         return self.intracomm.recv(source=source, tag=tag)
 
+def target_ref(target):
+    """
+    Return reference to a class that can be imported by another process.
+
+    Parameters
+    ----------
+    target : class
+        Class to reference.
+
+    Returns
+    -------
+    ref : str
+        Reference of the form 'module:name', or None if the class is defined
+        in the `__main__` module or cannot otherwise be found by importing its
+        module (e.g., because it is defined inside a function).
+    """
+
+    module = sys.modules.get(target.__module__)
+    if target.__module__ == '__main__' or module is None or \
+       getattr(module, target.__name__, None) is not target:
+        return None
+    return '%s:%s' % (target.__module__, target.__name__)
+
+def import_target(ref):
+    """
+    Import class referenced by a string returned by `target_ref()`.
+    """
+
+    module_name, name = ref.split(':')
+    return getattr(importlib.import_module(module_name), name)
+
 class ProcessManager(LoggerMixin):
     """
     Process manager class.
+
+    Attributes
+    ----------
+    import_targets : bool
+        If True, target classes defined in importable modules are imported
+        by the spawned processes; otherwise, all targets are serialized along
+        with the globals they access.
     """
 
+    import_targets = True
+
     def __init__(self):
         LoggerMixin.__init__(self, 'man')
         set_excepthook(self.logger, True)
@@ -179,6 +315,9 @@ class ProcessManager(LoggerMixin):
         self._kwargs = {}
         self._intercomm = MPI.COMM_NULL
 
+        # Globals accessed by serialized target classes:
+        self._target_globals = {}
+
         self._rank = 0
 
     @property
@@ -223,6 +362,24 @@ class ProcessManager(LoggerMixin):
     def __len__(self):
         return len(self._targets)
 
+    def reorder(self, ranks):
+        """
+        Reassign the ranks of the targets.
+
+        Must be called before `spawn()`.
+
+        Parameters
+        ----------
+        ranks : sequence of int
+            Current ranks of the targets in their new order, i.e., the target
+            with rank `ranks[i]` is assigned rank `i`.
+        """
+
+        if sorted(ranks) != range(len(self)):
+            raise ValueError('invalid rank permutation')
+        self._targets = {i: self._targets[r] for i, r in enumerate(ranks)}
+        self._kwargs = {i: self._kwargs[r] for i, r in enumerate(ranks)}
+
     @memoized_property
     def _is_parent(self):
         """
@@ -231,12 +388,67 @@ class ProcessManager(LoggerMixin):
 
         return MPI.Comm.Get_parent() == MPI.COMM_NULL
 
-    def spawn(self):
+    def get_routing_table(self, rank):
+        """
+        Return the routing table to transmit to the specified target.
+
+        Child classes may override this method to only transmit the
+        connections required by each target.
+
+        Parameters
+        ----------
+        rank : int
+            MPI rank of target.
+
+        Returns
+        -------
+        routing_table : neurokernel.routing_table.RoutingTable
+            Routing table.
+        """
+
+        return self.routing_table
+
+    def spawn(self, affinity=None, **attrs):
         """
         Spawn MPI processes for and execute each of the managed targets.
+
+        If the program was launched in SPMD mode, no processes are spawned;
+        instead, every process other than the manager runs the target with
+        the corresponding rank and exits when it finishes.
+
+        Parameters
+        ----------
+        affinity : str or dict
+            If 'core' or 'numa', pin the manager and the targets on each
+            host to single cores or to NUMA nodes assigned round-robin by
+            socket (see `neurokernel.tools.affinity.policy_cpus()`); the first
+            core or node of each host is reserved for the manager. If a dict,
+            pin each target to the CPUs in the list keyed by its rank and the
+            manager to the CPUs keyed by 'manager'. Targets are pinned before
+            they are instantiated. If None, no processes are pinned.
+        attrs : dict
+            Attributes to set on each of the instantiated targets before they
+            are run.
         """
 
-        if self._is_parent:
+        if is_spmd():
+            intracomm, intercomm = spmd_comms()
+            n_targets = intercomm.Get_size() if MPI.COMM_WORLD.Get_rank() else \
+                intercomm.Get_remote_size()
+            if n_targets != len(self):
+                raise ValueError('number of target processes (%s) does not match '
+                                 'number of targets (%s)' % \
+                                 (n_targets, len(self)))
+            if MPI.COMM_WORLD.Get_rank() == 0:
+                self._pin_manager(affinity)
+                self._intercomm = intercomm
+            else:
+                self._run_spmd_target(intracomm.Get_rank(), attrs,
+                                      self._target_cpus(affinity,
+                                                        intracomm.Get_rank()))
+        elif self._is_parent:
+            self._pin_manager(affinity)
+
             # Find the path to the mpi_backend.py script (which should be in the
             # same directory as this module:
             parent_dir = os.path.dirname(__file__)
@@ -252,23 +464,30 @@ class ProcessManager(LoggerMixin):
             for i in self._targets.keys():
                 self._intercomm.send(twiggy.emitters, i)
 
-            # Next, serialize the routing table ONCE and then transmit it to all
-            # of the child nodes:
-            self._intercomm.bcast(self.routing_table, root=MPI.ROOT)
+            # Next, transmit to each of the child nodes only the part of the
+            # routing table that it requires:
+            req = MPI.Request()
+            r_list = []
+            for i in self._targets.keys():
+                r_list.append(self._intercomm.isend(self.get_routing_table(i), i))
+            req.Waitall(r_list)
 
             # Transmit class to instantiate, globals required by the class, and
             # the constructor arguments; the backend will wait to receive
             # them and then start running the targets on the appropriate nodes.
-            req = MPI.Request()
+            # Classes that can be imported are transmitted as references
+            # along with the import path:
             r_list = []
             for i in self._targets.keys():
-                target_globals = all_global_vars(self._targets[i])
-
-                # Serializing atexit with dill appears to fail in virtualenvs
-                # sometimes if atexit._exithandlers contains an unserializable function:
-                if 'atexit' in target_globals:
-                    del target_globals['atexit']
-                data = (self._targets[i], target_globals, self._kwargs[i])
+                target = self._targets[i]
+                ref = target_ref(target) if self.import_targets else None
+                if ref is not None:
+                    data = (ref, sys.path, self._kwargs[i], attrs,
+                            self._target_cpus(affinity, i))
+                else:
+                    data = (target, self._get_target_globals(target),
+                            self._kwargs[i], attrs,
+                            self._target_cpus(affinity, i))
                 r_list.append(self._intercomm.isend(data, i))
 
                 # Need to clobber data to prevent all_global_vars from
@@ -276,6 +495,74 @@ class ProcessManager(LoggerMixin):
                 del data
             req.Waitall(r_list)
 
+    def _pin_manager(self, affinity):
+        """
+        Pin the manager process as specified by a spawn affinity argument.
+        """
+
+        if affinity is None:
+            return
+        elif isinstance(affinity, basestring):
+            cpus = tools.affinity.policy_cpus(affinity, 0)
+        else:
+            cpus = affinity.get('manager')
+        if cpus is not None:
+            tools.affinity.set_affinity(cpus)
+            self.log_info('pinned manager to CPUs %s' % cpus)
+
+    def _target_cpus(self, affinity, rank):
+        """
+        Return the CPUs or policy to transmit to the target with specified rank.
+        """
+
+        if affinity is None or isinstance(affinity, basestring):
+            return affinity
+        return affinity.get(rank)
+
+    def _run_spmd_target(self, rank, attrs, cpus=None):
+        """
+        Instantiate and run a target in the current process and then exit.
+
+        Used in SPMD mode, in which every process constructs the same manager.
+
+        Parameters
+        ----------
+        rank : int
+            Rank of target to run.
+        attrs : dict
+            Attributes to set on the instantiated target before it is run.
+        cpus : str or list of int
+            CPUs or placement policy to which to pin the process before
+            instantiating the target.
+        """
+
+        if cpus is not None:
+            pin(cpus, spmd_comms()[0])
+        kwargs = self._kwargs[rank].copy()
+        kwargs['routing_table'] = self.get_routing_table(rank)
+        instance = self._targets[rank](**kwargs)
+        for k, v in attrs.iteritems():
+            setattr(instance, k, v)
+        instance.run()
+        sys.exit(0)
+
+    def _get_target_globals(self, target):
+        """
+        Return globals accessed by a target class that must be serialized.
+
+        The globals are only found once for each class.
+        """
+
+        if target not in self._target_globals:
+            target_globals = all_global_vars(target)
+
+            # Serializing atexit with dill appears to fail in virtualenvs
+            # sometimes if atexit._exithandlers contains an unserializable function:
+            if 'atexit' in target_globals:
+                del target_globals['atexit']
+            self._target_globals[target] = target_globals
+        return self._target_globals[target]
+
     def send(self, data, dest, tag=0):
         """
         Send data to child process.
@@ -3,6 +3,9 @@
 """
 Relaunches an mpi4py program with mpiexec so that it can spawn processes.
 Should be the first import in the program.
+
+Programs launched with `mpiexec -n P+1` to run P targets without spawning
+processes are not relaunched.
 """
 
 import inspect
@@ -32,10 +35,13 @@ for k in env.keys():
 # MPIEXEC_EXTRA_OPTS = ['--mca', 'btl_tcp_if_include', 'eth0']
 MPIEXEC_EXTRA_OPTS = []
 
-# Get name of the file in which this module is imported:
+# Get name of the file in which this module is imported; the program is not
+# relaunched if it was started by mpiexec or if it was launched with multiple
+# processes (i.e., in SPMD mode) by some other launcher:
 script_name = inspect.stack()[1][1]
 parent_name = psutil.Process(os.getppid()).name()
-if not re.search('mpirun|mpiexec', parent_name):
+if not re.search('mpirun|mpiexec', parent_name) and \
+   MPI.COMM_WORLD.Get_size() == 1:
 
     # Retry without redirection if an IOError occurs, e.g., in an IPython
     # notebook because the overriden iostreams don't have a file
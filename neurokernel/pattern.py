@@ -4,13 +4,13 @@
 Represent connectivity pattern using pandas DataFrame.
 """
 
-from collections import OrderedDict
 import itertools
 import re
 
 import networkx as nx
 import numpy as np
 import pandas as pd
+import scipy.sparse
 
 from plsel import Selector, SelectorMethods
 from pm import BasePortMapper
@@ -36,6 +36,10 @@ class Interface(object):
     (i.e., every 'in' port in one interface must be mirrored by an 'out' port
     in the other interface.
 
+    The 'interface', 'io', and 'type' attributes are stored as categoricals,
+    i.e., as one small integer code per port and a single copy of each of
+    the distinct attribute values.
+
     Examples
     --------
     >>> i = Interface('/foo[0:4],/bar[0:3]')
@@ -74,11 +78,64 @@ class Interface(object):
         names = [i for i in xrange(self.num_levels)]
         idx = self.sel.make_index(selector, names)
         self.__validate_index__(idx)
-        self.data = pd.DataFrame(index=idx, columns=columns, dtype=object)
+        self.data = self._compact(pd.DataFrame(index=idx, columns=columns,
+                                               dtype=object))
 
         # Dictionary containing mappers for different port types:
         self.pm = {}
         
+    @staticmethod
+    def _compact(df):
+        """
+        Store the port attribute columns of a DataFrame as categoricals.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            Interface data.
+
+        Returns
+        -------
+        result : pandas.DataFrame
+            Interface data with the same index and columns whose 'interface',
+            'io', and 'type' columns are categoricals.
+        """
+
+        # Assemble a new frame rather than assigning the columns in place
+        # because assigning to the columns of an empty frame replaces its
+        # index:
+        data = {}
+        for k in df.columns:
+            if k in ['interface', 'io', 'type']:
+                data[k] = pd.Categorical(df[k].values)
+            else:
+                data[k] = df[k].values
+        return pd.DataFrame(data, index=df.index, columns=df.columns)
+
+    def _add_categories(self, k, value):
+        """
+        Add any values not yet stored in a categorical column to its categories.
+
+        Parameters
+        ----------
+        k : str
+            Column name.
+        value : scalar or sequence
+            Values about to be assigned to entries of the column.
+        """
+
+        col = self.data[k]
+        if col.dtype.name != 'category':
+            return
+        if np.iterable(value) and type(value) not in [str, unicode]:
+            values = pd.unique(np.asarray(value, object).ravel())
+        else:
+            values = [value]
+        new = [v for v in values if pd.notnull(v) and \
+               v not in col.cat.categories]
+        if new:
+            self.data[k] = col.cat.add_categories(new)
+
     def __validate_index__(self, idx):
         """
         Raise an exception if the specified index will result in an invalid interface.
@@ -130,6 +187,7 @@ class Interface(object):
                 raise ValueError('cannot assign specified value')
 
         for k, v in data.iteritems():
+            self._add_categories(k, v)
             self.data[k].ix[idx] = v
 
     def __setitem__(self, key, value):
@@ -174,6 +232,16 @@ class Interface(object):
             else:
                 raise ValueError('cannot assign specified value')
 
+        # Find the rows of the specified ports once and assign the values of
+        # all columns to them:
+        for k, v in data.iteritems():
+            self._add_categories(k, v)
+        rows = self._get_rows(selector)
+        if rows is not None:
+            for k, v in data.iteritems():
+                self.data.iloc[rows, self.data.columns.get_loc(k)] = v
+            return
+
         if selector.max_levels == 1:
             s = [i for i in itertools.chain(*selector.expanded)]
         else:
@@ -181,7 +249,41 @@ class Interface(object):
                                       len(self.index.shape))
         for k, v in data.iteritems():
             self.data[k].ix[s] = v
-        
+
+    def _get_rows(self, selector):
+        """
+        Find the positions of the identifiers comprised by a selector.
+
+        Parameters
+        ----------
+        selector : Selector
+            Nonempty selector.
+
+        Returns
+        -------
+        rows : numpy.ndarray
+            Positions in the interface index of the identifiers comprised by
+            the selector, or None if any of the identifiers is not in the
+            index.
+        """
+
+        idx = self.data.index
+        if isinstance(idx, pd.MultiIndex):
+            n = idx.nlevels
+            if selector.max_levels > n:
+                return None
+            ids = selector.expanded
+            if any(len(t) < n for t in ids):
+                ids = [tuple(t)+('',)*(n-len(t)) for t in ids]
+            rows = idx.get_indexer(list(ids))
+        elif selector.max_levels == 1:
+            rows = idx.get_indexer([t[0] for t in selector.expanded])
+        else:
+            return None
+        if (rows < 0).any():
+            return None
+        return rows
+
     @property
     def index(self):
         """
@@ -301,19 +403,14 @@ class Interface(object):
         """
 
         assert set(df.columns).issuperset(['interface', 'io', 'type'])
-        if isinstance(df.index, pd.MultiIndex):
-            if len(df.index):
-                i = cls(df.index.tolist(), df.columns)
-            else:
-                i = cls([()], df.columns)
-        elif isinstance(df.index, pd.Index):
-            if len(df.index):
-                i = cls([(s,) for s in df.index.tolist()], df.columns)
-            else:
-                i = cls([()], df.columns)
-        else:
+        if not isinstance(df.index, pd.Index):
             raise ValueError('invalid index type')
-        i.data = df.copy()
+
+        # The index of the DataFrame is used directly rather than recreated
+        # from the port identifiers that it contains:
+        i = cls('', df.columns)
+        i.num_levels = df.index.nlevels if len(df.index) else 0
+        i.data = cls._compact(df.copy())
         i.__validate_index__(i.index)
         return i
 
@@ -558,42 +655,117 @@ class Interface(object):
                 else:
                     return self.from_df(df)
 
-    def _merge_on_interfaces(self, a, i, b):
+    @staticmethod
+    def _index_codes(idx, n):
         """
-        Merge contents of this and another Interface instance.
+        Get the level values and labels of an index padded to some number of levels.
+
+        Parameters
+        ----------
+        idx : pandas.Index
+            Index of an Interface instance's DataFrame.
+        n : int
+            Number of levels; must not be less than the number of levels in
+            the index.
+
+        Returns
+        -------
+        levels : list of numpy.ndarray
+            Values of each level.
+        labels : list of numpy.ndarray
+            Integer labels of each level's values for each entry in the index.
+            Padding levels only contain the blank value ''.
+        """
+
+        if isinstance(idx, pd.MultiIndex):
+            levels = [np.asarray(l, dtype=object) for l in idx.levels]
+            labels = [np.asarray(l, dtype=np.int64) for l in idx.labels]
+        else:
+            levels = [np.asarray(idx, dtype=object)]
+            labels = [np.arange(len(idx), dtype=np.int64)]
+        for k in xrange(len(levels), n):
+            levels.append(np.array([''], dtype=object))
+            labels.append(np.zeros(len(idx), dtype=np.int64))
+        return levels, labels
+
+    def _get_common_rows(self, a, i, b, t=None):
+        """
+        Find the rows of port identifiers common to this and another Interface instance.
+
+        Parameters
+        ----------
+        a : int
+            Identifier of interface in the current instance.
+        i : Interface
+            Interface instance containing the other interface.
+        b : int
+            Identifier of interface in instance `i`.
+        t : str or unicode
+            If not None, restrict output to those identifiers with the specified
+            port type.
+
+        Returns
+        -------
+        x_rows, y_rows : numpy.ndarray
+            Aligned positions in the DataFrames of this instance and of `i`
+            of the common port identifiers.
+        x_num, y_num : int
+            Numbers of ports in the specified interfaces of this instance and
+            of `i`.
 
         Notes
         -----
         If the number of levels in one Interface instance's DataFrame index is
-        greater than that of the other, the number of levels in the index of the
-        merged DataFrames instances is set to the former and the index with the
-        smaller number is padded with blank entries to enable Panda's merge
-        mechanism to function properly.
+        greater than that of the other, the index with the smaller number of
+        levels is padded with blank entries before comparing identifiers. The
+        identifiers are compared as combinations of integer codes assigned to
+        the values of each level.
         """
 
         assert isinstance(i, Interface)
-        df_left = self.data[self.data['interface'] == a]
-        df_right = i.data[i.data['interface'] == b]
-        n_left_names = len(self.data.index.names)
-        n_right_names = len(i.data.index.names)
-
-        # Pandas' merge mechanism fails if the number of levels in each of the 
-        # merged MultiIndex indices differs and there is overlap of more than
-        # one level; we therefore pad the index with the smaller number of
-        # levels before attempting the merge:
-        if n_left_names > n_right_names:
-            for n in xrange(i.num_levels, i.num_levels+(n_left_names-n_right_names)):
-                new_col = str(n)
-                df_right[new_col] = ''
-                df_right.set_index(new_col, append=True, inplace=True)
-        elif n_left_names < n_right_names:
-            for n in xrange(self.num_levels, self.num_levels+(n_right_names-n_left_names)):
-                new_col = str(n)
-                df_left[new_col] = ''
-                df_left.set_index(new_col, append=True, inplace=True)
-        return pd.merge(df_left, df_right,                            
-                        left_index=True,
-                        right_index=True)
+        x_mask = (self.data['interface'] == a).values
+        y_mask = (i.data['interface'] == b).values
+        if t is not None:
+            x_mask &= (self.data['type'] == t).values
+            y_mask &= (i.data['type'] == t).values
+        x_rows = np.flatnonzero(x_mask)
+        y_rows = np.flatnonzero(y_mask)
+        if not len(x_rows) or not len(y_rows):
+            return np.array([], np.int64), np.array([], np.int64), \
+                len(x_rows), len(y_rows)
+
+        # Assign common codes to the values of each level in both indices and
+        # combine the codes of all levels into a single key for each
+        # identifier; the keys are recoded whenever they might overflow:
+        n = max(self.data.index.nlevels, i.data.index.nlevels)
+        x_levels, x_labels = self._index_codes(self.data.index, n)
+        y_levels, y_labels = self._index_codes(i.data.index, n)
+        x_keys = np.zeros(len(x_rows), np.int64)
+        y_keys = np.zeros(len(y_rows), np.int64)
+        num_keys = 1
+        for k in xrange(n):
+            codes, uniques = pd.factorize(np.concatenate([x_levels[k],
+                                                          y_levels[k]]))
+            num_codes = len(uniques)
+            if num_keys*num_codes >= np.iinfo(np.int64).max:
+                keys, uniques = pd.factorize(np.concatenate([x_keys, y_keys]))
+                x_keys = keys[:len(x_keys)].astype(np.int64)
+                y_keys = keys[len(x_keys):].astype(np.int64)
+                num_keys = len(uniques)
+            x_keys = x_keys*num_codes+ \
+                     codes[:len(x_levels[k])][x_labels[k][x_rows]]
+            y_keys = y_keys*num_codes+ \
+                     codes[len(x_levels[k]):][y_labels[k][y_rows]]
+            num_keys *= num_codes
+
+        # Port identifiers are unique, so each key in one interface matches
+        # at most one key in the other:
+        order = np.argsort(y_keys, kind='mergesort')
+        pos = np.searchsorted(y_keys[order], x_keys)
+        pos[pos == len(order)] = 0
+        found = y_keys[order][pos] == x_keys
+        return x_rows[found], y_rows[order[pos[found]]], \
+            len(x_rows), len(y_rows)
 
     def get_common_ports(self, a, i, b, t=None):
         """
@@ -625,25 +797,13 @@ class Interface(object):
         The order of the returned port identifiers is not guaranteed.
         """
 
-        if t is None:
-            x = self.data[self.data['interface'] == a]
-            y = i.data[i.data['interface'] == b]
+        x_rows = self._get_common_rows(a, i, b, t)[0]
+        x = self.data.index[x_rows]
+        if isinstance(x, pd.MultiIndex):
+            return [tuple(a for a in b if a != '') for b in x]
         else:
-            x = self.data[(self.data['interface'] == a) & (self.data['type'] == t)]
-            y = i.data[(i.data['interface'] == b) & (i.data['type'] == t)]
-        if isinstance(x.index, pd.MultiIndex):
-            x_list = [tuple(a for a in b if a != '') \
-                      for b in x.index]
-        else:
-            x_list = [(a,) for a in x.index]
-        if isinstance(y.index, pd.MultiIndex):
-            y_list = [tuple(a for a in b if a != '') \
-                      for b in y.index]
-        else:
-            y_list = [(a,) for a in y.index]
+            return [(a,) for a in x]
 
-        return list(set(x_list).intersection(y_list))
-        
     def is_compatible(self, a, i, b, allow_subsets=False):
         """
         Check whether two interfaces can be connected.
@@ -672,15 +832,23 @@ class Interface(object):
             interfaces match, and each identifier with an 'io' attribute set 
             to 'out' in one interface has its 'io' attribute set to 'in' in the 
             other interface.
-
-        Notes
-        -----
-        Assumes that the port identifiers in both interfaces are sorted in the
-        same order.
         """
         
-        # Merge the interface data on their indices (i.e., their port identifiers):
-        data_merged = self._merge_on_interfaces(a, i, b)
+        # Align the interface data on their port identifiers:
+        x_rows, y_rows, x_num, y_num = self._get_common_rows(a, i, b)
+
+        # Compatible identifiers must have the same non-null 'type'
+        # attribute and their non-null 'io' attributes must be the inverse
+        # of each other:
+        type_x = np.asarray(self.data['type'].values[x_rows])
+        type_y = np.asarray(i.data['type'].values[y_rows])
+        io_x = np.asarray(self.data['io'].values[x_rows])
+        io_y = np.asarray(i.data['io'].values[y_rows])
+        compat = ((type_x == type_y) | \
+                  (pd.isnull(type_x) & pd.isnull(type_y))) & \
+                 (((io_x == 'out') & (io_y == 'in')) | \
+                  ((io_x == 'in') & (io_y == 'out')) | \
+                  (pd.isnull(io_x) & pd.isnull(io_y)))
 
         # Check whether there are compatible subsets, i.e., at least one pair of
         # ports from the two interfaces that are compatible with each other:
@@ -688,40 +856,19 @@ class Interface(object):
 
             # If the interfaces share no identical port identifiers, they are
             # incompatible:
-            if not len(data_merged):
+            if not len(x_rows):
                 return False
-
-            # Compatible identifiers must have the same non-null 'type'
-            # attribute and their non-null 'io' attributes must be the inverse
-            # of each other:
-            if not data_merged.apply(lambda row: \
-                    ((row['type_x'] == row['type_y']) or \
-                     (pd.isnull(row['type_x']) and pd.isnull(row['type_y']))) and \
-                    ((row['io_x'] == 'out' and row['io_y'] == 'in') or \
-                     (row['io_x'] == 'in' and row['io_y'] == 'out') or \
-                     (pd.isnull(row['io_x']) and pd.isnull(row['io_y']))),
-                                     axis=1).any():
+            if not compat.any():
                 return False
 
         # Require that all ports in the two interfaces be compatible:
         else:
-            
+
             # If one interface contains identifiers not in the other, they are
             # incompatible:
-            if len(data_merged) < max(len(self.data[self.data['interface'] == a]),
-                                      len(i.data[i.data['interface'] == b])):
+            if len(x_rows) < max(x_num, y_num):
                 return False
-
-            # Compatible identifiers must have the same non-null 'type'
-            # attribute and their non-null 'io' attributes must be the inverse
-            # of each other:
-            if not data_merged.apply(lambda row: \
-                    ((row['type_x'] == row['type_y']) or \
-                     (pd.isnull(row['type_x']) and pd.isnull(row['type_y']))) and \
-                    ((row['io_x'] == 'out' and row['io_y'] == 'in') or \
-                     (row['io_x'] == 'in' and row['io_y'] == 'out') or \
-                     (pd.isnull(row['io_x']) and pd.isnull(row['io_y']))),
-                                     axis=1).all():
+            if not compat.all():
                 return False
 
         # All tests passed:
@@ -1080,26 +1227,40 @@ class Pattern(object):
         # denote a port in more than one set:
         assert self.sel.are_disjoint(*selectors)
 
-        # Collect all of the selectors:
+        # Collect all of the selectors and the number of ports comprised by
+        # each:
         selector = []
+        counts = []
+        sels = []
         for s in selectors:
-            if isinstance(s, Selector) and len(s) != 0:
-                selector.extend(s.expanded)
-            elif type(s) in [str, unicode]:
-                selector.extend(self.sel.parse(s))
+            if type(s) in [str, unicode]:
+                s = Selector(s)
+            if isinstance(s, Selector):
+                if len(s) != 0:
+                    selector.extend(s.expanded)
+                    sels.append(s)
+                counts.append(len(s))
             elif np.iterable(s):
                 selector.extend(s)
+                counts.append(self.sel.count_ports(s))
+                sels = None
             else:
                 raise ValueError('invalid selector type')
 
         # Create Interface instance containing the ports comprised by all of the
-        # specified selectors:
-        self.interface = Interface(selector)
+        # specified selectors; if the selectors are expanded and all of their
+        # identifiers have the same number of levels, the interface's index
+        # can be created directly from a single combined Selector:
+        if sels and len(set(map(len, selector))) == 1:
+            self.interface = Interface(Selector.add(*sels))
+        else:
+            self.interface = Interface(selector)
 
         # Set the interface identifiers associated with each of the selectors
-        # consecutively:
-        for i, s in enumerate(selectors):
-            self.interface[s, 'interface'] = i
+        # consecutively; the ports in the interface are in the same order as
+        # the selectors:
+        self.interface.data['interface'] = \
+            pd.Categorical(np.repeat(np.arange(len(counts)), counts))
 
         # Create a MultiIndex that can store mappings between identifiers in the
         # two interfaces:
@@ -1112,7 +1273,11 @@ class Pattern(object):
         idx = pd.MultiIndex(levels=levels, labels=labels, names=names)
 
         self.data = pd.DataFrame(index=idx, columns=columns, dtype=object)
-        
+
+        # Cached positions in the interface of the ports in each row of the
+        # pattern; see `_port_rows()`:
+        self._rows = None
+
     @property
     def from_slice(self):
         """
@@ -1465,6 +1630,131 @@ class Pattern(object):
                                 gpot_sel=gpot_sel, spike_sel=spike_sel,
                                 data=data, columns=columns, comb_op='.+', validate=validate)
 
+    @classmethod
+    def from_edges(cls, src_ports, dest_ports, *selectors, **kwargs):
+        """
+        Create pattern from parallel sequences of connected ports.
+
+        For example: ::
+
+            p = Pattern.from_edges(['/foo[0]', '/foo[0]'],
+                                   ['/bar[0]', '/bar[1]'],
+                                   '/foo[0:2]', '/bar[0:2]', types='gpot')
+
+        results in a pattern with the following connections: ::
+
+            '/foo[0]' -> '/bar[0]'
+            '/foo[0]' -> '/bar[1]'
+
+        Parameters
+        ----------
+        src_ports, dest_ports : sequence
+            Source and destination ports of each connection. The ports may
+            be specified as integer positions in the sequence of identifiers
+            comprised by all of the selectors in the order in which they are
+            specified, as tuples of tokens (e.g., ('foo', 0)), or as selector
+            strings that each comprise a single identifier (e.g., '/foo[0]').
+        sel0, sel1, ...: str
+            Selectors defining the sets of ports potentially connected by the 
+            pattern. These selectors must be disjoint, i.e., no identifier
+            comprised by one selector may be in any other selector.
+        types : str or sequence of str
+            If specified, the 'type' attribute of the source and destination
+            ports of all connections, or of each connection.
+        attrs : dict
+            Data of the connections keyed by column name; each value is
+            either a scalar or a sequence with one entry per connection. The
+            'conn' attribute of each connection is set to 1 unless specified.
+
+        Returns
+        -------
+        result : Pattern
+            Pattern instance.
+
+        Notes
+        -----
+        The validity of the connections (e.g., the absence of fan-in) is
+        checked once for all of the connections rather than as each
+        connection is added.
+        """
+
+        types = kwargs['types'] if kwargs.has_key('types') else None
+        attrs = kwargs['attrs'] if kwargs.has_key('attrs') else {}
+        columns = ['conn']+sorted([k for k in attrs if k != 'conn'])
+        p = cls(*selectors, columns=columns)
+
+        from_rows = p._port_positions(src_ports)
+        to_rows = p._port_positions(dest_ports)
+        if len(from_rows) != len(to_rows):
+            raise ValueError('numbers of source and destination ports differ')
+        data = {'conn': 1}
+        data.update(attrs)
+        p._connect_rows(from_rows, to_rows, data)
+
+        # Update the `type` attributes of the pattern's interface:
+        if types is not None:
+            col = p.interface.data.columns.get_loc('type')
+            if np.iterable(types) and type(types) not in [str, unicode]:
+                types = np.asarray(types, object)
+                if len(types) != len(from_rows):
+                    raise ValueError('number of types and connections differ')
+            p.interface._add_categories('type', types)
+            for rows in [from_rows, to_rows]:
+                p.interface.data.iloc[rows, col] = types
+                if (np.asarray(p.interface.data['type'].values[rows]) != \
+                    types).any():
+                    raise ValueError('conflicting types specified for port')
+        return p
+
+    @classmethod
+    def from_csr(cls, m, src_sel, dest_sel, src_type=None, dest_type=None):
+        """
+        Create pattern from a sparse connectivity matrix.
+
+        Parameters
+        ----------
+        m : scipy.sparse.spmatrix or numpy.ndarray
+            Matrix whose nonzero entries denote connections from the
+            source port corresponding to their row to the destination port
+            corresponding to their column.
+        src_sel, dest_sel : str, unicode, or Selector
+            Selectors comprising the ports in the pattern's source and
+            destination interfaces (0 and 1), respectively. The rows and
+            columns of the matrix correspond to the identifiers comprised by
+            these selectors in the order in which they are expanded.
+        src_type, dest_type : str
+            If specified, the 'type' attribute of all ports in the source and
+            destination interfaces is set to these values.
+
+        Returns
+        -------
+        result : Pattern
+            Pattern instance.
+
+        See Also
+        --------
+        Pattern.to_csr
+        """
+
+        p = cls(src_sel, dest_sel)
+        src_rows = np.flatnonzero(p._port_mask(0)[:-1])
+        dest_rows = np.flatnonzero(p._port_mask(1)[:-1])
+        m = scipy.sparse.coo_matrix(m)
+        if m.shape != (len(src_rows), len(dest_rows)):
+            raise ValueError('matrix shape %s does not match number of ports' % \
+                             str(m.shape))
+        m.sum_duplicates()
+        nz = m.data != 0
+        p._connect_rows(src_rows[m.row[nz]], dest_rows[m.col[nz]])
+
+        p.interface._add_categories('type', [src_type, dest_type])
+        col = p.interface.data.columns.get_loc('type')
+        if src_type is not None:
+            p.interface.data.iloc[src_rows, col] = src_type
+        if dest_type is not None:
+            p.interface.data.iloc[dest_rows, col] = dest_type
+        return p
+
     def __validate_index__(self, idx):
         """
         Raise an exception if the specified index will result in an invalid pattern.
@@ -1606,6 +1896,250 @@ class Pattern(object):
         else:
             return self.sel.select(self.data, selector=selector)
 
+    def _port_rows(self):
+        """
+        Retrieve the positions in the interface of the ports in each row.
+
+        Returns
+        -------
+        from_rows, to_rows : numpy.ndarray
+            Positions in the interface index of the source and destination
+            ports of each row in the pattern, respectively; ports that are not
+            in the interface are denoted by -1.
+
+        Notes
+        -----
+        The positions are cached until the index of the pattern or of its
+        interface is replaced.
+        """
+
+        idx = self.data.index
+        int_idx = self.interface.index
+        if self._rows is None or self._rows[0] is not idx or \
+           self._rows[1] is not int_idx:
+            rows = []
+            for s in [self.from_slice, self.to_slice]:
+                if isinstance(int_idx, pd.MultiIndex):
+                    ports = pd.MultiIndex(levels=idx.levels[s],
+                                          labels=idx.labels[s],
+                                          verify_integrity=False)
+                    rows.append(int_idx.get_indexer(ports))
+                else:
+
+                    # Map the values of the pattern index level to positions
+                    # in the interface before expanding them to the rows:
+                    pos = int_idx.get_indexer(idx.levels[s.start])
+                    rows.append(pos[np.asarray(idx.labels[s.start], np.intp)])
+            self._rows = (idx, int_idx, rows[0], rows[1])
+        return self._rows[2], self._rows[3]
+
+    def _port_mask(self, i, t=None, ports=None):
+        """
+        Find the interface ports that satisfy the specified conditions.
+
+        Parameters
+        ----------
+        i : int
+            Interface identifier.
+        t : str
+            Port type. If not specified, ports of all types are selected.
+        ports : str
+            Path-like selector. If not specified, all ports in the interface
+            are selected.
+
+        Returns
+        -------
+        mask : numpy.ndarray
+            Boolean mask of the selected ports in the interface index followed
+            by an additional False entry so that the mask can be indexed with
+            the positions returned by `_port_rows()`.
+        """
+
+        data = self.interface.data
+        mask = (data['interface'] == i).values
+        if t is not None:
+            mask &= (data['type'] == t).values
+        if ports is not None:
+            sel = np.zeros(len(data), np.bool)
+            sel[self.interface.index.get_indexer(self.interface[ports].index)] = True
+            mask &= sel
+        return np.append(mask, False)
+
+    def _select_rows(self, src_int, dest_int, src_type=None, dest_type=None,
+                     src_ports=None, dest_ports=None):
+        """
+        Find the connections between the specified ports.
+
+        Returns
+        -------
+        from_rows, to_rows : numpy.ndarray
+            Positions in the interface index of the source and destination
+            ports of the selected rows in the pattern ordered by row.
+        """
+
+        assert src_int != dest_int
+        assert src_int in self.interface.interface_ids and \
+            dest_int in self.interface.interface_ids
+
+        from_rows, to_rows = self._port_rows()
+        f = self._port_mask(src_int, src_type, src_ports)[from_rows] & \
+            self._port_mask(dest_int, dest_type, dest_ports)[to_rows]
+        return from_rows[f], to_rows[f]
+
+    def _port_tuples(self, rows, duplicates=False):
+        """
+        Convert positions in the interface index to port tuples.
+
+        Parameters
+        ----------
+        rows : numpy.ndarray
+            Positions in the interface index.
+        duplicates : bool
+            If False, only retain the first occurrence of each port without
+            perturbing the order of the remaining ports.
+
+        Returns
+        -------
+        idx : list of tuple
+            Ports.
+        """
+
+        if not duplicates:
+            first = np.unique(rows, return_index=True)[1]
+            rows = rows[np.sort(first)]
+        idx = self.interface.index.take(rows).tolist()
+        if isinstance(self.interface.index, pd.MultiIndex):
+            return idx
+        else:
+            return [(x,) for x in idx]
+
+    def _port_positions(self, ports):
+        """
+        Find the positions of the specified ports in the interface index.
+
+        Parameters
+        ----------
+        ports : sequence
+            Integer positions of ports in the interface index, tuples of
+            tokens (e.g., ('foo', 0)), or selector strings that each comprise
+            a single identifier (e.g., '/foo[0]').
+
+        Returns
+        -------
+        rows : numpy.ndarray
+            Positions of the ports in the interface index.
+        """
+
+        int_idx = self.interface.index
+        if len(ports) == 0:
+            return np.zeros(0, np.intp)
+        if isinstance(ports, np.ndarray) and ports.dtype.kind in 'iu' or \
+           isinstance(ports[0], (int, long, np.integer)):
+            rows = np.asarray(ports, np.intp)
+            if rows.min() < 0 or rows.max() >= len(int_idx):
+                raise ValueError('port positions out of range')
+            return rows
+
+        if type(ports[0]) in [str, unicode]:
+            ids = [self.sel.str_to_tokens(s) for s in ports]
+        else:
+            ids = ports
+        if isinstance(int_idx, pd.MultiIndex):
+            ids = [tuple(t) for t in ids]
+            rows = int_idx.get_indexer(ids)
+
+            # Pad identifiers with fewer levels than the interface:
+            if (rows < 0).any():
+                n = self.interface.num_levels
+                ids = [t+('',)*(n-len(t)) for t in ids]
+                rows = int_idx.get_indexer(ids)
+        else:
+            rows = int_idx.get_indexer([t[0] if isinstance(t, tuple) else t \
+                                        for t in ids])
+        if (rows < 0).any():
+            raise ValueError('ports not in pattern interfaces')
+        return rows
+
+    def _validate_rows(self, from_rows, to_rows):
+        """
+        Raise an exception if the specified connections will result in an invalid pattern.
+
+        Parameters
+        ----------
+        from_rows, to_rows : numpy.ndarray
+            Positions in the interface index of the source and destination
+            ports of each connection.
+        """
+
+        # Prohibit duplicate connections:
+        n = len(self.interface.index)
+        keys = np.asarray(from_rows, np.int64)*n+to_rows
+        if len(np.unique(keys)) < len(keys):
+            raise ValueError('Duplicate pattern entries detected.')
+
+        # Prohibit fan-in connections:
+        if len(to_rows) and np.bincount(to_rows).max() > 1:
+            raise ValueError('Fan-in pattern entries detected.')
+
+        # Prohibit ports that both receive input and send output:
+        if len(np.intersect1d(from_rows, to_rows)):
+            raise ValueError('Ports cannot both receive input and send output.')
+
+        # Prohibit connections between ports in the same interface:
+        ids = np.asarray(self.interface.data['interface'].values)
+        if (ids[from_rows] == ids[to_rows]).any():
+            raise ValueError('Connected ports must be in different interfaces.')
+
+    def _connect_rows(self, from_rows, to_rows, data=None):
+        """
+        Replace the pattern's connections with the specified connections.
+
+        Parameters
+        ----------
+        from_rows, to_rows : numpy.ndarray
+            Positions in the interface index of the source and destination
+            ports of each connection.
+        data : dict
+            Data of the connections keyed by column name; each value is
+            either a scalar or a sequence with one entry per connection. If
+            not specified, the first data column of each connection is set
+            to 1.
+
+        Notes
+        -----
+        The 'io' attributes of the connected ports are updated in the same
+        manner as by `__setitem__()`.
+        """
+
+        from_rows = np.asarray(from_rows, np.intp)
+        to_rows = np.asarray(to_rows, np.intp)
+        self._validate_rows(from_rows, to_rows)
+
+        # Construct the pattern index directly from the levels and labels of
+        # the interface index:
+        int_idx = self.interface.index
+        if isinstance(int_idx, pd.MultiIndex):
+            levels = list(int_idx.levels)*2
+            labels = [np.asarray(l)[from_rows] for l in int_idx.labels]+ \
+                     [np.asarray(l)[to_rows] for l in int_idx.labels]
+        else:
+            levels = [int_idx.values]*2
+            labels = [from_rows, to_rows]
+        idx = pd.MultiIndex(levels=levels, labels=labels,
+                            names=self.data.index.names,
+                            verify_integrity=False)
+
+        if data is None:
+            data = {self.data.columns[0]: 1}
+        self.data = pd.DataFrame(data, index=idx, columns=self.data.columns,
+                                 dtype=object).sort_index()
+
+        # Update the `io` attributes of the pattern's interfaces:
+        self.interface._add_categories('io', ['in', 'out'])
+        col = self.interface.data.columns.get_loc('io')
+        self.interface.data.iloc[np.unique(from_rows), col] = 'in'
+        self.interface.data.iloc[np.unique(to_rows), col] = 'out'
+
     def src_idx(self, src_int, dest_int, 
                 src_type=None, dest_type=None, dest_ports=None, duplicates=False):
         """
@@ -1641,53 +2175,10 @@ class Pattern(object):
             Source ports connected to the specified destination ports.
         """
 
-        assert src_int != dest_int
-        assert src_int in self.interface.interface_ids and \
-            dest_int in self.interface.interface_ids
-        
-        # Filter destination ports by specified type:
-        if dest_type is None:
-            to_int = self.interface.interface_ports(dest_int)
-        else:
-            to_f = lambda x: x['type'] == dest_type
-            to_int = self.interface.interface_ports(dest_int).data_select(to_f)
-
-        # Filter destination ports by specified ports:
-        if dest_ports is None:
-            to_idx = to_int.index
-        else:
-            to_idx = to_int[dest_ports].index
-
-        # Filter source ports by specified type:
-        if src_type is None:
-            from_int = self.interface.interface_ports(src_int)
-        else:
-            from_f = lambda x: x['type'] == src_type
-            from_int = self.interface.interface_ports(src_int).data_select(from_f)
-
-        from_idx = from_int.index
-
-        # Construct index from those rows in the pattern whose ports have been
-        # selected by the above code:
-        if isinstance(from_idx, pd.MultiIndex):
-            if isinstance(to_idx, pd.MultiIndex):
-                f = lambda x: x[self.from_slice] in from_idx and x[self.to_slice] in to_idx
-            else:
-                f = lambda x: x[self.from_slice] in from_idx and x[self.to_slice][0] in to_idx
-        else:
-            if isinstance(to_idx, pd.MultiIndex):
-                f = lambda x: x[self.from_slice][0] in from_idx and x[self.to_slice] in to_idx
-            else:
-                f = lambda x: x[self.from_slice][0] in from_idx and x[self.to_slice][0] in to_idx
-        idx = self.data.select(f).index
-                
-        if not duplicates:
-
-            # Remove duplicate tuples from output without perturbing the order
-            # of the remaining tuples:
-            return OrderedDict.fromkeys([x[self.from_slice] for x in idx]).keys()
-        else:
-            return [x[self.from_slice] for x in idx]
+        from_rows, to_rows = self._select_rows(src_int, dest_int,
+                                               src_type, dest_type,
+                                               dest_ports=dest_ports)
+        return self._port_tuples(from_rows, duplicates)
 
     def dest_idx(self, src_int, dest_int, 
                  src_type=None, dest_type=None, src_ports=None):
@@ -1727,49 +2218,10 @@ class Pattern(object):
         source ports to a single destination port is not permitted.
         """
 
-        assert src_int != dest_int
-        assert src_int in self.interface.interface_ids and \
-            dest_int in self.interface.interface_ids
-
-        # Filter source ports by specified type:
-        if src_type is None:
-            from_int = self.interface.interface_ports(src_int)
-        else:
-            from_f = lambda x: x['type'] == src_type
-            from_int = self.interface.interface_ports(src_int).data_select(from_f)
-
-        # Filter source ports by specified ports:
-        if src_ports is None:
-            from_idx = from_int.index    
-        else:
-            from_idx = from_int[src_ports].index
-            
-        # Filter destination ports by specified type:
-        if dest_type is None:
-            to_int = self.interface.interface_ports(dest_int)
-        else:
-            to_f = lambda x: x['type'] == dest_type
-            to_int = self.interface.interface_ports(dest_int).data_select(to_f)
-
-        to_idx = to_int.index
-
-        # Construct index from those rows in the pattern whose ports have been
-        # selected by the above code:
-        if isinstance(from_idx, pd.MultiIndex):
-            if isinstance(to_idx, pd.MultiIndex):
-                f = lambda x: x[self.from_slice] in from_idx and x[self.to_slice] in to_idx
-            else:
-                f = lambda x: x[self.from_slice] in from_idx and x[self.to_slice][0] in to_idx
-        else:
-            if isinstance(to_idx, pd.MultiIndex):
-                f = lambda x: x[self.from_slice][0] in from_idx and x[self.to_slice] in to_idx
-            else:
-                f = lambda x: x[self.from_slice][0] in from_idx and x[self.to_slice][0] in to_idx
-        idx = self.data.select(f).index
-
-        # Remove duplicate tuples from output without perturbing the order
-        # of the remaining tuples:
-        return OrderedDict.fromkeys([x[self.to_slice] for x in idx]).keys()
+        from_rows, to_rows = self._select_rows(src_int, dest_int,
+                                               src_type, dest_type,
+                                               src_ports=src_ports)
+        return self._port_tuples(to_rows)
 
     def __len__(self):
         return self.data.__len__()
@@ -1991,6 +2443,44 @@ class Pattern(object):
 
         return g
 
+    def to_csr(self, src_int, dest_int, src_type=None, dest_type=None):
+        """
+        Convert the connections between two interfaces to a sparse matrix.
+
+        Parameters
+        ----------
+        src_int, dest_int : int
+            Source and destination interface identifiers.
+        src_type, dest_type : str
+            Types of source and destination ports as listed in their respective
+            interfaces. If not specified, ports of all types are included.
+
+        Returns
+        -------
+        m : scipy.sparse.csr_matrix
+            Boolean matrix whose rows and columns respectively correspond to
+            the specified source and destination ports in the order in which
+            they appear in the pattern's interface and whose nonzero entries
+            denote connections.
+
+        See Also
+        --------
+        Pattern.from_csr
+        """
+
+        src_mask = self._port_mask(src_int, src_type)[:-1]
+        dest_mask = self._port_mask(dest_int, dest_type)[:-1]
+        from_rows, to_rows = self._select_rows(src_int, dest_int,
+                                               src_type, dest_type)
+
+        # Map positions in the interface index to row and column indices:
+        src_inds = np.cumsum(src_mask)-1
+        dest_inds = np.cumsum(dest_mask)-1
+        return scipy.sparse.csr_matrix((np.ones(len(from_rows), np.bool),
+                                        (src_inds[from_rows],
+                                         dest_inds[to_rows])),
+                                       shape=(src_mask.sum(), dest_mask.sum()))
+
 def are_compatible(sel_in_0, sel_out_0, sel_spike_0, sel_gpot_0, 
                    sel_in_1, sel_out_1, sel_spike_1, sel_gpot_1,
                    allow_subsets=False):
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+
+"""
+Communication-aware placement of modules on MPI ranks.
+
+Modules are assigned to hosts by partitioning a graph whose vertices are the
+modules and whose edges are weighted by the number of bytes transmitted
+between them at every step so as to minimize the traffic between hosts; the
+modules assigned to each host are then ordered such that strongly connected
+modules are assigned adjacent ranks. METIS is used to partition the graph if
+pymetis is installed; otherwise, a greedy partitioner is used.
+"""
+
+import warnings
+
+import numpy as np
+
+try:
+    import pymetis
+except ImportError:
+    pymetis = None
+
+def comm_matrix(routing_table, ids, itemsize=None):
+    """
+    Compute the number of bytes transmitted between modules at every step.
+
+    Parameters
+    ----------
+    routing_table : neurokernel.routing_table.RoutingTable
+        Routing table whose connections contain either the compiled source
+        exchange plan ('src_plan') or the pattern and its interfaces
+        ('pattern', 'int_0', 'int_1').
+    ids : sequence of str
+        Module identifiers; these determine the row and column order of the
+        returned matrix.
+    itemsize : dict of dict
+        Size in bytes of the graded potential and spiking port data of each
+        module keyed by module identifier and then by port type. Modules
+        not in the dict are assumed to use 8-byte port data.
+
+    Returns
+    -------
+    mat : numpy.ndarray
+        Square matrix whose entry (i, j) is the number of bytes transmitted by
+        module `ids[i]` to module `ids[j]` at every step.
+    """
+
+    if itemsize is None:
+        itemsize = {}
+    index = {id: i for i, id in enumerate(ids)}
+    mat = np.zeros((len(ids), len(ids)), np.int_)
+    for src_id, dest_id in routing_table.connections:
+        conn = routing_table.data.edge[src_id][dest_id]
+        sizes = itemsize.get(src_id, {})
+        for t in ['gpot', 'spike']:
+            if 'src_plan' in conn:
+                n = len(conn['src_plan'][t])
+            else:
+                n = len(conn['pattern'].src_idx(conn['int_0'], conn['int_1'],
+                                                t, t))
+            mat[index[src_id], index[dest_id]] += n*sizes.get(t, 8)
+    return mat
+
+def block_sizes(n, n_parts):
+    """
+    Compute the number of ranks assigned to each host.
+
+    Ranks are assumed to be assigned to hosts in contiguous blocks of equal
+    size (except for the last host), as done by MPI launchers that fill the
+    slots of each host before moving on to the next.
+
+    Parameters
+    ----------
+    n : int
+        Number of ranks.
+    n_parts : int
+        Number of hosts.
+
+    Returns
+    -------
+    sizes : list of int
+        Number of ranks assigned to each host.
+    """
+
+    per_part = int(np.ceil(float(n)/n_parts)) if n_parts else 0
+    sizes = []
+    for p in xrange(n_parts):
+        sizes.append(max(0, min(per_part, n-p*per_part)))
+    return sizes
+
+def cross_part_bytes(mat, part):
+    """
+    Compute the number of bytes transmitted between partitions at every step.
+
+    Parameters
+    ----------
+    mat : numpy.ndarray
+        Matrix returned by `comm_matrix()`.
+    part : numpy.ndarray
+        Partition of each module.
+
+    Returns
+    -------
+    nbytes : int
+        Total number of bytes transmitted between modules in different
+        partitions.
+    """
+
+    part = np.asarray(part)
+    return int(mat[part[:, None] != part[None, :]].sum())
+
+def _metis_partition(sym, n_parts):
+    """
+    Partition an undirected weighted graph with METIS.
+    """
+
+    n = len(sym)
+    xadj = [0]
+    adjncy = []
+    eweights = []
+    for i in xrange(n):
+        for j in np.nonzero(sym[i])[0]:
+            if j != i:
+                adjncy.append(int(j))
+                eweights.append(int(sym[i, j]))
+        xadj.append(len(adjncy))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        cutcount, part = pymetis.part_graph(n_parts, xadj=xadj,
+                                            adjncy=adjncy, eweights=eweights)
+    return np.array(part, np.int_)
+
+def _greedy_partition(sym, sizes):
+    """
+    Partition an undirected weighted graph by greedy graph growing.
+
+    Each partition is seeded with the unassigned vertex with the largest total
+    edge weight and then grown by repeatedly adding the unassigned vertex most
+    strongly connected to the vertices already in it.
+    """
+
+    n = len(sym)
+    part = -np.ones(n, np.int_)
+    total = sym.sum(1)
+    for p, size in enumerate(sizes):
+        if size == 0:
+            continue
+        free = np.nonzero(part < 0)[0]
+        i = free[np.argmax(total[free])]
+        part[i] = p
+        gain = sym[i].astype(np.double)
+        for k in xrange(size-1):
+            free = np.nonzero(part < 0)[0]
+            i = free[np.argmax(gain[free])]
+            part[i] = p
+            gain += sym[i]
+    return part
+
+def _rebalance(sym, part, sizes):
+    """
+    Move vertices out of partitions with more vertices than specified.
+
+    The vertex moved at each iteration is the one whose move increases the
+    weight of the edges cut by the smallest amount.
+    """
+
+    n_parts = len(sizes)
+    conn = np.zeros((len(sym), n_parts))
+    for p in xrange(n_parts):
+        conn[:, p] = sym[:, part == p].sum(1)
+    counts = np.bincount(part, minlength=n_parts)
+    while np.any(counts > sizes):
+        over = counts > sizes
+        under = np.nonzero(counts < sizes)[0]
+        cand = np.nonzero(over[part])[0]
+        gain = conn[cand][:, under]-conn[cand, part[cand]][:, None]
+        k, q = np.unravel_index(np.argmax(gain), gain.shape)
+        i, p = cand[k], under[q]
+        conn[:, part[i]] -= sym[:, i]
+        conn[:, p] += sym[:, i]
+        counts[part[i]] -= 1
+        counts[p] += 1
+        part[i] = p
+    return part
+
+def _refine(sym, part, max_iter=None):
+    """
+    Reduce the weight of the edges cut by a partition by swapping vertices.
+
+    At each iteration, the pair of vertices in different partitions whose swap
+    reduces the cut weight by the largest amount is swapped; iteration stops
+    when no swap reduces the cut weight. Partition sizes are not changed.
+    """
+
+    n = len(sym)
+    if max_iter is None:
+        max_iter = n
+    n_parts = part.max()+1 if n else 0
+    conn = np.zeros((n, n_parts))
+    for p in xrange(n_parts):
+        conn[:, p] = sym[:, part == p].sum(1)
+    for it in xrange(max_iter):
+
+        # Change in the weight of the edges not cut if vertex i moved to the
+        # partition of vertex j:
+        a = conn[:, part]-conn[np.arange(n), part][:, None]
+        gain = a+a.T-2*sym
+        gain[part[:, None] == part[None, :]] = -np.inf
+        i, j = np.unravel_index(np.argmax(gain), gain.shape)
+        if not gain[i, j] > 0:
+            break
+        p_i, p_j = part[i], part[j]
+        conn[:, p_i] += sym[:, j]-sym[:, i]
+        conn[:, p_j] += sym[:, i]-sym[:, j]
+        part[i], part[j] = p_j, p_i
+    return part
+
+def partition(mat, sizes):
+    """
+    Partition modules so as to minimize the traffic between partitions.
+
+    Parameters
+    ----------
+    mat : numpy.ndarray
+        Matrix returned by `comm_matrix()`.
+    sizes : list of int
+        Number of modules to assign to each partition; must sum to the number
+        of modules.
+
+    Returns
+    -------
+    part : numpy.ndarray
+        Partition of each module.
+    """
+
+    sizes = np.asarray(sizes, np.int_)
+    if sizes.sum() != len(mat):
+        raise ValueError('partition sizes must sum to number of modules')
+    sym = mat+mat.T
+    if len(sizes) == 1:
+        return np.zeros(len(mat), np.int_)
+    if pymetis is not None and len(mat) > len(sizes):
+        part = _rebalance(sym, _metis_partition(sym, len(sizes)), sizes)
+    else:
+        part = _greedy_partition(sym, sizes)
+    return _refine(sym, part)
+
+def order(mat):
+    """
+    Order modules such that strongly connected modules are adjacent.
+
+    Starting with the most strongly connected pair of modules, the module that
+    adds the largest number of bytes transmitted to or from modules already
+    ordered is repeatedly appended to the order.
+
+    Parameters
+    ----------
+    mat : numpy.ndarray
+        Matrix returned by `comm_matrix()`.
+
+    Returns
+    -------
+    inds : numpy.ndarray
+        Module indices in order.
+    """
+
+    n = len(mat)
+    if n < 2:
+        return np.arange(n)
+    sym = mat+mat.T
+    np.fill_diagonal(sym, -1)
+    i, j = np.unravel_index(np.argmax(sym), sym.shape)
+    np.fill_diagonal(sym, 0)
+    inds = [i, j]
+    added = np.zeros(n, np.bool)
+    added[inds] = True
+    gain = sym[i]+sym[j]
+    while len(inds) < n:
+        free = np.nonzero(~added)[0]
+        k = free[np.argmax(gain[free])]
+        inds.append(k)
+        added[k] = True
+        gain += sym[k]
+    return np.array(inds, np.int_)
+
+def place(mat, n_hosts):
+    """
+    Assign modules to ranks distributed over several hosts.
+
+    Parameters
+    ----------
+    mat : numpy.ndarray
+        Matrix returned by `comm_matrix()`.
+    n_hosts : int
+        Number of hosts; ranks are assumed to be assigned to hosts in the
+        contiguous blocks described by `block_sizes()`.
+
+    Returns
+    -------
+    perm : numpy.ndarray
+        Index of the module to assign to each rank.
+    part : numpy.ndarray
+        Host of each module.
+    """
+
+    sizes = block_sizes(len(mat), n_hosts)
+    part = partition(mat, sizes)
+    perm = []
+    for p in xrange(n_hosts):
+        inds = np.nonzero(part == p)[0]
+        perm.extend(inds[order(mat[inds][:, inds])])
+    return np.array(perm, np.int_), part
@@ -0,0 +1,454 @@
+#!/usr/bin/env python
+
+"""
+Compilation of connection patterns into integer data exchange plans.
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from plsel import Selector
+from pm import BasePortMapper
+from tools.misc import renumber_in_order
+
+def make_port_mappers(sel_gpot, sel_spike):
+    """
+    Create port mappers for the graded potential and spiking ports of a module.
+
+    Parameters
+    ----------
+    sel_gpot, sel_spike : str, unicode, or sequence
+        Selectors describing the module's graded potential and spiking ports
+        in the same order as the module's port data arrays.
+
+    Returns
+    -------
+    pm : dict of BasePortMapper
+        Port mappers keyed by port type.
+    """
+
+    return {'gpot': BasePortMapper(sel_gpot),
+            'spike': BasePortMapper(sel_spike)}
+
+def compile_src(pat, int_0, int_1, pm):
+    """
+    Compile indices of the ports whose data is transmitted via a pattern.
+
+    Parameters
+    ----------
+    pat : neurokernel.pattern.Pattern
+        Pattern connecting the source module to the destination module.
+    int_0, int_1 : int
+        Pattern interfaces connected to the source and destination modules,
+        respectively.
+    pm : dict of BasePortMapper
+        Port mappers of the source module keyed by port type.
+
+    Returns
+    -------
+    plan : dict of numpy.ndarray
+        Indices in the source module's port data arrays of the transmitted
+        ports keyed by port type.
+    """
+
+    plan = {}
+    for t in ['gpot', 'spike']:
+        plan[t] = np.asarray(pm[t].ports_to_inds(pat.src_idx(int_0, int_1, t, t)))
+    return plan
+
+def compile_dest(pat, int_0, int_1, pm):
+    """
+    Compile indices required to copy data received via a pattern into ports.
+
+    Parameters
+    ----------
+    pat : neurokernel.pattern.Pattern
+        Pattern connecting the source module to the destination module.
+    int_0, int_1 : int
+        Pattern interfaces connected to the source and destination modules,
+        respectively.
+    pm : dict of BasePortMapper
+        Port mappers of the destination module keyed by port type.
+
+    Returns
+    -------
+    plan : dict of dict
+        Dicts keyed by port type containing the indices in the destination
+        module's port data arrays of the receiving ports ('inds'), the indices
+        of the entries in the receive buffer that must be copied into those
+        ports to support fan-out ('buf_inds'), and the length of the receive
+        buffer ('buf_len').
+    """
+
+    plan = {}
+    for t, ports in [('gpot', pat.gpot_ports), ('spike', pat.spike_ports)]:
+        src_ports = pat.src_idx(int_0, int_1, t, t, duplicates=True)
+        plan[t] = {
+            'inds': np.asarray(pm[t].ports_to_inds(pat.dest_idx(int_0, int_1, t, t))),
+            'buf_inds': np.array(renumber_in_order(
+                BasePortMapper(ports(int_0, tuples=True)).ports_to_inds(src_ports))),
+
+            # The size of the receive buffer must be the same length as the
+            # source module's send buffer:
+            'buf_len': len(pat.src_idx(int_0, int_1, t, t))}
+    return plan
+
+def compile_connection(pat, int_0, int_1, src_sels, dest_sels, cache=None,
+                       src_pm=None, dest_pm=None):
+    """
+    Compile the source and destination exchange plans of a connection.
+
+    Parameters
+    ----------
+    pat : neurokernel.pattern.Pattern
+        Pattern connecting the source module to the destination module.
+    int_0, int_1 : int
+        Pattern interfaces connected to the source and destination modules,
+        respectively.
+    src_sels, dest_sels : tuple
+        Selectors describing the graded potential and spiking ports of the
+        source and destination modules, respectively.
+    cache : PlanCache
+        If not None, cache from which to load the plans, or in which to store
+        them if they have not been compiled before.
+    src_pm, dest_pm : dict of BasePortMapper or callable
+        Port mappers of the source and destination modules returned by
+        `make_port_mappers()`, or functions without arguments that return
+        them. The functions are only called if the plans are not found in
+        `cache`, so that cached plans are loaded without resolving any
+        ports. If None, the port mappers are created from `src_sels` and
+        `dest_sels`; passing them avoids recreating the port mappers of a
+        module for each of its connections.
+
+    Returns
+    -------
+    src_plan : dict of numpy.ndarray
+        Plan returned by `compile_src()`.
+    dest_plan : dict of dict
+        Plan returned by `compile_dest()`.
+    """
+
+    if cache is not None:
+        key = cache.key(pat, int_0, int_1, src_sels, dest_sels)
+        result = cache.load(key)
+        if result is not None:
+            return result
+    if src_pm is None:
+        src_pm = make_port_mappers(*src_sels)
+    elif callable(src_pm):
+        src_pm = src_pm()
+    if dest_pm is None:
+        dest_pm = make_port_mappers(*dest_sels)
+    elif callable(dest_pm):
+        dest_pm = dest_pm()
+    src_plan = compile_src(pat, int_0, int_1, src_pm)
+    dest_plan = compile_dest(pat, int_0, int_1, dest_pm)
+    if cache is not None:
+        cache.save(key, src_plan, dest_plan)
+    return src_plan, dest_plan
+
+def _sel_str(sel):
+    """
+    Return string representation of selector for hashing.
+    """
+
+    if isinstance(sel, Selector):
+        return sel.str
+    return repr(sel)
+
+def _hash_values(h, a):
+    """
+    Update hash with the contents of an array.
+    """
+
+    a = np.asarray(a)
+    if a.dtype == object:
+        h.update(repr(a.tolist()))
+    else:
+        h.update(a.dtype.str)
+        h.update(a.tostring())
+    h.update('\0')
+
+def _hash_index(h, idx):
+    """
+    Update hash with the contents of a pandas index.
+
+    The levels and integer labels of a MultiIndex are hashed rather than the
+    (much more numerous) tuples of its entries.
+    """
+
+    if isinstance(idx, pd.MultiIndex):
+        h.update(repr(idx.nlevels))
+        for level, labels in zip(idx.levels, idx.labels):
+            _hash_values(h, level.values)
+            _hash_values(h, labels)
+    else:
+        _hash_values(h, idx.values)
+
+class PlanCache(object):
+    """
+    On-disk cache of compiled exchange plans.
+
+    Each connection's plans are stored in a subdirectory named after a hash of
+    the port selectors of the connected modules, the connections and
+    interface attributes of the pattern connecting them, and the pattern
+    interfaces connected to either module; any change to these results in a
+    different hash, so stale plans are never loaded. The index arrays are
+    stored as `.npy` files that are loaded memory-mapped.
+
+    Parameters
+    ----------
+    path : str
+        Directory containing the cached plans; created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        # Digests of the connectivity of hashed patterns keyed by pattern
+        # instance ID; each entry also contains the pattern and its index so
+        # that a digest is recomputed if the connectivity changes:
+        self._digests = {}
+        try:
+            os.makedirs(path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def key(self, pat, int_0, int_1, src_sels, dest_sels):
+        """
+        Compute cache key of a connection.
+
+        Parameters
+        ----------
+        pat : neurokernel.pattern.Pattern
+            Pattern connecting the source module to the destination module.
+        int_0, int_1 : int
+            Pattern interfaces connected to the source and destination
+            modules, respectively.
+        src_sels, dest_sels : tuple
+            Selectors describing the graded potential and spiking ports of
+            the source and destination modules, respectively.
+
+        Returns
+        -------
+        key : str
+            Hexadecimal SHA-1 digest.
+        """
+
+        h = hashlib.sha1()
+        for sel in tuple(src_sels)+tuple(dest_sels):
+            h.update(_sel_str(sel))
+            h.update('\0')
+        h.update(repr((int_0, int_1)))
+        h.update(self._pattern_digest(pat))
+
+        # The interface attributes are hashed as integer codes:
+        _hash_index(h, pat.interface.data.index)
+        for c in pat.interface.data.columns:
+            codes, uniques = pd.factorize(pat.interface.data[c])
+            _hash_values(h, codes)
+            _hash_values(h, uniques)
+        return h.hexdigest()
+
+    def _pattern_digest(self, pat):
+        """
+        Compute digest of a pattern's connectivity.
+
+        The digest is only computed once for each pattern unless the
+        pattern's connections change.
+        """
+
+        entry = self._digests.get(id(pat))
+        if entry is not None and entry[0] is pat and entry[1] is pat.data.index:
+            return entry[2]
+        h = hashlib.sha1()
+        _hash_index(h, pat.data.index)
+        digest = h.digest()
+        self._digests[id(pat)] = (pat, pat.data.index, digest)
+        return digest
+
+    def load(self, key):
+        """
+        Load cached plans.
+
+        Parameters
+        ----------
+        key : str
+            Cache key.
+
+        Returns
+        -------
+        result : tuple
+            Source and destination plans, or None if no plans with the
+            specified key are cached.
+        """
+
+        d = os.path.join(self.path, key)
+        if not os.path.isdir(d):
+            return None
+        load = lambda name: np.load(os.path.join(d, name+'.npy'), mmap_mode='r')
+        buf_len = load('buf_len')
+        src_plan = {}
+        dest_plan = {}
+        for i, t in enumerate(['gpot', 'spike']):
+            src_plan[t] = load('src_'+t)
+            dest_plan[t] = {'inds': load('dest_'+t),
+                            'buf_inds': load('buf_'+t),
+                            'buf_len': int(buf_len[i])}
+        return src_plan, dest_plan
+
+    def save(self, key, src_plan, dest_plan):
+        """
+        Save compiled plans.
+
+        The plans are first written to a temporary directory that is then
+        renamed so that partially written plans are never loaded.
+
+        Parameters
+        ----------
+        key : str
+            Cache key.
+        src_plan : dict of numpy.ndarray
+            Plan returned by `compile_src()`.
+        dest_plan : dict of dict
+            Plan returned by `compile_dest()`.
+        """
+
+        d = os.path.join(self.path, key)
+        tmp = tempfile.mkdtemp(dir=self.path)
+        save = lambda name, a: np.save(os.path.join(tmp, name+'.npy'), a)
+        for t in ['gpot', 'spike']:
+            save('src_'+t, np.asarray(src_plan[t], np.int_))
+            save('dest_'+t, np.asarray(dest_plan[t]['inds'], np.int_))
+            save('buf_'+t, np.asarray(dest_plan[t]['buf_inds'], np.int_))
+        save('buf_len', np.array([dest_plan['gpot']['buf_len'],
+                                  dest_plan['spike']['buf_len']]))
+        try:
+            os.rename(tmp, d)
+        except OSError:
+
+            # Another process already saved the same plans:
+            shutil.rmtree(tmp)
+
+class ExchangePlanMixin(object):
+    """
+    Manager mixin that compiles the exchange plans of module connections.
+
+    The manager must provide the constructor arguments of each module in
+    `_kwargs`, the mapping between module ranks and IDs in `rank_to_id`, the
+    connections between modules in `routing_table`, and the IDs of the
+    modules run by each process in `_groups` (None if each module is run by
+    its own process). `_init_plans()` must be called by the manager's
+    constructor.
+    """
+
+    def _init_plans(self, plan_cache=None):
+        """
+        Initialize the plan cache and the port mappers used to compile plans.
+
+        Parameters
+        ----------
+        plan_cache : str
+            Directory of on-disk cache of compiled exchange plans. If None,
+            the plans are compiled whenever modules are connected.
+        """
+
+        if plan_cache is not None:
+            self._plan_cache = PlanCache(plan_cache)
+        else:
+            self._plan_cache = None
+
+        # Port mappers used to compile exchange plans keyed by module ID:
+        self._pms = {}
+
+    def _get_sels(self, id):
+        """
+        Return graded potential and spiking port selectors of a module.
+
+        Returns None if the module's port selectors are not known.
+        """
+
+        kwargs = self._kwargs[self.rank_to_id.inv[id]]
+        if 'sel_gpot' in kwargs and 'sel_spike' in kwargs:
+            return kwargs['sel_gpot'], kwargs['sel_spike']
+        else:
+            return None
+
+    def _get_port_mappers(self, id):
+        """
+        Return port mappers of a module whose port selectors are known.
+
+        The port mappers are created when first needed, i.e., when the plans
+        of one of the module's connections are not cached, and reused for all
+        of the module's connections.
+        """
+
+        if id not in self._pms:
+            self._pms[id] = make_port_mappers(*self._get_sels(id))
+        return self._pms[id]
+
+    def _compile_connection(self, src_id, dest_id, pat, int_0, int_1):
+        """
+        Compile the exchange plans of a connection between two modules.
+
+        Parameters
+        ----------
+        src_id, dest_id : str
+            Identifiers of the source and destination modules.
+        pat : Pattern
+            Pattern instance.
+        int_0, int_1 : int
+            Which of the pattern's interfaces are connected to `src_id` and
+            `dest_id`, respectively.
+
+        Returns
+        -------
+        conn : dict
+            Routing table entry containing the pattern, its interfaces, and
+            the compiled source and destination exchange plans if the port
+            selectors of both modules are known.
+        """
+
+        conn = {'pattern': pat, 'int_0': int_0, 'int_1': int_1}
+        src_sels = self._get_sels(src_id)
+        dest_sels = self._get_sels(dest_id)
+        if src_sels is not None and dest_sels is not None:
+            conn['src_plan'], conn['dest_plan'] = \
+                compile_connection(pat, int_0, int_1, src_sels, dest_sels,
+                                   self._plan_cache,
+                                   lambda: self._get_port_mappers(src_id),
+                                   lambda: self._get_port_mappers(dest_id))
+        return conn
+
+    def get_routing_table(self, rank):
+        """
+        Return the connections to and from the module with the specified rank.
+
+        Parameters
+        ----------
+        rank : int
+            MPI rank of module (or of the process running a group of modules).
+
+        Returns
+        -------
+        routing_table : neurokernel.routing_table.RoutingTable
+            Routing table containing only the connections of the module(s).
+        """
+
+        # Patterns whose exchange plans were compiled are not transmitted:
+        if self._groups is not None:
+            routing_table = self.routing_table.incident(*self._groups[rank])
+        else:
+            routing_table = self.routing_table.incident(self.rank_to_id[rank])
+        for i, j in routing_table.connections:
+            conn = routing_table[i, j]
+            if 'src_plan' in conn:
+                del conn['pattern']
+        return routing_table
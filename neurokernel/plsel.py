@@ -671,7 +671,7 @@ class SelectorMethods(SelectorParser):
 
         result = ''
         for t in tokens:
-            if type(t) == str:
+            if type(t) in [str, unicode]:
                 result += '/'+t
             elif type(t) in [int, long]:
                 result += '[%s]' % t
@@ -1049,6 +1049,58 @@ class SelectorMethods(SelectorParser):
                 raise ValueError('invalid token')
         return ''.join(result)
 
+    # Tokens of selector strings that comprise a single identifier; the
+    # alternatives match the same strings as the INTEGER, INTEGER_SET, STRING,
+    # and STRING_SET token rules with a single element:
+    _identifier_token = re.compile(r'/?(\d+)|/?\[(\d+)\]|'
+                                   r'/([^*/\[\]\(\):,\.\d][^+*/\[\]\(\):,\.]*)|'
+                                   r'/?\[([^+*/\[\]\(\):,\.\d][^+*/\[\]\(\):,\.]*)\]')
+
+    @classmethod
+    def str_to_tokens(cls, s):
+        """
+        Convert a selector string comprising a single identifier into tokens.
+
+        Parameters
+        ----------
+        s : str or unicode
+            Selector string that comprises a single identifier (e.g.,
+            '/foo[0]').
+
+        Returns
+        -------
+        result : tuple
+            Identifier tokens (e.g., ('foo', 0)).
+
+        Notes
+        -----
+        Strings that only contain identifier tokens are converted without
+        invoking the selector parser, which is considerably faster when
+        many strings must be converted.
+        """
+
+        result = []
+        pos = 0
+        while pos < len(s):
+            m = cls._identifier_token.match(s, pos)
+            if m is None:
+                break
+            i, i_set, t, t_set = m.groups()
+            if i is not None or i_set is not None:
+                result.append(int(i if i is not None else i_set))
+            else:
+                result.append(t if t is not None else t_set)
+            pos = m.end()
+        else:
+            if result:
+                return tuple(result)
+
+        # Fall back to the parser for other strings:
+        e = cls.expand(s)
+        if len(e) != 1 or not e[0]:
+            raise ValueError('selector does not comprise a single identifier')
+        return e[0]
+
     @classmethod
     def collapse(cls, selector):
         """
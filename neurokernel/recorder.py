@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+
+"""
+Asynchronous recording of port data to HDF5 files.
+"""
+
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+import h5py
+import numpy as np
+
+from mixins import LoggerMixin
+
+class _Record(object):
+    """
+    Staging area for the data of a single set of recorded ports.
+
+    Parameters
+    ----------
+    name : str
+        Name of HDF5 group in which the data is stored.
+    data : numpy.ndarray
+        Port data array from which values are copied.
+    inds : numpy.ndarray of int
+        Indices of the recorded ports in `data`.
+    every : int
+        Record port data every `every` steps.
+    sparse : bool
+        If True, only the indices of nonzero entries (e.g., spikes) are
+        recorded at each step.
+    chunk_steps : int
+        Number of recorded steps staged before being written.
+    n_buffers : int
+        Number of staging buffers for dense data.
+    """
+
+    def __init__(self, name, data, inds, every, sparse, chunk_steps, n_buffers):
+        self.name = name
+        self.data = data
+        self.inds = np.asarray(inds, dtype=np.int_)
+        self.every = every
+        self.sparse = sparse
+        self.chunk_steps = chunk_steps
+
+        # Staged rows (dense) or staged event times and indices (sparse):
+        self.count = 0
+        if sparse:
+            self.buf = ([], [])
+        else:
+            self.free = queue.Queue()
+            for i in xrange(n_buffers):
+                self.free.put(np.empty((chunk_steps, len(self.inds)),
+                                       data.dtype))
+            self.buf = self.free.get()
+
+class Recorder(LoggerMixin):
+    """
+    Asynchronous recorder of port data.
+
+    Copies the values of selected ports into staging buffers at every recorded
+    execution step; a background thread writes full staging buffers to
+    chunked, compressed HDF5 datasets. Copying only blocks if all of the
+    staging buffers are waiting to be written.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of HDF5 file to create.
+    chunk_steps : int
+        Number of recorded steps to stage before writing them to the file.
+    n_buffers : int
+        Number of staging buffers per set of recorded dense ports.
+    queue_size : int
+        Maximum number of staged chunks awaiting writing.
+    compression : str
+        HDF5 compression filter.
+
+    Notes
+    -----
+    Dense port data is stored in a dataset named 'data' with one row per
+    recorded step, i.e., row `k` contains the port values at step `k*every`.
+    Sparse port data is stored in datasets named 'time' and 'index' that
+    respectively contain the step and the position in the recorded port list
+    of each nonzero entry. The selected port identifiers are stored in a
+    dataset named 'ports'.
+    """
+
+    def __init__(self, file_name, chunk_steps=128, n_buffers=2, queue_size=8,
+                 compression='gzip'):
+        LoggerMixin.__init__(self, 'rec %s' % file_name)
+        self.file_name = file_name
+        self.chunk_steps = chunk_steps
+        self.n_buffers = n_buffers
+        self.compression = compression
+
+        self._records = []
+        self._queue = queue.Queue(queue_size)
+        self._f = h5py.File(file_name, 'w')
+        self._thread = None
+        self._error = None
+
+    def add(self, name, data, inds, ports=[], every=1, sparse=False):
+        """
+        Add a set of ports to record.
+
+        Parameters
+        ----------
+        name : str
+            Name of HDF5 group in which the data is stored.
+        data : numpy.ndarray
+            Port data array from which values are copied.
+        inds : numpy.ndarray of int
+            Indices of the recorded ports in `data`.
+        ports : list of str
+            Identifiers of the recorded ports.
+        every : int
+            Record port data every `every` steps.
+        sparse : bool
+            If True, only record the indices of nonzero entries.
+        """
+
+        if self._thread is not None:
+            raise RuntimeError('cannot add ports after recording has started')
+        if every < 1:
+            raise ValueError('invalid decimation factor')
+        if name in self._f:
+            raise ValueError('ports already recorded as %s' % name)
+        if not len(inds):
+            raise ValueError('no ports to record')
+        r = _Record(name, data, inds, every, sparse,
+                    self.chunk_steps, self.n_buffers)
+        self._records.append(r)
+
+        g = self._f.create_group(name)
+        g.attrs['every'] = every
+        g.create_dataset('ports', data=np.array(ports, dtype='S'))
+        if sparse:
+            g.create_dataset('time', (0,), np.int64, maxshape=(None,),
+                             chunks=(max(self.chunk_steps, 1024),),
+                             compression=self.compression)
+            g.create_dataset('index', (0,), np.int32, maxshape=(None,),
+                             chunks=(max(self.chunk_steps, 1024),),
+                             compression=self.compression)
+        else:
+            g.create_dataset('data', (0, len(r.inds)), data.dtype,
+                             maxshape=(None, len(r.inds)),
+                             chunks=(self.chunk_steps, len(r.inds)),
+                             compression=self.compression)
+
+    def start(self):
+        """
+        Start the background writer thread.
+        """
+
+        self._thread = threading.Thread(target=self._write_loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _write_loop(self):
+        """
+        Write staged chunks to the HDF5 file until a sentinel is received.
+        """
+
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            r, buf, n = job
+            try:
+                g = self._f[r.name]
+                if r.sparse:
+                    t = np.concatenate(buf[0]) if buf[0] else np.empty(0, np.int64)
+                    i = np.concatenate(buf[1]) if buf[1] else np.empty(0, np.int32)
+                    for k, v in (('time', t), ('index', i)):
+                        d = g[k]
+                        d.resize((d.shape[0]+len(v),))
+                        d[d.shape[0]-len(v):] = v
+                else:
+                    d = g['data']
+                    d.resize((d.shape[0]+n, d.shape[1]))
+                    d[d.shape[0]-n:] = buf[:n]
+            except Exception as e:
+                self._error = e
+                self.log_info('error writing %s: %s' % (r.name, str(e)))
+            finally:
+                if not r.sparse:
+                    r.free.put(buf)
+
+    def _flush(self, r):
+        """
+        Enqueue the staged data of the specified record for writing.
+        """
+
+        if r.sparse:
+            self._queue.put((r, r.buf, r.count))
+            r.buf = ([], [])
+        else:
+            self._queue.put((r, r.buf, r.count))
+
+            # This only blocks if all staging buffers are awaiting writing:
+            r.buf = r.free.get()
+        r.count = 0
+
+    def update(self, step):
+        """
+        Copy the current values of the recorded ports into the staging buffers.
+
+        Parameters
+        ----------
+        step : int
+            Current execution step.
+        """
+
+        if self._thread is None:
+            self.start()
+        for r in self._records:
+            if step % r.every:
+                continue
+            if r.sparse:
+                i = np.flatnonzero(r.data[r.inds]).astype(np.int32)
+                r.buf[0].append(np.full(len(i), step, np.int64))
+                r.buf[1].append(i)
+            else:
+                np.take(r.data, r.inds, out=r.buf[r.count])
+            r.count += 1
+            if r.count == r.chunk_steps:
+                self._flush(r)
+
+    def reset(self):
+        """
+        Discard all staged and written port data.
+
+        The recorded datasets are truncated so that recording resumes in an
+        empty file; the writer thread is restarted by the next update.
+        """
+
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        for r in self._records:
+            r.count = 0
+            g = self._f[r.name]
+            if r.sparse:
+                r.buf = ([], [])
+                g['time'].resize((0,))
+                g['index'].resize((0,))
+            else:
+                g['data'].resize((0, len(r.inds)))
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """
+        Write all staged data, stop the writer thread, and close the file.
+        """
+
+        if self._thread is not None:
+            for r in self._records:
+                if r.count:
+                    self._flush(r)
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._f.close()
+        if self._error is not None:
+            raise self._error
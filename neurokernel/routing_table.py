@@ -55,6 +55,8 @@ class RoutingTable(object):
         Destination identifiers connected to the specified source identifier.
     has_node(n)
         Check whether the routing table contains the specified identifier.
+    incident(*ids)
+        Return subtable containing only those connections to or from specified identifiers.
     ids()
         IDs currently in routing
     src_ids(dest_id)
@@ -171,6 +173,19 @@ class RoutingTable(object):
         
         return RoutingTable(self.data.subgraph(ids))
 
+    def incident(self, *ids):
+        """
+        Return subtable containing only those connections to or from specified identifiers.
+        """
+
+        g = nx.DiGraph()
+        for id in ids:
+            g.add_node(id)
+            if self.data.has_node(id):
+                g.add_edges_from(self.data.in_edges_iter(id, data=True))
+                g.add_edges_from(self.data.out_edges_iter(id, data=True))
+        return RoutingTable(g)
+
     def to_df(self):
         """
         Return a pandas DataFrame listing all of the connections.
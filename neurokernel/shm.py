@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+"""
+Exchange of data between processes on the same host via shared memory.
+
+Each process allocates a segment of an MPI-3 shared memory window that
+contains the buffers it transmits to processes on the same host; the
+receiving processes read the buffers directly from the segment rather than
+receiving copies of them via point-to-point messages. Every buffer is double
+buffered so that a single barrier per execution step suffices to synchronize
+all of the processes on a host: at each step, buffers are written to and read
+from the copy selected by the parity of the step, so that a process can write
+the next step's data while other processes may still be reading the previous
+step's data.
+"""
+
+from mpi4py import MPI
+import numpy as np
+
+# Alignment of buffers within a shared memory segment in bytes:
+ALIGN = 64
+
+def layout(specs, align=ALIGN):
+    """
+    Compute the offsets of double-buffered arrays in a memory segment.
+
+    Parameters
+    ----------
+    specs : list of tuple
+        Key, number of elements, and numpy dtype of each array.
+    align : int
+        Alignment of each array copy in bytes.
+
+    Returns
+    -------
+    offsets : dict
+        Byte offsets of the two copies of each array keyed by array key.
+    nbytes : int
+        Total size of the segment in bytes.
+    """
+
+    offsets = {}
+    nbytes = 0
+    for key, n, dtype in specs:
+        size = n*np.dtype(dtype).itemsize
+        pair = []
+        for i in xrange(2):
+            pair.append(nbytes)
+            nbytes += -(-size//align)*align
+        offsets[key] = tuple(pair)
+    return offsets, nbytes
+
+class SharedBuffers(object):
+    """
+    Buffers transmitted between processes on the same host.
+
+    Instantiation and `close()` are collective over the specified
+    communicator.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Intracomm
+        Communicator containing all processes that exchange data.
+    specs : list of tuple
+        Source module ID, destination module ID, port type, destination rank
+        in `comm`, number of elements, and numpy dtype of each buffer
+        transmitted by the current process.
+
+    Attributes
+    ----------
+    send_bufs : dict
+        Pairs of arrays in the segment of the current process to which the
+        buffers transmitted to processes on the same host must be written,
+        keyed by (source ID, destination ID, port type).
+    recv_bufs : dict
+        Pairs of arrays in the segments of other processes on the same host
+        from which the buffers transmitted to the current process must be
+        read, keyed by (source ID, destination ID, port type).
+    """
+
+    def __init__(self, comm, specs):
+        self.node_comm = comm.Split_type(MPI.COMM_TYPE_SHARED)
+        node_ranks = self.node_comm.allgather(comm.rank)
+
+        # Only buffers transmitted to other processes on the same host are
+        # placed in shared memory:
+        local = [((src_id, dest_id, t), n, np.dtype(dtype), dest_rank) \
+                 for src_id, dest_id, t, dest_rank, n, dtype in specs \
+                 if dest_rank in node_ranks and dest_rank != comm.rank]
+        offsets, nbytes = layout([(key, n, dtype) \
+                                  for key, n, dtype, dest_rank in local])
+        self.win = MPI.Win.Allocate_shared(nbytes, 1, comm=self.node_comm)
+        self.win.Lock_all(MPI.MODE_NOCHECK)
+
+        # Find the offsets of the buffers in the segments of all processes on
+        # the host:
+        all_entries = self.node_comm.allgather(
+            [(key, n, dtype.str, dest_rank, offsets[key]) \
+             for key, n, dtype, dest_rank in local])
+        self.enabled = any(all_entries)
+
+        self.send_bufs = {}
+        self.recv_bufs = {}
+        for node_rank, entries in enumerate(all_entries):
+            if not any([node_rank == self.node_comm.rank or \
+                        dest_rank == comm.rank \
+                        for key, n, dtype, dest_rank, pair in entries]):
+                continue
+            mem, disp_unit = self.win.Shared_query(node_rank)
+            seg = np.frombuffer(mem, np.uint8)
+            for key, n, dtype, dest_rank, pair in entries:
+                dtype = np.dtype(dtype)
+                bufs = tuple([seg[o:o+n*dtype.itemsize].view(dtype) \
+                              for o in pair])
+                if node_rank == self.node_comm.rank:
+                    self.send_bufs[key] = bufs
+                elif dest_rank == comm.rank:
+                    self.recv_bufs[key] = bufs
+
+    def sync(self):
+        """
+        Wait until all processes on the host have written their buffers.
+
+        Must be called at every execution step by all processes on the host
+        after they write the buffers selected by the step's parity and before
+        they read them.
+        """
+
+        if self.enabled:
+            self.win.Sync()
+            self.node_comm.Barrier()
+            self.win.Sync()
+
+    def close(self):
+        """
+        Free the shared memory window.
+        """
+
+        self.send_bufs = {}
+        self.recv_bufs = {}
+        self.win.Unlock_all()
+        self.win.Free()
+        self.node_comm.Free()
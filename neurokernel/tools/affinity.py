@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+"""
+CPU affinity and NUMA node utilities.
+"""
+
+import glob
+import multiprocessing
+import os
+import re
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Placement policies:
+POLICIES = ['core', 'numa']
+
+def parse_cpulist(s):
+    """
+    Parse a CPU list in the format used by Linux sysfs.
+
+    Parameters
+    ----------
+    s : str
+        CPU list, e.g., '0-3,8,10-11'.
+
+    Returns
+    -------
+    cpus : list of int
+        CPU indices.
+    """
+
+    cpus = []
+    for r in s.strip().split(','):
+        if not r:
+            continue
+        if '-' in r:
+            start, stop = r.split('-')
+            cpus.extend(range(int(start), int(stop)+1))
+        else:
+            cpus.append(int(r))
+    return cpus
+
+def numa_nodes():
+    """
+    Find the CPUs in each NUMA node of the local host.
+
+    Returns
+    -------
+    nodes : list of list of int
+        CPU indices of each NUMA node ordered by node index. If the NUMA
+        topology cannot be determined, all CPUs are assumed to belong to a
+        single node.
+    """
+
+    nodes = {}
+    for path in glob.glob('/sys/devices/system/node/node*/cpulist'):
+        m = re.search('node(\d+)', path)
+        with open(path, 'r') as f:
+            cpus = parse_cpulist(f.read())
+        if cpus:
+            nodes[int(m.group(1))] = cpus
+    if not nodes:
+        return [range(multiprocessing.cpu_count())]
+    return [nodes[k] for k in sorted(nodes.keys())]
+
+def get_affinity():
+    """
+    Return the CPUs on which the current process may run.
+
+    Returns
+    -------
+    cpus : list of int
+        CPU indices, or None if the affinity cannot be determined.
+    """
+
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    elif psutil is not None:
+        return sorted(psutil.Process().cpu_affinity())
+    else:
+        return None
+
+def set_affinity(cpus):
+    """
+    Restrict the current process to run on the specified CPUs.
+
+    Uses `os.sched_setaffinity()` if available and psutil otherwise.
+
+    Parameters
+    ----------
+    cpus : sequence of int
+        CPU indices.
+    """
+
+    cpus = list(cpus)
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    elif psutil is not None:
+        psutil.Process().cpu_affinity(cpus)
+    else:
+        raise RuntimeError('setting CPU affinity requires psutil')
+
+def policy_cpus(policy, index, nodes=None):
+    """
+    Select the CPUs to which a process should be pinned by a placement policy.
+
+    Processes on the same host are distributed over the host's NUMA nodes
+    (sockets) in round-robin order, so that process 0 is assigned to node 0,
+    process 1 to node 1, and so on.
+
+    Parameters
+    ----------
+    policy : str
+        If 'core', each process is pinned to a single core of its node; cores
+        are only shared when there are more processes than cores. If 'numa',
+        each process is pinned to all cores of its node.
+    index : int
+        Index of the process among the processes on the same host.
+    nodes : list of list of int
+        CPU indices of each NUMA node. If None, the local host's NUMA nodes
+        are used.
+
+    Returns
+    -------
+    cpus : list of int
+        CPU indices.
+    """
+
+    if nodes is None:
+        nodes = numa_nodes()
+    if policy == 'core':
+        cpus = []
+        for i in xrange(max(map(len, nodes))):
+            cpus.extend([n[i] for n in nodes if i < len(n)])
+        return [cpus[index % len(cpus)]]
+    elif policy == 'numa':
+        return list(nodes[index % len(nodes)])
+    else:
+        raise ValueError('unrecognized placement policy: %s' % policy)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+from unittest import main, TestCase
+
+import neurokernel.tools.affinity as affinity
+
+class test_affinity(TestCase):
+    def setUp(self):
+        self.nodes = [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+    def test_parse_cpulist(self):
+        self.assertEqual(affinity.parse_cpulist('0-3,8,10-11\n'),
+                         [0, 1, 2, 3, 8, 10, 11])
+        self.assertEqual(affinity.parse_cpulist(''), [])
+
+    def test_numa_nodes(self):
+        nodes = affinity.numa_nodes()
+        self.assertTrue(len(nodes) >= 1)
+        self.assertTrue(all(len(n) > 0 for n in nodes))
+
+    def test_policy_cpus_core(self):
+        self.assertEqual([affinity.policy_cpus('core', i, self.nodes) \
+                          for i in xrange(4)], [[0], [4], [1], [5]])
+        self.assertEqual(affinity.policy_cpus('core', 8, self.nodes), [0])
+
+    def test_policy_cpus_numa(self):
+        self.assertEqual(affinity.policy_cpus('numa', 0, self.nodes), self.nodes[0])
+        self.assertEqual(affinity.policy_cpus('numa', 3, self.nodes), self.nodes[1])
+        self.assertRaises(ValueError, affinity.policy_cpus, 'foo', 0, self.nodes)
+
+    def test_set_affinity(self):
+        cpus = affinity.get_affinity()
+        if cpus is None:
+            return
+        affinity.set_affinity(cpus[:1])
+        try:
+            self.assertEqual(affinity.get_affinity(), cpus[:1])
+        finally:
+            affinity.set_affinity(cpus)
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,10 @@ import neurokernel.mpi_relaunch
 
 import cPickle as pickle
 import os
+import shutil
 import tempfile
 
+import h5py
 from mpi4py import MPI
 import numpy as np
 
@@ -82,6 +84,54 @@ class MyModule2(Module):
             with open(self.out_file_name, 'w') as f:
                 pickle.dump(self.out_buf[1], f)
 
+class MyModule3(Module):
+    """
+    Module that streams input data into its ports and saves the port data.
+    """
+
+    def __init__(self, sel, sel_in, sel_out,
+                 sel_gpot, sel_spike, data_gpot, data_spike,
+                 columns=['interface', 'io', 'type'],
+                 ctrl_tag=CTRL_TAG, gpot_tag=GPOT_TAG, spike_tag=SPIKE_TAG,
+                 id=None, device=None,
+                 routing_table=None, rank_to_id=None,
+                 debug=False, time_sync=False, in_file_name=None,
+                 out_file_name=None):
+        super(MyModule3, self).__init__(sel, sel_in, sel_out,
+                 sel_gpot, sel_spike, data_gpot, data_spike,
+                 columns,
+                 ctrl_tag, gpot_tag, spike_tag,
+                 id, device,
+                 routing_table, rank_to_id,
+                 debug, time_sync)
+        self.inject(sel_in, in_file_name)
+        self.out_file_name = out_file_name
+        self.out_buf = []
+
+    def run_step(self):
+        super(MyModule3, self).run_step()
+        self.out_buf.append(self.data['gpot'].copy())
+
+    def post_run(self):
+        # Save the data before the manager is notified that the module is
+        # done:
+        with open(self.out_file_name, 'w') as f:
+            pickle.dump(self.out_buf, f)
+        super(MyModule3, self).post_run()
+
+class MyModule4(MyModule2):
+    """
+    Module that expects data and saves the data received at every step.
+    """
+
+    def post_run(self):
+        # Save the data before the manager is notified that the module is
+        # done:
+        if self.out_file_name:
+            with open(self.out_file_name, 'w') as f:
+                pickle.dump(self.out_buf, f)
+        Module.post_run(self)
+
 def make_sels(sel_in_gpot, sel_out_gpot, sel_in_spike, sel_out_spike):
     sel_in_gpot = Selector(sel_in_gpot)
     sel_out_gpot = Selector(sel_out_gpot)
@@ -169,6 +219,71 @@ class test_core_gpu(TestCase):
         os.remove(out_file_name)
         self.assertSequenceEqual(list(output), [0, 0, 1, 1])
 
+    def test_transmit_spikes_neighbor(self):
+        m1_sel_in_gpot = Selector('')
+        m1_sel_out_gpot = Selector('')
+        m1_sel_in_spike = Selector('')
+        m1_sel_out_spike = Selector('/m1/out/spike[0:4]')
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels(m1_sel_in_gpot, m1_sel_out_gpot, m1_sel_in_spike, m1_sel_out_spike)
+        N1_gpot = SelectorMethods.count_ports(m1_sel_gpot)
+        N1_spike = SelectorMethods.count_ports(m1_sel_spike)
+
+        m2_sel_in_gpot = Selector('')
+        m2_sel_out_gpot = Selector('')
+        m2_sel_in_spike = Selector('/m2/in/spike[0:4]')
+        m2_sel_out_spike = Selector('')
+        m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike = \
+            make_sels(m2_sel_in_gpot, m2_sel_out_gpot, m2_sel_in_spike, m2_sel_out_spike)
+        N2_gpot = SelectorMethods.count_ports(m2_sel_gpot)
+        N2_spike = SelectorMethods.count_ports(m2_sel_spike)
+
+        m1_id = 'm1'
+        self.man.add(MyModule1, m1_id,
+                     m1_sel, m1_sel_in, m1_sel_out,
+                     m1_sel_gpot, m1_sel_spike,
+                     np.zeros(N1_gpot, dtype=np.double),
+                     np.zeros(N1_spike, dtype=int),
+                     device=0, debug=debug, out_spike_data=[0, 0, 1, 1])
+
+        f, out_file_name = tempfile.mkstemp()
+        os.close(f)
+
+        m2_id = 'm2'
+        self.man.add(MyModule2, m2_id,
+                     m2_sel, m2_sel_in, m2_sel_out,
+                     m2_sel_gpot, m2_sel_spike,
+                     np.zeros(N2_gpot, dtype=np.double),
+                     np.zeros(N2_spike, dtype=int),
+                     device=1, debug=debug, out_file_name=out_file_name)
+
+        pat12 = Pattern(m1_sel, m2_sel)
+        pat12.interface[m1_sel_out_gpot] = [0, 'in', 'gpot']
+        pat12.interface[m1_sel_in_gpot] = [0, 'out', 'gpot']
+        pat12.interface[m1_sel_out_spike] = [0, 'in', 'spike']
+        pat12.interface[m1_sel_in_spike] = [0, 'out', 'spike']
+        pat12.interface[m2_sel_in_gpot] = [1, 'out', 'gpot']
+        pat12.interface[m2_sel_out_gpot] = [1, 'in', 'gpot']
+        pat12.interface[m2_sel_in_spike] = [1, 'out', 'spike']
+        pat12.interface[m2_sel_out_spike] = [1, 'in', 'spike']
+        pat12['/m1/out/spike[0]', '/m2/in/spike[0]'] = 1
+        pat12['/m1/out/spike[1]', '/m2/in/spike[1]'] = 1
+        pat12['/m1/out/spike[2]', '/m2/in/spike[2]'] = 1
+        pat12['/m1/out/spike[3]', '/m2/in/spike[3]'] = 1
+        self.man.connect(m1_id, m2_id, pat12, 0, 1)
+
+        # Run emulation for 2 steps with a neighborhood collective:
+        self.man.spawn(exchange='neighbor')
+        self.man.start(2)
+        self.man.wait()
+
+        # Get output of m2:
+        with open(out_file_name, 'r') as f:
+            output = pickle.load(f)
+
+        os.remove(out_file_name)
+        self.assertSequenceEqual(list(output), [0, 0, 1, 1])
+
     def test_transmit_spikes_one_to_many(self):
         m1_sel_in_gpot = Selector('')
         m1_sel_out_gpot = Selector('')
@@ -234,6 +349,368 @@ class test_core_gpu(TestCase):
         os.remove(out_file_name)
         self.assertSequenceEqual(list(output), [1, 1, 1, 1])
 
+    def test_imbalance_report(self):
+        m1_sel_in_gpot = Selector('')
+        m1_sel_out_gpot = Selector('')
+        m1_sel_in_spike = Selector('')
+        m1_sel_out_spike = Selector('/m1/out/spike[0:4]')
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels(m1_sel_in_gpot, m1_sel_out_gpot, m1_sel_in_spike, m1_sel_out_spike)
+        N1_gpot = SelectorMethods.count_ports(m1_sel_gpot)
+        N1_spike = SelectorMethods.count_ports(m1_sel_spike)
+
+        m2_sel_in_gpot = Selector('')
+        m2_sel_out_gpot = Selector('')
+        m2_sel_in_spike = Selector('/m2/in/spike[0:4]')
+        m2_sel_out_spike = Selector('')
+        m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike = \
+            make_sels(m2_sel_in_gpot, m2_sel_out_gpot, m2_sel_in_spike, m2_sel_out_spike)
+        N2_gpot = SelectorMethods.count_ports(m2_sel_gpot)
+        N2_spike = SelectorMethods.count_ports(m2_sel_spike)
+
+        m1_id = 'm1'
+        self.man.add(MyModule1, m1_id,
+                     m1_sel, m1_sel_in, m1_sel_out,
+                     m1_sel_gpot, m1_sel_spike,
+                     np.zeros(N1_gpot, dtype=np.double),
+                     np.zeros(N1_spike, dtype=int),
+                     device=0, debug=debug, time_sync=True,
+                     out_spike_data=[0, 0, 1, 1])
+        m2_id = 'm2'
+        self.man.add(MyModule2, m2_id,
+                     m2_sel, m2_sel_in, m2_sel_out,
+                     m2_sel_gpot, m2_sel_spike,
+                     np.zeros(N2_gpot, dtype=np.double),
+                     np.zeros(N2_spike, dtype=int),
+                     device=1, debug=debug, time_sync=True)
+
+        pat12 = Pattern(m1_sel, m2_sel)
+        pat12.interface[m1_sel_out_spike] = [0, 'in', 'spike']
+        pat12.interface[m2_sel_in_spike] = [1, 'out', 'spike']
+        pat12['/m1/out/spike[0]', '/m2/in/spike[0]'] = 1
+        pat12['/m1/out/spike[1]', '/m2/in/spike[1]'] = 1
+        pat12['/m1/out/spike[2]', '/m2/in/spike[2]'] = 1
+        pat12['/m1/out/spike[3]', '/m2/in/spike[3]'] = 1
+        self.man.connect(m1_id, m2_id, pat12, 0, 1)
+
+        # Run emulation for 5 steps; the first step is excluded from the
+        # report:
+        self.man.spawn()
+        self.man.start(5)
+        self.man.wait()
+
+        df = self.man.imbalance_report()
+        self.assertSequenceEqual(list(df['id']), [m1_id, m2_id])
+        self.assertEqual(len(self.man.step_imbalance()), 4)
+
+    def test_checkpoint(self):
+        m1_sel_in_gpot = Selector('')
+        m1_sel_out_gpot = Selector('')
+        m1_sel_in_spike = Selector('')
+        m1_sel_out_spike = Selector('/m1/out/spike[0:4]')
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels(m1_sel_in_gpot, m1_sel_out_gpot, m1_sel_in_spike, m1_sel_out_spike)
+        N1_gpot = SelectorMethods.count_ports(m1_sel_gpot)
+        N1_spike = SelectorMethods.count_ports(m1_sel_spike)
+
+        m1_id = 'm1'
+        self.man.add(MyModule1, m1_id,
+                     m1_sel, m1_sel_in, m1_sel_out,
+                     m1_sel_gpot, m1_sel_spike,
+                     np.zeros(N1_gpot, dtype=np.double),
+                     np.zeros(N1_spike, dtype=int),
+                     device=0, debug=debug, out_spike_data=[0, 0, 1, 1])
+
+        # Save state after step 2:
+        path = tempfile.mkdtemp()
+        self.man.spawn()
+        self.man.checkpoint(path, 2)
+        self.man.start(3)
+        self.man.wait()
+
+        f = np.load(os.path.join(path, '%s.npz' % m1_id))
+        self.assertEqual(int(f['steps']), 2)
+        self.assertSequenceEqual(list(f['data_spike']), [0, 0, 1, 1])
+        f.close()
+        shutil.rmtree(path)
+        self.assertSequenceEqual(self.man.checkpoint_times.keys(), [2])
+
+    def test_restart(self):
+        m1_sel_in_gpot = Selector('/m1/in/gpot[0:2]')
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels(m1_sel_in_gpot, '', '', '')
+
+        f, in_file_name = tempfile.mkstemp(suffix='.npy')
+        os.close(f)
+        np.save(in_file_name, np.arange(10, dtype=np.double).reshape(5, 2))
+        f, out_file_name = tempfile.mkstemp()
+        os.close(f)
+        path = tempfile.mkdtemp()
+
+        def run(steps, checkpoint=None, restart=None):
+            man = Manager()
+            man.add(MyModule3, 'm1',
+                    m1_sel, m1_sel_in, m1_sel_out,
+                    m1_sel_gpot, m1_sel_spike,
+                    np.zeros(2, dtype=np.double),
+                    np.zeros(0, dtype=int),
+                    device=0, debug=debug, in_file_name=in_file_name,
+                    out_file_name=out_file_name)
+            man.spawn(restart=restart)
+            if checkpoint is not None:
+                man.checkpoint(checkpoint)
+            man.start(steps)
+            man.wait()
+            with open(out_file_name, 'r') as f:
+                return pickle.load(f)
+
+        # Run the emulation without interruption, then save its state after 2
+        # steps and restart it from the saved state:
+        output = run(5)
+        run(2, checkpoint=path)
+        output_restart = run(5, restart=path)
+
+        os.remove(in_file_name)
+        os.remove(out_file_name)
+        shutil.rmtree(path)
+        self.assertEqual(len(output_restart), 3)
+        for a, b in zip(output[2:], output_restart):
+            self.assertSequenceEqual(list(a), list(b))
+
+    def test_persistent_reset_inject(self):
+        m1_sel_in_gpot = Selector('/m1/in/gpot[0:2]')
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels(m1_sel_in_gpot, '', '', '')
+
+        f, in_file_name = tempfile.mkstemp(suffix='.npy')
+        os.close(f)
+        np.save(in_file_name, np.arange(10, dtype=np.double).reshape(5, 2))
+        f, out_file_name = tempfile.mkstemp()
+        os.close(f)
+
+        self.man.add(MyModule3, 'm1',
+                     m1_sel, m1_sel_in, m1_sel_out,
+                     m1_sel_gpot, m1_sel_spike,
+                     np.zeros(2, dtype=np.double),
+                     np.zeros(0, dtype=int),
+                     device=0, debug=debug, in_file_name=in_file_name,
+                     out_file_name=out_file_name)
+
+        # The input data must be streamed from the beginning again after the
+        # module is reset:
+        self.man.spawn(persistent=True)
+        self.man.start(2)
+        self.man.wait()
+        self.man.reset()
+        self.man.start(3)
+        self.man.wait()
+        self.man.quit()
+        self.man.wait()
+
+        with open(out_file_name, 'r') as f:
+            output = pickle.load(f)
+        os.remove(in_file_name)
+        os.remove(out_file_name)
+        self.assertEqual(len(output), 5)
+        for a, b in zip(output, [[0, 1], [2, 3], [0, 1], [2, 3], [4, 5]]):
+            self.assertSequenceEqual(list(a), b)
+
+    def test_persistent(self):
+        m1_sel_in_gpot = Selector('')
+        m1_sel_out_gpot = Selector('')
+        m1_sel_in_spike = Selector('')
+        m1_sel_out_spike = Selector('/m1/out/spike[0:4]')
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels(m1_sel_in_gpot, m1_sel_out_gpot, m1_sel_in_spike, m1_sel_out_spike)
+        N1_gpot = SelectorMethods.count_ports(m1_sel_gpot)
+        N1_spike = SelectorMethods.count_ports(m1_sel_spike)
+
+        m2_sel_in_gpot = Selector('')
+        m2_sel_out_gpot = Selector('')
+        m2_sel_in_spike = Selector('/m2/in/spike[0:4]')
+        m2_sel_out_spike = Selector('')
+        m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike = \
+            make_sels(m2_sel_in_gpot, m2_sel_out_gpot, m2_sel_in_spike, m2_sel_out_spike)
+        N2_gpot = SelectorMethods.count_ports(m2_sel_gpot)
+        N2_spike = SelectorMethods.count_ports(m2_sel_spike)
+
+        m1_id = 'm1'
+        self.man.add(MyModule1, m1_id,
+                     m1_sel, m1_sel_in, m1_sel_out,
+                     m1_sel_gpot, m1_sel_spike,
+                     np.zeros(N1_gpot, dtype=np.double),
+                     np.zeros(N1_spike, dtype=int),
+                     device=0, debug=debug, out_spike_data=[1, 0, 1, 0])
+
+        f, out_file_name = tempfile.mkstemp()
+        os.close(f)
+
+        m2_id = 'm2'
+        self.man.add(MyModule4, m2_id,
+                     m2_sel, m2_sel_in, m2_sel_out,
+                     m2_sel_gpot, m2_sel_spike,
+                     np.zeros(N2_gpot, dtype=np.double),
+                     np.zeros(N2_spike, dtype=int),
+                     device=1, debug=debug, out_file_name=out_file_name)
+
+        pat12 = Pattern(m1_sel, m2_sel)
+        pat12.interface[m1_sel_out_spike] = [0, 'in', 'spike']
+        pat12.interface[m2_sel_in_spike] = [1, 'out', 'spike']
+        pat12['/m1/out/spike[0]', '/m2/in/spike[0]'] = 1
+        pat12['/m1/out/spike[1]', '/m2/in/spike[1]'] = 1
+        pat12['/m1/out/spike[2]', '/m2/in/spike[2]'] = 1
+        pat12['/m1/out/spike[3]', '/m2/in/spike[3]'] = 1
+        self.man.connect(m1_id, m2_id, pat12, 0, 1)
+
+        # Run emulation three times without respawning the modules; the
+        # second run continues the first after m1 is reconfigured, and the
+        # third starts over after the modules are reset:
+        self.man.spawn(persistent=True)
+        self.man.start(2)
+        self.man.wait()
+        self.man.configure(m1_id, out_spike_data=[0, 1, 0, 1])
+        self.man.start(2)
+        self.man.wait()
+        self.man.reset()
+        self.man.start(2)
+        self.man.wait()
+        self.man.quit()
+        self.man.wait()
+
+        # Get output of m2 during each step of the three runs:
+        with open(out_file_name, 'r') as f:
+            output = pickle.load(f)
+
+        os.remove(out_file_name)
+        self.assertEqual(len(output), 6)
+        self.assertSequenceEqual(list(output[1]), [1, 0, 1, 0])
+        self.assertSequenceEqual(list(output[2]), [1, 0, 1, 0])
+        self.assertSequenceEqual(list(output[3]), [0, 1, 0, 1])
+        self.assertSequenceEqual(list(output[4]), [0, 0, 0, 0])
+        self.assertSequenceEqual(list(output[5]), [0, 1, 0, 1])
+
+    def test_groups(self):
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels('', '', '', '/m1/out/spike[0:8]')
+        m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike = \
+            make_sels('', '', '/m2/in/spike[0:4]', '')
+        m3_sel, m3_sel_in, m3_sel_out, m3_sel_gpot, m3_sel_spike = \
+            make_sels('', '', '/m3/in/spike[0:4]', '')
+
+        pat12 = Pattern(m1_sel, m2_sel)
+        pat12.interface['/m1/out/spike[0:8]'] = [0, 'in', 'spike']
+        pat12.interface['/m2/in/spike[0:4]'] = [1, 'out', 'spike']
+        pat13 = Pattern(m1_sel, m3_sel)
+        pat13.interface['/m1/out/spike[0:8]'] = [0, 'in', 'spike']
+        pat13.interface['/m3/in/spike[0:4]'] = [1, 'out', 'spike']
+        for i in xrange(4):
+            pat12['/m1/out/spike[%i]' % i, '/m2/in/spike[%i]' % i] = 1
+            pat13['/m1/out/spike[%i]' % (i+4), '/m3/in/spike[%i]' % i] = 1
+
+        def run(groups):
+            man = Manager()
+            man.add(MyModule1, 'm1',
+                    m1_sel, m1_sel_in, m1_sel_out,
+                    m1_sel_gpot, m1_sel_spike,
+                    np.zeros(0, dtype=np.double),
+                    np.zeros(8, dtype=int),
+                    device=0, debug=debug,
+                    out_spike_data=[0, 0, 1, 1, 1, 0, 1, 0])
+            out_file_names = []
+            for id, sel, sel_in, sel_out, sel_gpot, sel_spike in \
+                [('m2', m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike),
+                 ('m3', m3_sel, m3_sel_in, m3_sel_out, m3_sel_gpot, m3_sel_spike)]:
+                f, out_file_name = tempfile.mkstemp()
+                os.close(f)
+                out_file_names.append(out_file_name)
+                man.add(MyModule4, id,
+                        sel, sel_in, sel_out,
+                        sel_gpot, sel_spike,
+                        np.zeros(0, dtype=np.double),
+                        np.zeros(4, dtype=int),
+                        device=0, debug=debug, out_file_name=out_file_name)
+            man.connect('m1', 'm2', pat12, 0, 1)
+            man.connect('m1', 'm3', pat13, 0, 1)
+
+            # m1 and m2 are run by the same process when grouped and exchange
+            # data locally; m1 and m3 exchange data over MPI:
+            man.spawn(groups=groups)
+            man.start(3)
+            man.wait()
+            output = []
+            for out_file_name in out_file_names:
+                with open(out_file_name, 'r') as f:
+                    output.append([list(x) for x in pickle.load(f)])
+                os.remove(out_file_name)
+            return output
+
+        output = run(None)
+        output_groups = run(2)
+        self.assertEqual(output_groups, output)
+        self.assertEqual(output[0][1:], [[0, 0, 1, 1]]*2)
+        self.assertEqual(output[1][1:], [[1, 0, 1, 0]]*2)
+
+    def test_shared_mem(self):
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels('', '', '', '/m1/out/spike[0:4]')
+        m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike = \
+            make_sels('', '', '/m2/in/spike[0:4]', '')
+
+        pat12 = Pattern(m1_sel, m2_sel)
+        pat12.interface['/m1/out/spike[0:4]'] = [0, 'in', 'spike']
+        pat12.interface['/m2/in/spike[0:4]'] = [1, 'out', 'spike']
+        for i in xrange(4):
+            pat12['/m1/out/spike[%i]' % i, '/m2/in/spike[%i]' % (3-i)] = 1
+
+        def run(shared_mem):
+            f, out_file_name = tempfile.mkstemp()
+            os.close(f)
+            man = Manager()
+            man.add(MyModule1, 'm1',
+                    m1_sel, m1_sel_in, m1_sel_out,
+                    m1_sel_gpot, m1_sel_spike,
+                    np.zeros(0, dtype=np.double),
+                    np.zeros(4, dtype=int),
+                    device=0, debug=debug, out_spike_data=[0, 0, 1, 1])
+            man.add(MyModule4, 'm2',
+                    m2_sel, m2_sel_in, m2_sel_out,
+                    m2_sel_gpot, m2_sel_spike,
+                    np.zeros(0, dtype=np.double),
+                    np.zeros(4, dtype=int),
+                    device=0, debug=debug, out_file_name=out_file_name)
+            man.connect('m1', 'm2', pat12, 0, 1)
+
+            # Both modules run on this host, so they exchange data via shared
+            # memory if it is enabled:
+            man.spawn(shared_mem=shared_mem)
+            man.start(3)
+            man.wait()
+            with open(out_file_name, 'r') as f:
+                output = [list(x) for x in pickle.load(f)]
+            os.remove(out_file_name)
+            return output
+
+        output = run(False)
+        output_shared_mem = run(True)
+        self.assertEqual(output_shared_mem, output)
+        self.assertEqual(output[1:], [[1, 1, 0, 0]]*2)
+
+    def test_record_port_names(self):
+        sel = Selector('/m1/out/gpot[0:2],/m1/out/x/y')
+        f, file_name = tempfile.mkstemp(suffix='.h5')
+        os.close(f)
+        m = Module(sel, Selector(''), sel, sel, Selector(''),
+                   np.zeros(3, dtype=np.double), np.zeros(0, dtype=int),
+                   id='m1')
+        m.record(sel, name='gpot', file_name=file_name)
+        m._recorder.update(0)
+        m._recorder.close()
+        with h5py.File(file_name, 'r') as f:
+            self.assertSequenceEqual(list(f['gpot/ports'][:]),
+                                     ['/m1/out/gpot[0]', '/m1/out/gpot[1]',
+                                      '/m1/out/x/y'])
+        os.remove(file_name)
+
 if __name__ == '__main__':
     logger = mpi.setup_logger(screen=False,
                               mpi_comm=MPI.COMM_WORLD, multiline=True)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+from unittest import main, TestCase
+
+import h5py
+import numpy as np
+
+from neurokernel.injector import Injector
+
+class test_injector(TestCase):
+    def setUp(self):
+        self.input = np.arange(30, dtype=np.double).reshape(10, 3)
+
+    def test_npy(self):
+        f, file_name = tempfile.mkstemp(suffix='.npy')
+        os.close(f)
+        np.save(file_name, self.input)
+        data = np.zeros(5, np.double)
+        inj = Injector(file_name, data, [0, 2, 4], prefetch=4)
+        for step in xrange(10):
+            self.assertTrue(inj.update())
+            np.testing.assert_array_equal(data[[0, 2, 4]], self.input[step])
+            np.testing.assert_array_equal(data[[1, 3]], [0, 0])
+        self.assertFalse(inj.update())
+        inj.close()
+        os.remove(file_name)
+
+    def test_hdf5(self):
+        f, file_name = tempfile.mkstemp(suffix='.h5')
+        os.close(f)
+        with h5py.File(file_name, 'w') as f:
+            f.create_dataset('x', data=self.input)
+        data = np.zeros(3, np.double)
+        inj = Injector(file_name, data, [0, 1, 2], 'x', prefetch=3,
+                       block_steps=2)
+        for step in xrange(4):
+            inj.update()
+        np.testing.assert_array_equal(data, self.input[3])
+        inj.close()
+        os.remove(file_name)
+
+    def test_seek(self):
+        f, file_name = tempfile.mkstemp(suffix='.npy')
+        os.close(f)
+        np.save(file_name, self.input)
+        data = np.zeros(3, np.double)
+        inj = Injector(file_name, data, [0, 1, 2], prefetch=2)
+        for step in xrange(3):
+            inj.update()
+        self.assertEqual(inj.tell(), 3)
+        inj.seek(7)
+        self.assertEqual(inj.tell(), 7)
+        inj.update()
+        np.testing.assert_array_equal(data, self.input[7])
+        inj.seek(1)
+        inj.update()
+        np.testing.assert_array_equal(data, self.input[1])
+        self.assertRaises(ValueError, inj.seek, 11)
+        inj.close()
+        os.remove(file_name)
+
+    def test_invalid_shape(self):
+        f, file_name = tempfile.mkstemp(suffix='.npy')
+        os.close(f)
+        np.save(file_name, self.input)
+        self.assertRaises(ValueError, Injector, file_name, np.zeros(2), [0, 1])
+        os.remove(file_name)
+
+    def test_read_error(self):
+        f, file_name = tempfile.mkstemp(suffix='.npy')
+        os.close(f)
+        np.save(file_name, np.array([['a', 'b']]*4))
+        inj = Injector(file_name, np.zeros(2), [0, 1], prefetch=2)
+        self.assertRaises(ValueError, inj.update)
+        self.assertRaises(ValueError, inj.close)
+        os.remove(file_name)
+
+if __name__ == '__main__':
+    main()
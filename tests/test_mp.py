@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+from unittest import main, TestCase
+
+import numpy as np
+
+from neurokernel.core import Module
+from neurokernel.mp import Barrier, Manager
+from neurokernel.pattern import Pattern
+from neurokernel.plsel import Selector, SelectorMethods
+
+class MyModule1(Module):
+    """
+    Module that emits data.
+    """
+
+    out_spike_data = [0, 0, 1, 1]
+
+    def run_step(self):
+        super(MyModule1, self).run_step()
+        self.pm['spike'][self.out_spike_ports] = self.out_spike_data
+        self.pm['gpot'][self.out_gpot_ports] = self.steps
+
+class MyModule2(Module):
+    """
+    Module that reports the data it receives to the manager.
+    """
+
+    def run_step(self):
+        super(MyModule2, self).run_step()
+        self.intercomm.isend(['data', (self.steps,
+                              list(self.pm['spike'][self.in_spike_ports]),
+                              list(self.pm['gpot'][self.in_gpot_ports]))],
+                             dest=0, tag=self._ctrl_tag)
+
+class MyManager(Manager):
+    def __init__(self, *args, **kwargs):
+        super(MyManager, self).__init__(*args, **kwargs)
+        self.data = []
+
+    def process_worker_msg(self, msg):
+        if msg[0] == 'data':
+            self.data.append(msg[1])
+        else:
+            super(MyManager, self).process_worker_msg(msg)
+
+class test_mp(TestCase):
+    def setUp(self):
+        self.man = MyManager()
+        m1_sel = Selector('/m1/out/spike[0:4],/m1/out/gpot[0:2]')
+        m2_sel = Selector('/m2/in/spike[0:4],/m2/in/gpot[0:2]')
+        self.man.add(MyModule1, 'm1', m1_sel, Selector(''), m1_sel,
+                     Selector('/m1/out/gpot[0:2]'),
+                     Selector('/m1/out/spike[0:4]'),
+                     np.zeros(2, np.double), np.zeros(4, np.int32))
+        self.man.add(MyModule2, 'm2', m2_sel, m2_sel, Selector(''),
+                     Selector('/m2/in/gpot[0:2]'),
+                     Selector('/m2/in/spike[0:4]'),
+                     np.zeros(2, np.double), np.zeros(4, np.int32))
+        pat = Pattern(m1_sel, m2_sel)
+        pat.interface['/m1/out/spike[0:4]'] = [0, 'in', 'spike']
+        pat.interface['/m1/out/gpot[0:2]'] = [0, 'in', 'gpot']
+        pat.interface['/m2/in/spike[0:4]'] = [1, 'out', 'spike']
+        pat.interface['/m2/in/gpot[0:2]'] = [1, 'out', 'gpot']
+        for i in xrange(4):
+            pat['/m1/out/spike[%s]' % i, '/m2/in/spike[%s]' % (3-i)] = 1
+        pat['/m1/out/gpot[0]', '/m2/in/gpot[0]'] = 1
+        pat['/m1/out/gpot[0]', '/m2/in/gpot[1]'] = 1
+        self.man.connect('m1', 'm2', pat, 0, 1)
+
+    def test_barrier(self):
+        b = Barrier(1)
+        b.wait()
+        b.wait()
+
+    def test_transmit(self):
+        self.man.spawn()
+        self.man.start(3)
+        self.man.wait()
+
+        # Data emitted during each step is received during the next step:
+        self.assertSequenceEqual(sorted(self.man.data),
+                                 [(0, [0, 0, 0, 0], [0, 0]),
+                                  (1, [1, 1, 0, 0], [0, 0]),
+                                  (2, [1, 1, 0, 0], [1, 1])])
+        self.assertEqual(self.man._procs, [])
+
+    def test_persistent(self):
+        self.man.spawn(persistent=True)
+        self.man.start(2)
+        self.man.wait()
+        self.man.reset()
+        self.man.configure('m1', out_spike_data=[1, 0, 0, 0])
+        self.man.start(2)
+        self.man.wait()
+        self.man.quit()
+        self.man.wait()
+
+        # Only the second run is affected by the new parameters:
+        self.assertSequenceEqual(self.man.data,
+                                 [(0, [0, 0, 0, 0], [0, 0]),
+                                  (1, [1, 1, 0, 0], [0, 0]),
+                                  (0, [0, 0, 0, 0], [0, 0]),
+                                  (1, [0, 0, 0, 1], [0, 0])])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+
+from unittest import main, TestCase
+
+import dill
+from mpi4py import MPI
+import numpy as np
+
+from neurokernel.ctrl import ControlChannel, CTRL_DTYPE, decode, encode
+from neurokernel.mpi import Worker, WorkerManager
+
+class Request(object):
+    def __init__(self, channel):
+        self.channel = channel
+
+    def test(self):
+        if self.channel.msgs:
+            return True, self.channel.msgs.pop(0)
+        return False, None
+
+class Channel(object):
+    """
+    Channel that delivers a scripted sequence of control messages.
+    """
+
+    def __init__(self, msgs):
+        self.msgs = list(msgs)
+        self.sent = []
+
+    def irecv(self, *args, **kwargs):
+        return Request(self)
+
+    def isend(self, obj, *args, **kwargs):
+        self.sent.append(obj)
+
+class CountingWorker(Worker):
+    """
+    Worker that counts how often it checks for control messages.
+    """
+
+    def __init__(self, msgs):
+        super(CountingWorker, self).__init__()
+        self._intercomm = Channel(msgs)
+        self._rank = 0
+        self.checks = 0
+        self.saved = []
+
+    def _recv_ctrl(self):
+        self.checks += 1
+        return super(CountingWorker, self)._recv_ctrl()
+
+    def save_checkpoint(self, path):
+        self.saved.append(self.steps)
+
+class RecordingManager(WorkerManager):
+    """
+    Manager that records the messages it processes.
+    """
+
+    def __init__(self, msgs):
+        super(RecordingManager, self).__init__()
+        self._intercomm = Channel(msgs)
+        self.msgs = []
+
+    def process_worker_msg(self, msg):
+        self.msgs.append(msg)
+
+class test_worker(TestCase):
+    def test_ctrl_every(self):
+        w = CountingWorker([['steps', '10'], ['start']])
+        w.ctrl_every = 5
+        w.run()
+        self.assertEqual(w.steps, 10)
+
+        # Two checks while idle and one at step 5:
+        self.assertEqual(w.checks, 3)
+        self.assertEqual(w._intercomm.sent, [['done', 0]])
+
+    def test_ctrl_every_step(self):
+        w = CountingWorker([['steps', '10'], ['start']])
+        w.run()
+        self.assertEqual(w.steps, 10)
+        self.assertEqual(w.checks, 11)
+
+    def test_chunk_checkpoint(self):
+        # Chunks end at scheduled checkpoints:
+        w = CountingWorker([['checkpoint', '/tmp', 7, None],
+                            ['steps', '10'], ['start']])
+        w.ctrl_every = 5
+        w.run()
+        self.assertEqual(w.steps, 10)
+        self.assertEqual(w.saved, [7])
+        self.assertEqual(w.checks, 5)
+
+    def test_ctrl_adaptive(self):
+        w = CountingWorker([['steps', '100'], ['start']])
+        w.ctrl_every = None
+        w.ctrl_interval = 10.0
+        w.run()
+        self.assertEqual(w.steps, 100)
+
+        # The chunk size doubles until the maximum number of steps is reached
+        # (1, 2, 4, 8, 16, 32, 37 steps):
+        self.assertEqual(w.checks, 8)
+
+    def test_adapt_chunk(self):
+        w = CountingWorker([])
+        w.ctrl_interval = 0.01
+        w._chunk = 64
+        w._adapt_chunk(64, 0.32)
+        self.assertEqual(w._chunk, 2)
+        w._adapt_chunk(2, 0.0)
+        self.assertEqual(w._chunk, 4)
+
+    def test_run_steps(self):
+        w = CountingWorker([])
+        w.run_steps(3)
+        self.assertEqual(w.steps, 3)
+        self.assertEqual(w.checks, 0)
+
+    def test_wait_ctrl(self):
+        w = CountingWorker([])
+        w.ctrl_idle_interval = 0.001
+        channel = w._intercomm
+        def recv_ctrl():
+            # Deliver the message after a few checks:
+            if w.checks == 3:
+                channel.msgs.append(['quit'])
+            return CountingWorker._recv_ctrl(w)
+        w._recv_ctrl = recv_ctrl
+        self.assertEqual(w._wait_ctrl(), ['quit'])
+        self.assertEqual(w.checks, 4)
+
+    def test_wait_ctrl_blocking(self):
+        # Workers block in a probe rather than checking for messages
+        # transmitted over MPI communicators:
+        w = CountingWorker([])
+        w.ctrl_idle_interval = None
+        w._intercomm = MPI.COMM_SELF
+        w._ctrl_tag = 5
+        ControlChannel(MPI.COMM_SELF, 5).isend(['start'], 0)
+        self.assertEqual(w._wait_ctrl(), ['start'])
+        self.assertEqual(w.checks, 0)
+
+class test_worker_manager(TestCase):
+    def test_wait(self):
+        man = RecordingManager([['done', 1], ['sync_time', 0]])
+        man.ctrl_idle_interval = 0.001
+        man.add(Worker)
+        man.add(Worker)
+
+        # Deliver the last message after the manager has started waiting:
+        recv_worker_msg = man._recv_worker_msg
+        checks = []
+        def recv():
+            checks.append(None)
+            if len(checks) == 5:
+                man._intercomm.msgs.append(['done', 0])
+            return recv_worker_msg()
+        man._recv_worker_msg = recv
+        man.wait()
+        self.assertEqual(man.msgs, [['sync_time', 0]])
+        self.assertEqual(man._intercomm.msgs, [])
+
+class test_ctrl(TestCase):
+    def test_encode_decode(self):
+        for msg in [['start'], ['quit'], ['steps', 'inf'], ['steps', '10'],
+                    ['done', 3], ['start_time', (1, 2.5)],
+                    ['sync_time', (1, 2, 3.0, 4.0, 16, 2.5)],
+                    ['sync_time', (1, 2, 3.0, 4.0, 16, None)],
+                    ['checkpoint_time', (1, 5, 0.5, 1024)]]:
+            rec = encode(msg)
+            self.assertEqual(len(rec), CTRL_DTYPE.itemsize)
+            self.assertEqual(decode(rec), msg)
+
+        # Records have the documented layout:
+        rec = np.frombuffer(encode(['checkpoint_time', (1, 5, 0.5, 1024)]),
+                            CTRL_DTYPE)[0]
+        self.assertEqual((rec['rank'], rec['step'], rec['t0'], rec['nbytes']),
+                         (1, 5, 0.5, 1024))
+
+    def test_encode_unsupported(self):
+        self.assertIsNone(encode(['configure', {'a': 1}]))
+        self.assertIsNone(encode(['checkpoint', '/tmp', None, None]))
+        self.assertIsNone(encode(['done', 'x']))
+        self.assertIsNone(encode(['start', 1]))
+
+    def test_channel(self):
+        comm = MPI.COMM_SELF
+        chan = ControlChannel(comm, 5)
+        self.assertEqual(chan.recv(), None)
+        msgs = [['sync_time', (0, 1, 3.0, 4.0, 16, None)],
+                ['configure', {'a': 1}],
+                ['done', 0]]
+        for msg in msgs:
+            chan.isend(msg, 0)
+
+        # Messages pickled by other code are also received:
+        comm.isend(['foo', 'x'*40], 0, 5)
+        self.assertEqual([chan.recv() for i in xrange(4)],
+                         msgs+[['foo', 'x'*40]])
+        self.assertEqual(chan.recv(), None)
+
+    def test_channel_wait(self):
+        comm = MPI.COMM_SELF
+        chan = ControlChannel(comm, 5)
+        chan.isend(['steps', '10'], 0)
+        comm.isend(['configure', {'a': 1}], 0, 5)
+        self.assertEqual([chan.wait(), chan.wait()],
+                         [['steps', '10'], ['configure', {'a': 1}]])
+
+    def test_channel_pickle_size(self):
+        # Pickled messages with the same size as a record are not mistaken
+        # for records:
+        comm = MPI.COMM_SELF
+        chan = ControlChannel(comm, 5)
+        msg = [m for m in [['foo', 'x'*i] for i in xrange(64)] \
+               if len(dill.dumps(m, 2)) == CTRL_DTYPE.itemsize][0]
+        comm.Send([bytearray(dill.dumps(msg, 2)), MPI.BYTE], 0, 5)
+        self.assertEqual(chan.recv(), msg)
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,9 @@ from unittest import main, TestCase
 
 from mpi4py import MPI
 
-from neurokernel.mpi_proc import Process, ProcessManager
+from neurokernel.mpi_proc import Process, ProcessManager, \
+    import_target, target_ref
+import neurokernel.mpi_proc
 
 class MyProc(Process):
     def run(self):
@@ -46,6 +48,19 @@ class test_mpi_proc(TestCase):
         self.assertItemsEqual(results, 
                               ["0 ('x', 'y') {'z': 1}",
                                "1 ('a', 'b') {'c': 2}"])
-    
+
+    def test_target_ref(self):
+        self.assertEqual(target_ref(Process), 'neurokernel.mpi_proc:Process')
+        self.assertIs(import_target(target_ref(Process)), Process)
+
+        class LocalProc(Process):
+            pass
+        self.assertIsNone(target_ref(LocalProc))
+
+    def test_target_globals_cached(self):
+        man = ProcessManager()
+        g = man._get_target_globals(MyProc)
+        self.assertIs(man._get_target_globals(MyProc), g)
+
 if __name__ == '__main__':
     main()
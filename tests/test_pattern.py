@@ -10,6 +10,14 @@ from pandas.util.testing import assert_frame_equal, assert_index_equal, \
 
 from neurokernel.pattern import Interface, Pattern, are_compatible
 
+def categorical(df):
+    """
+    Convert the port attribute columns of an interface DataFrame to categoricals.
+    """
+
+    data = {k: pd.Categorical(df[k].values) for k in df.columns}
+    return pd.DataFrame(data, index=df.index, columns=df.columns)
+
 class test_interface(TestCase):
     def setUp(self):
         self.interface = Interface('/foo[0:3]')
@@ -30,7 +38,39 @@ class test_interface(TestCase):
 
         # This should succeed without exception:
         i['/x/y', 'interface'] = 0
-        
+
+    def test_assign_order(self):
+        i = Interface('/foo[0:2],/bar/baz,/bar/qux')
+        i['/bar/qux,/foo[1],/bar/baz', 'interface', 'io', 'type'] = \
+            [1, 'out', 'spike']
+        i['/foo[0]', 'interface', 'io', 'type'] = [0, 'in', 'gpot']
+        idx = pd.MultiIndex(levels=[['bar', 'foo'], [0, 1, 'baz', 'qux']],
+                            labels=[[1, 1, 0, 0], [0, 1, 2, 3]],
+                            names=[0, 1])
+        df = pd.DataFrame(data=[[0, 'in', 'gpot'],
+                                [1, 'out', 'spike'],
+                                [1, 'out', 'spike'],
+                                [1, 'out', 'spike']],
+                          index=idx,
+                          columns=['interface', 'io', 'type'],
+                          dtype=object)
+        assert_frame_equal(i.data, categorical(df))
+
+    def test_categorical(self):
+        i = Interface('/foo[0:3]')
+        i['/foo[0:2]', 'interface', 'io', 'type'] = [0, 'in', 'gpot']
+        i['/foo[2]', 'interface', 'io', 'type'] = [1, 'out', 'spike']
+        for k in ['interface', 'io', 'type']:
+            assert i.data[k].dtype.name == 'category'
+            assert i.data[k].cat.codes.dtype == np.int8
+        self.assertSequenceEqual(list(i.data['interface']), [0, 0, 1])
+        self.assertSequenceEqual(list(i.data['io']), ['in', 'in', 'out'])
+        self.assertSequenceEqual(list(i.data['type']),
+                                 ['gpot', 'gpot', 'spike'])
+        self.assertSequenceEqual(i.in_ports(0, True),
+                                 [('foo', 0), ('foo', 1)])
+        self.assertSequenceEqual(i.spike_ports(1, True), [('foo', 2)])
+
     def test_create_dup_identifiers(self):
         self.assertRaises(Exception, Interface, '/foo[0],/foo[0]')
 
@@ -207,7 +247,7 @@ class test_interface(TestCase):
         df = pd.DataFrame(data, index=idx, columns=columns)
         i = Interface.from_df(df)
         assert_index_equal(i.data.index, idx)
-        assert_frame_equal(i.data, df)
+        assert_frame_equal(i.data, categorical(df))
 
     def test_from_df_index_empty(self):
         idx = pd.Index([])
@@ -216,7 +256,7 @@ class test_interface(TestCase):
         df = pd.DataFrame(data, index=idx, columns=columns)
         i = Interface.from_df(df)
         assert_index_equal(i.data.index, idx)
-        assert_frame_equal(i.data, df)
+        assert_frame_equal(i.data, categorical(df))
 
     def test_from_df_multiindex(self):
         idx = pd.MultiIndex.from_tuples([('foo', 0),
@@ -229,7 +269,7 @@ class test_interface(TestCase):
         df = pd.DataFrame(data, index=idx, columns=columns)
         i = Interface.from_df(df)
         assert_index_equal(i.data.index, idx)
-        assert_frame_equal(i.data, df)
+        assert_frame_equal(i.data, categorical(df))
 
     def test_from_df_multiindex_empty(self):
         idx = pd.MultiIndex(levels=[['a', 'b'], [0, 1]],
@@ -239,7 +279,7 @@ class test_interface(TestCase):
         df = pd.DataFrame(data, index=idx, columns=columns)
         i = Interface.from_df(df)
         assert_index_equal(i.data.index, idx)
-        assert_frame_equal(i.data, df)
+        assert_frame_equal(i.data, categorical(df))
 
     def test_from_df_dup(self):
         idx = pd.MultiIndex.from_tuples([('foo', 0),
@@ -309,7 +349,7 @@ class test_interface(TestCase):
                           dtype=object)
 
         # Test returning result as Interface:
-        assert_frame_equal(i.in_ports(0).data, df)
+        assert_frame_equal(i.in_ports(0).data, categorical(df))
 
         # Test returning result as list of tuples:
         self.assertItemsEqual(i.in_ports(0, True), df.index.tolist())
@@ -325,7 +365,7 @@ class test_interface(TestCase):
                           dtype=object)
 
         # Test returning result as Interface:
-        assert_frame_equal(i.in_ports(0).data, df)
+        assert_frame_equal(i.in_ports(0).data, categorical(df))
 
         # Test returning result as list of tuples:
         self.assertItemsEqual(i.in_ports(0, True), df.index.tolist())
@@ -369,7 +409,7 @@ class test_interface(TestCase):
                           dtype=object)
 
         # Test returning result as Interface:
-        assert_frame_equal(i.out_ports(1).data, df)
+        assert_frame_equal(i.out_ports(1).data, categorical(df))
 
         # Test returning result as list of tuples:
         self.assertItemsEqual(i.out_ports(1, True), df.index.tolist())
@@ -385,7 +425,7 @@ class test_interface(TestCase):
                           dtype=object)
 
         # Test returning result as Interface:
-        assert_frame_equal(i.out_ports(1).data, df)
+        assert_frame_equal(i.out_ports(1).data, categorical(df))
 
         # Test returning result as list of tuples:
         self.assertItemsEqual(i.out_ports(1, True), df.index.tolist())
@@ -504,6 +544,24 @@ class test_interface(TestCase):
         j['/foo[2:4]'] = [1, 'out', 'spike']
         assert i.is_compatible(0, j, 1)
 
+    def test_is_compatible_unequal_levels(self):
+        """
+        Interfaces whose port identifiers have different numbers of levels
+        should be compared on their padded identifiers.
+        """
+
+        i = Interface('/foo[0:2],/bar')
+        i['/foo[0:2]'] = [0, 'out', 'gpot']
+        i['/bar'] = [0, 'in', 'spike']
+        j = Interface('/bar,/foo[0:2],/baz/qux[0]')
+        j['/foo[0:2]'] = [1, 'in', 'gpot']
+        j['/bar'] = [1, 'out', 'spike']
+        j['/baz/qux[0]'] = [0, 'in', 'gpot']
+        assert i.is_compatible(0, j, 1)
+        j['/foo[1]', 'type'] = 'spike'
+        assert not i.is_compatible(0, j, 1)
+        assert i.is_compatible(0, j, 1, True)
+
     def test_is_compatible_one_dir(self):
         i = Interface('/foo[0:2]')
         i['/foo[0:2]', 'interface', 'io'] = [0, 'out']
@@ -636,7 +694,7 @@ class test_pattern(TestCase):
         p.interface['/bar[0:2]', 'type'] = 'spike'
         p.interface['/foo[2:5]', 'type'] = 'gpot'
         p.interface['/bar[3:5]', 'type'] = 'gpot'
-        assert_frame_equal(p.interface.data, self.df_i)
+        assert_frame_equal(p.interface.data, categorical(self.df_i))
 
     def test_create_dup_identifiers(self):
         self.assertRaises(Exception,  Pattern,
@@ -864,6 +922,24 @@ class test_pattern(TestCase):
                                ('xxx',)])
         self.assertItemsEqual(q.dest_idx(0, 1, dest_type='gpot'), [])
 
+    def test_src_dest_idx_order(self):
+        p = Pattern('/aaa[0:4]', '/bbb[0:4]')
+        p['/aaa[2]', '/bbb[0]'] = 1
+        p['/aaa[0]', '/bbb[1]'] = 1
+        p['/aaa[2]', '/bbb[2]'] = 1
+
+        # Ports are returned in the order of the pattern's rows:
+        self.assertSequenceEqual(p.src_idx(0, 1), [('aaa', 0), ('aaa', 2)])
+        self.assertSequenceEqual(p.src_idx(0, 1, duplicates=True),
+                                 [('aaa', 0), ('aaa', 2), ('aaa', 2)])
+        self.assertSequenceEqual(p.dest_idx(0, 1),
+                                 [('bbb', 1), ('bbb', 0), ('bbb', 2)])
+
+        # Connections added after a query are taken into account:
+        p['/bbb[3]', '/aaa[1]'] = 1
+        self.assertSequenceEqual(p.src_idx(1, 0), [('bbb', 3)])
+        self.assertSequenceEqual(p.dest_idx(1, 0), [('aaa', 1)])
+
     def test_is_in_interfaces(self):
         # Selectors with multiple levels:
         p = Pattern('/aaa/bbb', '/ccc/ddd')
@@ -1005,7 +1081,7 @@ class test_pattern(TestCase):
                           columns=['conn'],
                           dtype=object)
         assert_frame_equal(p.data, df)
-        assert_frame_equal(p.interface.data, df_int)
+        assert_frame_equal(p.interface.data, categorical(df_int))
 
     def test_from_df(self):
         p = Pattern('/[aaa,bbb]/0', '/[ccc,ddd]/0')
@@ -1141,6 +1217,90 @@ class test_pattern(TestCase):
         assert_frame_equal(pg.interface.data.sort_index(),
                            p.interface.data.sort_index())
 
+    def test_to_csr(self):
+        p = Pattern('/foo[0:3]', '/bar[0:4]')
+        p['/foo[0]', '/bar[1]'] = 1
+        p['/foo[2]', '/bar[0]'] = 1
+        p['/foo[2]', '/bar[3]'] = 1
+        p['/bar[2]', '/foo[1]'] = 1
+        p.interface['/foo[0:3]', 'type'] = 'gpot'
+        p.interface['/bar[0:3]', 'type'] = 'gpot'
+        p.interface['/bar[3]', 'type'] = 'spike'
+        np.testing.assert_array_equal(p.to_csr(0, 1).toarray(),
+                                      [[0, 1, 0, 0],
+                                       [0, 0, 0, 0],
+                                       [1, 0, 0, 1]])
+        np.testing.assert_array_equal(p.to_csr(0, 1, 'gpot', 'gpot').toarray(),
+                                      [[0, 1, 0],
+                                       [0, 0, 0],
+                                       [1, 0, 0]])
+        np.testing.assert_array_equal(p.to_csr(1, 0).toarray(),
+                                      [[0, 0, 0],
+                                       [0, 0, 0],
+                                       [0, 1, 0],
+                                       [0, 0, 0]])
+
+    def test_from_edges(self):
+        p = Pattern('/foo[0:3]', '/bar[0:4]')
+        p['/foo[0]', '/bar[1]'] = 1
+        p['/foo[2]', '/bar[0]'] = 1
+        p['/foo[2]', '/bar[3]'] = 1
+        p['/bar[2]', '/foo[1]'] = 1
+        p.interface['/foo[0:3]', 'type'] = 'gpot'
+        p.interface['/bar[0:4]', 'type'] = 'gpot'
+
+        # Ports specified as selector strings, tuples, and positions:
+        for src, dest in [(['/foo[0]', '/foo[2]', '/foo[2]', '/bar/2'],
+                           ['/bar[1]', '/bar[0]', '/bar[3]', '/foo/1']),
+                          ([('foo', 0), ('foo', 2), ('foo', 2), ('bar', 2)],
+                           [('bar', 1), ('bar', 0), ('bar', 3), ('foo', 1)]),
+                          (np.array([0, 2, 2, 5]), np.array([4, 3, 6, 1]))]:
+            q = Pattern.from_edges(src, dest, '/foo[0:3]', '/bar[0:4]',
+                                   types='gpot')
+            assert_frame_equal(q.data, p.data)
+            assert_frame_equal(q.interface.data, p.interface.data)
+
+        # Types and attributes of each connection:
+        q = Pattern.from_edges(['/foo', '/bar'], ['/baz', '/qux'],
+                               '/[foo,bar]', '/[baz,qux]',
+                               types=['gpot', 'spike'], attrs={'w': [0.5, 1.5]})
+        self.assertSequenceEqual(q.src_idx(0, 1, 'spike', 'spike'), [('bar',)])
+        self.assertEqual(q['/bar', '/qux', 'w'].values.tolist(), [[1.5]])
+
+        # Invalid connections:
+        self.assertRaises(ValueError, Pattern.from_edges, ['/foo', '/bar'],
+                          ['/baz', '/baz'], '/[foo,bar]', '/[baz,qux]')
+        self.assertRaises(ValueError, Pattern.from_edges, ['/foo'],
+                          ['/bar'], '/[foo,bar]', '/[baz,qux]')
+        self.assertRaises(ValueError, Pattern.from_edges, ['/foo'],
+                          ['/quux'], '/[foo,bar]', '/[baz,qux]')
+        self.assertRaises(ValueError, Pattern.from_edges, ['/foo', '/foo'],
+                          ['/baz', '/qux'], '/[foo,bar]', '/[baz,qux]',
+                          types=['gpot', 'spike'])
+
+    def test_from_csr(self):
+        p = Pattern('/foo[0:3]', '/bar[0:4]')
+        p['/foo[0]', '/bar[1]'] = 1
+        p['/foo[2]', '/bar[0]'] = 1
+        p['/foo[2]', '/bar[3]'] = 1
+        p.interface['/foo[0:3]', 'type'] = 'spike'
+        p.interface['/bar[0:4]', 'type'] = 'spike'
+        q = Pattern.from_csr(p.to_csr(0, 1), '/foo[0:3]', '/bar[0:4]',
+                             'spike', 'spike')
+        assert_frame_equal(q.data, p.data)
+        assert_frame_equal(q.interface.data, p.interface.data)
+
+        # Selectors with a single level:
+        q = Pattern.from_csr(np.array([[0, 1], [0, 0]]), '/[foo,bar]', '/[baz,qux]')
+        self.assertSequenceEqual(q.src_idx(0, 1), [('foo',)])
+        self.assertSequenceEqual(q.dest_idx(0, 1), [('qux',)])
+
+        # Fan-in and mismatched shapes are not permitted:
+        self.assertRaises(ValueError, Pattern.from_csr, np.ones((2, 2)),
+                          '/[foo,bar]', '/[baz,qux]')
+        self.assertRaises(ValueError, Pattern.from_csr, np.ones((2, 1)),
+                          '/foo[0:2]', '/bar[0:2]')
+
     def test_gpot_ports(self):
         p = Pattern('/foo[0:3]', '/bar[0:3]')
         p.interface['/foo[0]', 'io', 'type'] = ['in', 'spike']
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+from unittest import main, TestCase
+
+import numpy as np
+
+from neurokernel.pattern import Pattern
+import neurokernel.placement as placement
+from neurokernel.routing_table import RoutingTable
+
+class test_placement(TestCase):
+    def setUp(self):
+        # Two groups of strongly connected modules (0, 2) and (1, 3) that are
+        # weakly connected to each other:
+        self.mat = np.array([[0, 1, 10, 0],
+                             [0, 0, 0, 10],
+                             [10, 0, 0, 0],
+                             [1, 10, 0, 0]])
+
+    def test_comm_matrix(self):
+        pat = Pattern('/a/out/spike[0:4],/a/in/gpot[0:2]',
+                      '/b/in/spike[0:4],/b/out/gpot[0:2]')
+        pat.interface['/a/out/spike[0:4]'] = [0, 'in', 'spike']
+        pat.interface['/b/in/spike[0:4]'] = [1, 'out', 'spike']
+        pat.interface['/a/in/gpot[0:2]'] = [0, 'out', 'gpot']
+        pat.interface['/b/out/gpot[0:2]'] = [1, 'in', 'gpot']
+        pat['/a/out/spike[0]', '/b/in/spike[0]'] = 1
+        pat['/a/out/spike[0]', '/b/in/spike[1]'] = 1
+        pat['/a/out/spike[2]', '/b/in/spike[3]'] = 1
+        pat['/b/out/gpot[1]', '/a/in/gpot[0]'] = 1
+
+        r = RoutingTable()
+        r['a', 'b'] = {'pattern': pat, 'int_0': 0, 'int_1': 1}
+        r['b', 'a'] = {'pattern': pat, 'int_0': 1, 'int_1': 0}
+        mat = placement.comm_matrix(r, ['a', 'b'], {'a': {'spike': 4}})
+        np.testing.assert_array_equal(mat, [[0, 8], [8, 0]])
+
+    def test_block_sizes(self):
+        self.assertEqual(placement.block_sizes(10, 3), [4, 4, 2])
+        self.assertEqual(placement.block_sizes(4, 2), [2, 2])
+
+    def test_partition(self):
+        part = placement.partition(self.mat, [2, 2])
+        self.assertEqual(part[0], part[2])
+        self.assertEqual(part[1], part[3])
+        self.assertNotEqual(part[0], part[1])
+        self.assertEqual(placement.cross_part_bytes(self.mat, part), 2)
+
+    def test_order(self):
+        inds = placement.order(self.mat)
+        self.assertEqual(sorted(inds), range(4))
+        self.assertEqual(set(inds[:2]), set([0, 2]))
+
+    def test_place(self):
+        perm, part = placement.place(self.mat, 2)
+        self.assertEqual(sorted(perm), range(4))
+        self.assertEqual(set(perm[:2]), set([0, 2]))
+        self.assertEqual(set(perm[2:]), set([1, 3]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+import bidict
+import numpy as np
+
+from neurokernel.pattern import Pattern
+import neurokernel.plan as plan
+
+class test_plan(TestCase):
+    def setUp(self):
+        self.pat = Pattern('/a/out/spike[0:4],/a/in/gpot[0:2]',
+                           '/b/in/spike[0:4],/b/out/gpot[0:2]')
+        self.pat.interface['/a/out/spike[0:4]'] = [0, 'in', 'spike']
+        self.pat.interface['/b/in/spike[0:4]'] = [1, 'out', 'spike']
+        self.pat.interface['/a/in/gpot[0:2]'] = [0, 'out', 'gpot']
+        self.pat.interface['/b/out/gpot[0:2]'] = [1, 'in', 'gpot']
+        self.pat['/a/out/spike[0]', '/b/in/spike[0]'] = 1
+        self.pat['/a/out/spike[0]', '/b/in/spike[1]'] = 1
+        self.pat['/a/out/spike[2]', '/b/in/spike[3]'] = 1
+        self.pat['/b/out/gpot[1]', '/a/in/gpot[0]'] = 1
+
+        self.pm_a = plan.make_port_mappers('/a/in/gpot[0:2]', '/a/out/spike[0:4]')
+        self.pm_b = plan.make_port_mappers('/b/out/gpot[0:2]', '/b/in/spike[0:4]')
+
+    def test_compile_src(self):
+        p = plan.compile_src(self.pat, 0, 1, self.pm_a)
+        np.testing.assert_array_equal(p['spike'], [0, 2])
+        self.assertEqual(len(p['gpot']), 0)
+
+        p = plan.compile_src(self.pat, 1, 0, self.pm_b)
+        np.testing.assert_array_equal(p['gpot'], [1])
+        self.assertEqual(len(p['spike']), 0)
+
+    def test_compile_dest(self):
+        p = plan.compile_dest(self.pat, 0, 1, self.pm_b)
+        np.testing.assert_array_equal(p['spike']['inds'], [0, 1, 3])
+        np.testing.assert_array_equal(p['spike']['buf_inds'], [0, 0, 1])
+        self.assertEqual(p['spike']['buf_len'], 2)
+        self.assertEqual(p['gpot']['buf_len'], 0)
+
+        p = plan.compile_dest(self.pat, 1, 0, self.pm_a)
+        np.testing.assert_array_equal(p['gpot']['inds'], [0])
+        np.testing.assert_array_equal(p['gpot']['buf_inds'], [0])
+        self.assertEqual(p['gpot']['buf_len'], 1)
+
+    def test_plan_cache(self):
+        path = tempfile.mkdtemp()
+        try:
+            cache = plan.PlanCache(path)
+            src_sels = ('/a/in/gpot[0:2]', '/a/out/spike[0:4]')
+            dest_sels = ('/b/out/gpot[0:2]', '/b/in/spike[0:4]')
+            key = cache.key(self.pat, 0, 1, src_sels, dest_sels)
+            self.assertIsNone(cache.load(key))
+
+            src_plan, dest_plan = \
+                plan.compile_connection(self.pat, 0, 1, src_sels, dest_sels, cache)
+            src_plan_c, dest_plan_c = cache.load(key)
+            for t in ['gpot', 'spike']:
+                np.testing.assert_array_equal(src_plan_c[t], src_plan[t])
+                for k in ['inds', 'buf_inds', 'buf_len']:
+                    np.testing.assert_array_equal(dest_plan_c[t][k], dest_plan[t][k])
+
+            # Port mappers passed to the compiler must yield the same plans:
+            src_plan_p, dest_plan_p = \
+                plan.compile_connection(self.pat, 0, 1, src_sels, dest_sels,
+                                        None, self.pm_a, self.pm_b)
+            for t in ['gpot', 'spike']:
+                np.testing.assert_array_equal(src_plan_p[t], src_plan[t])
+                np.testing.assert_array_equal(dest_plan_p[t]['inds'],
+                                              dest_plan[t]['inds'])
+
+            # Changing the pattern or the interfaces must change the key:
+            self.assertEqual(cache.key(self.pat, 0, 1, src_sels, dest_sels), key)
+            self.assertNotEqual(cache.key(self.pat, 1, 0, dest_sels, src_sels), key)
+            self.pat.interface['/a/in/gpot[1]', 'type'] = 'spike'
+            key_int = cache.key(self.pat, 0, 1, src_sels, dest_sels)
+            self.assertNotEqual(key_int, key)
+            self.pat['/a/out/spike[1]', '/b/in/spike[2]'] = 1
+            self.assertNotEqual(cache.key(self.pat, 0, 1, src_sels, dest_sels),
+                                key_int)
+        finally:
+            shutil.rmtree(path)
+
+class Compiler(plan.ExchangePlanMixin):
+    """
+    Minimal manager that compiles the plans of connections between modules.
+    """
+
+    def __init__(self, sels, plan_cache=None):
+        self._init_plans(plan_cache)
+        self._groups = None
+        self.rank_to_id = bidict.bidict()
+        self._kwargs = {}
+        for rank, id in enumerate(sorted(sels.keys())):
+            self.rank_to_id[rank] = id
+            self._kwargs[rank] = {'sel_gpot': sels[id][0],
+                                  'sel_spike': sels[id][1]}
+
+class test_exchange_plan_mixin(TestCase):
+    def setUp(self):
+        self.pat = Pattern('/a/out/spike[0:4]', '/b/in/spike[0:4]')
+        self.pat.interface['/a/out/spike[0:4]'] = [0, 'in', 'spike']
+        self.pat.interface['/b/in/spike[0:4]'] = [1, 'out', 'spike']
+        self.pat['/a/out/spike[0]', '/b/in/spike[1]'] = 1
+        self.pat['/a/out/spike[3]', '/b/in/spike[2]'] = 1
+        self.sels = {'a': ('', '/a/out/spike[0:4]'),
+                     'b': ('', '/b/in/spike[0:4]')}
+
+    def test_cache_hit_skips_port_mappers(self):
+        path = tempfile.mkdtemp()
+        make_port_mappers = plan.make_port_mappers
+        calls = []
+        def f(*args):
+            calls.append(args)
+            return make_port_mappers(*args)
+        plan.make_port_mappers = f
+        try:
+            conn = Compiler(self.sels, path)._compile_connection('a', 'b',
+                                                                 self.pat, 0, 1)
+            self.assertEqual(len(calls), 2)
+            np.testing.assert_array_equal(conn['src_plan']['spike'], [0, 3])
+
+            # Compiling the same connection with a new manager must load the
+            # cached plans without creating any port mappers:
+            del calls[:]
+            conn_c = Compiler(self.sels, path)._compile_connection('a', 'b',
+                                                                   self.pat, 0, 1)
+            self.assertEqual(len(calls), 0)
+            np.testing.assert_array_equal(conn_c['src_plan']['spike'], [0, 3])
+            np.testing.assert_array_equal(conn_c['dest_plan']['spike']['inds'],
+                                          conn['dest_plan']['spike']['inds'])
+        finally:
+            plan.make_port_mappers = make_port_mappers
+            shutil.rmtree(path)
+
+if __name__ == '__main__':
+    main()
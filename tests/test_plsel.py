@@ -448,6 +448,7 @@ class test_path_like_selector(TestCase):
         self.assertEqual(self.sel.to_identifier(['foo']), '/foo')
         self.assertEqual(self.sel.to_identifier(['foo', 0]), '/foo[0]')
         self.assertEqual(self.sel.to_identifier(['foo', 0L]), '/foo[0]')
+        self.assertEqual(self.sel.to_identifier([u'foo', 0]), '/foo[0]')
         self.assertRaises(Exception, self.sel.to_identifier, 'foo')
         self.assertRaises(Exception, self.sel.to_identifier, 
                           [['foo', ['a', 'b']]])
@@ -656,6 +657,15 @@ class test_path_like_selector(TestCase):
         self.assertEqual(self.sel.tokens_to_str(['a', 'b', slice(0L, 5L)]), '/a/b[0:5]')
         self.assertEqual(self.sel.tokens_to_str(['a', 'b', slice(None, 5)]), '/a/b[:5]')
 
+    def test_str_to_tokens(self):
+        self.assertEqual(self.sel.str_to_tokens('/a'), ('a',))
+        self.assertEqual(self.sel.str_to_tokens('/a/0'), ('a', 0))
+        self.assertEqual(self.sel.str_to_tokens('/a[0]'), ('a', 0))
+        self.assertEqual(self.sel.str_to_tokens('/[a]/b[0]/1'), ('a', 'b', 0, 1))
+        self.assertEqual(self.sel.str_to_tokens('/a[0:1]'), ('a', 0))
+        self.assertRaises(ValueError, self.sel.str_to_tokens, '/a[0,1]')
+        self.assertRaises(ValueError, self.sel.str_to_tokens, '')
+
     def test_collapse(self):
         self.assertEqual(self.sel.collapse([]), '')
         self.assertEqual(self.sel.collapse([['a']]), '/a')
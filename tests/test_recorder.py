@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+from unittest import main, TestCase
+
+import h5py
+import numpy as np
+
+from neurokernel.recorder import Recorder
+
+class test_recorder(TestCase):
+    def setUp(self):
+        f, self.file_name = tempfile.mkstemp(suffix='.h5')
+        os.close(f)
+
+    def tearDown(self):
+        os.remove(self.file_name)
+
+    def test_dense(self):
+        data = np.zeros(5, np.double)
+        r = Recorder(self.file_name, chunk_steps=3)
+        r.add('x', data, [1, 3], ['/x[1]', '/x[3]'])
+        for step in xrange(10):
+            data[:] = step
+            r.update(step)
+        r.close()
+        with h5py.File(self.file_name, 'r') as f:
+            np.testing.assert_array_equal(f['x/data'][:],
+                                          np.repeat(np.arange(10.0), 2).reshape(10, 2))
+            self.assertSequenceEqual(list(f['x/ports'][:]), ['/x[1]', '/x[3]'])
+
+    def test_dense_every(self):
+        data = np.zeros(3, np.double)
+        r = Recorder(self.file_name, chunk_steps=2)
+        r.add('x', data, [0, 1, 2], every=3)
+        for step in xrange(10):
+            data[:] = step
+            r.update(step)
+        r.close()
+        with h5py.File(self.file_name, 'r') as f:
+            np.testing.assert_array_equal(f['x/data'][:, 0], [0, 3, 6, 9])
+            self.assertEqual(f['x'].attrs['every'], 3)
+
+    def test_sparse(self):
+        data = np.zeros(4, np.int32)
+        r = Recorder(self.file_name, chunk_steps=2)
+        r.add('s', data, [0, 1, 2, 3], sparse=True)
+        for step in xrange(5):
+            data[:] = 0
+            data[step % 4] = 1
+            r.update(step)
+        r.close()
+        with h5py.File(self.file_name, 'r') as f:
+            np.testing.assert_array_equal(f['s/time'][:], [0, 1, 2, 3, 4])
+            np.testing.assert_array_equal(f['s/index'][:], [0, 1, 2, 3, 0])
+
+    def test_reset(self):
+        data = np.zeros(2, np.double)
+        r = Recorder(self.file_name, chunk_steps=2)
+        r.add('x', data, [0, 1])
+        r.add('s', data, [0, 1], sparse=True)
+        for step in xrange(5):
+            data[:] = step
+            r.update(step)
+        r.reset()
+        for step in xrange(3):
+            data[:] = 10+step
+            r.update(step)
+        r.close()
+        with h5py.File(self.file_name, 'r') as f:
+            np.testing.assert_array_equal(f['x/data'][:, 0], [10, 11, 12])
+            np.testing.assert_array_equal(f['s/time'][:], [0, 0, 1, 1, 2, 2])
+
+    def test_add_after_start(self):
+        data = np.zeros(2)
+        r = Recorder(self.file_name)
+        r.add('x', data, [0])
+        r.update(0)
+        self.assertRaises(RuntimeError, r.add, 'y', data, [1])
+        r.close()
+
+if __name__ == '__main__':
+    main()
@@ -70,5 +70,22 @@ class test_routingtable(TestCase):
         assert set(s.ids) == set(['a', 'b', 'c'])
         assert set(s.connections) == set([('a', 'b'), ('b', 'c')])
 
+    def test_incident(self):
+        t = RoutingTable()
+        t['a', 'b'] = 1
+        t['b', 'c'] = 1
+        t['c', 'd'] = 1
+        t['d', 'a'] = 1
+        s = t.incident('a')
+        assert set(s.ids) == set(['a', 'b', 'd'])
+        assert set(s.connections) == set([('a', 'b'), ('d', 'a')])
+        assert s['a', 'b'] == 1
+        s = t.incident('e')
+        assert s.ids == ['e']
+        assert s.connections == []
+        s = t.incident('a', 'c')
+        assert set(s.ids) == set(['a', 'b', 'c', 'd'])
+        assert set(s.connections) == set([('a', 'b'), ('b', 'c'), ('c', 'd'), ('d', 'a')])
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+from unittest import main, TestCase
+
+from mpi4py import MPI
+import numpy as np
+
+from neurokernel.shm import layout, SharedBuffers
+
+class test_shm(TestCase):
+    def test_layout(self):
+        offsets, nbytes = layout([('a', 3, np.float64), ('b', 20, np.int32),
+                                  ('c', 0, np.float64)], align=64)
+        self.assertEqual(offsets['a'], (0, 64))
+        self.assertEqual(offsets['b'], (128, 256))
+        self.assertEqual(offsets['c'], (384, 384))
+        self.assertEqual(nbytes, 384)
+
+    def test_no_local_peers(self):
+        # Buffers transmitted to processes on other hosts or to the current
+        # process are not shared:
+        comm = MPI.COMM_SELF
+        shm = SharedBuffers(comm, [('a', 'b', 'gpot', 0, 4, np.float64),
+                                   ('a', 'c', 'spike', 1, 4, np.int32)])
+        try:
+            self.assertFalse(shm.enabled)
+            self.assertEqual(shm.send_bufs, {})
+            self.assertEqual(shm.recv_bufs, {})
+            shm.sync()
+        finally:
+            shm.close()
+
+if __name__ == '__main__':
+    main()